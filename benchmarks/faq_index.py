@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de latência do índice de FAQ - Médico de Bolso
+
+Constrói um banco sintético (por padrão 30 mil respostas, 3 perguntas cada, vocabulário com
+distribuição de Zipf) e mede a latência p50/p95 de FAQIndex.search, comparando com a pontuação
+densa anterior (bincount com minlength=n_rows e uma lista de np.arange por posição), que cresce
+com o tamanho do banco. As duas pontuações devem escolher a mesma resposta; o benchmark confere.
+
+Dois conjuntos de consultas:
+    - específicas: só as palavras do tema (listas curtas; pontuação em ids compactos);
+    - com contexto: tema + pessoa e contexto comuns a milhares de perguntas (listas longas;
+      a busca volta ao vetor denso, e a latência acompanha o volume das listas percorridas).
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.faq_index --entries 30000 --queries 2000
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+from itertools import accumulate
+from typing import List, Optional
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.ai.faq_index import FAQIndex, build_index, _feature_buckets
+
+CONTEXTS = [
+    'desde ontem', 'há três dias', 'depois do almoço', 'quando acordo', 'à noite', 'depois de correr',
+    'no trabalho', 'com frequência', 'pela primeira vez', 'há uma semana', 'quando como doce', 'no frio'
+]
+PEOPLE = ['', 'meu filho', 'minha mãe', 'meu avô', 'a bebê', 'minha esposa', 'meu pai', 'minha tia']
+TOPIC_WORDS = 4  # palavras do tema de cada resposta; cada pergunta usa 3 delas
+
+
+def _vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Palavras sintéticas distintas (2 a 4 sílabas)"""
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice('bcdfglmnprstvz') + rng.choice('aeiou') for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+
+def _question(rng: random.Random, topic: List[str], context: bool = True) -> str:
+    words = ' '.join(rng.sample(topic, 3))
+    if not context:
+        return words
+    return f"{rng.choice(PEOPLE)} está com {words} {rng.choice(CONTEXTS)}".strip()
+
+
+def _write_bank(path: str, entries: int, vocabulary_size: int, rng: random.Random) -> List[List[str]]:
+    """Grava o banco sintético; retorna as palavras do tema de cada resposta (base das consultas)
+
+    As palavras seguem uma distribuição de Zipf, como em texto real: poucas muito frequentes
+    (listas longas no índice) e muitas raras, que distinguem as respostas.
+    """
+    vocabulary = _vocabulary(vocabulary_size, rng)
+    zipf_weights = list(accumulate(1 / rank for rank in range(1, vocabulary_size + 1)))
+    bank, topics = [], []
+    for entry_idx in range(entries):
+        topic = rng.choices(vocabulary, cum_weights=zipf_weights, k=TOPIC_WORDS)
+        bank.append({
+            'id': f"sintetico_{entry_idx}",
+            'urgency_level': 'BAIXO',
+            'questions': [_question(rng, topic) for _ in range(3)],
+            'answer': f"Resposta validada {entry_idx}",
+        })
+        topics.append(topic)
+    with open(path, 'w', encoding='utf-8') as bank_file:
+        json.dump(bank, bank_file, ensure_ascii=False)
+    return topics
+
+
+def _dense_best_row(index: FAQIndex, message: str) -> Optional[int]:
+    """Pontuação anterior: vetor de pontuações com uma posição por linha do índice"""
+    buckets = _feature_buckets(message)
+    bucket_ids = np.fromiter(buckets.keys(), dtype=np.int64, count=len(buckets))
+    query = np.fromiter(buckets.values(), dtype=np.float32, count=len(buckets)) * index.idf[bucket_ids]
+    query /= np.linalg.norm(query)
+    starts = index.indptr[bucket_ids]
+    ends = index.indptr[bucket_ids + 1]
+    lengths = ends - starts
+    if not lengths.sum():
+        return None
+    positions = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])
+    contributions = index.weights[positions] * np.repeat(query, lengths)
+    scores = np.bincount(index.rows[positions], weights=contributions, minlength=index.n_rows)
+    return int(scores.argmax())
+
+
+def _postings(index: FAQIndex, message: str) -> int:
+    """Entradas das listas invertidas percorridas pela consulta"""
+    bucket_ids = np.fromiter(_feature_buckets(message).keys(), dtype=np.int64)
+    return int((index.indptr[bucket_ids + 1] - index.indptr[bucket_ids]).sum())
+
+
+def _percentiles(samples: List[float]):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.95)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência de FAQIndex.search em um banco sintético")
+    parser.add_argument('--entries', type=int, default=30_000, help="respostas no banco sintético")
+    parser.add_argument('--vocabulary', type=int, default=50_000, help="palavras distintas no banco")
+    parser.add_argument('--queries', type=int, default=2000, help="consultas medidas")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as work_dir:
+        bank_path = os.path.join(work_dir, 'faq_bank.json')
+        index_dir = os.path.join(work_dir, 'faq_index')
+        topics = _write_bank(bank_path, args.entries, args.vocabulary, rng)
+
+        started = time.perf_counter()
+        n_rows = build_index(bank_path, index_dir)
+        print(f"Banco: {args.entries} respostas, {n_rows} perguntas (índice em {time.perf_counter() - started:.1f} s)")
+
+        index = FAQIndex(index_dir)
+        # Consultas: novas combinações das palavras de uma resposta (nem sempre iguais a uma pergunta)
+        query_sets = {
+            'específicas': [_question(rng, rng.choice(topics), context=False) for _ in range(args.queries)],
+            'com contexto': [_question(rng, rng.choice(topics)) for _ in range(args.queries)],
+        }
+
+        mismatches = 0
+        for queries in query_sets.values():
+            for query in queries[:200]:
+                match = index.search(query, 0.0)
+                best_row = _dense_best_row(index, query)
+                expected = None if best_row is None else index.entries[int(index.row_entry[best_row])]['id']
+                mismatches += (match.entry_id if match else None) != expected
+        print(f"Respostas diferentes entre as pontuações (400 consultas): {mismatches}")
+
+        print(f"\n{'consultas':>13} {'listas p50':>10} | {'densa p50':>9} {'p95':>7} | {'atual p50':>9} {'p95':>7}  (ms)")
+        for set_name, queries in query_sets.items():
+            postings = sorted(_postings(index, query) for query in queries)
+            results = []
+            for search in (lambda query: _dense_best_row(index, query), lambda query: index.search(query, 0.6)):
+                for query in queries[:50]:
+                    search(query)  # aquecimento (páginas do mmap)
+                latencies = []
+                for query in queries:
+                    started = time.perf_counter()
+                    search(query)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                results.extend(_percentiles(latencies))
+            print(f"{set_name:>13} {postings[len(postings) // 2]:>10} | "
+                  f"{results[0]:9.3f} {results[1]:7.3f} | {results[2]:9.3f} {results[3]:7.3f}")
+
+if __name__ == "__main__":
+    main()
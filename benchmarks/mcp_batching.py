@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de lotes JSON-RPC no MCP - Médico de Bolso
+
+Compara a latência do enriquecimento MCP (recursos, protocolos de emergência e diretrizes)
+feito com três requisições em sequência, com um único lote JSON-RPC e com chamadas em
+paralelo (fan-out com prazo), contra o servidor local de substituição com latência de rede
+simulada. Com --slow-tool, uma das ferramentas fica mais lenta que o prazo.
+
+O cache de protocolos e diretrizes é esvaziado antes de cada rodada (fora da medição), para que
+os três modos meçam as idas ao servidor; a linha "lote (cache)" mostra o lote com o cache aquecido.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.mcp_batching --rounds 50 --latency 0.02
+    python -m benchmarks.mcp_batching --rounds 20 --slow-tool get_medical_guidelines --slow-delay 0.5 --deadline 0.1
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SESSION_STORE_URL', 'memory')
+
+from src.mcp.client import MCPClient, MCPCall
+from benchmarks.mcp_stub_server import StubMCPServer
+
+QUERY = "dor no peito e falta de ar"
+SYMPTOMS = ["dor no peito", "falta de ar"]
+CONDITION = "angina"
+
+
+async def _sequential(client: MCPClient) -> dict:
+    """Enriquecimento anterior: uma requisição HTTP por chamada, uma após a outra"""
+    return {
+        'resources': await client.get_medical_resources(QUERY),
+        'emergency_protocols': await client.get_emergency_protocols(SYMPTOMS),
+        'guidelines': await client.get_medical_guidelines(CONDITION)
+    }
+
+
+async def _batched(client: MCPClient, deadline: float) -> dict:
+    return await client.get_enrichment(QUERY, symptoms=SYMPTOMS, condition=CONDITION, deadline=deadline)
+
+
+async def _fan_out(client: MCPClient, deadline: float) -> dict:
+    return await client.fan_out([
+        MCPCall('resources', client._resources_request(QUERY), client._parse_resources, deadline),
+        MCPCall('emergency_protocols', client._protocols_request(SYMPTOMS), client._parse_result, deadline),
+        MCPCall('guidelines', client._guidelines_request(CONDITION), client._parse_result, deadline)
+    ])
+
+
+def _summary(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p50 = ordered[len(ordered) // 2]
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"p50 {p50:7.1f} ms | p95 {p95:7.1f} ms"
+
+
+async def _run(rounds: int, latency: float, deadline: float, slow_tool: str, slow_delay: float):
+    server = StubMCPServer(latency=latency, tool_delays={slow_tool: slow_delay} if slow_tool else None)
+    client = MCPClient()
+    client.server_url = await server.start()
+    try:
+        await client.connect()
+
+        # (nome, consulta, cache esvaziado antes de cada rodada)
+        modes = (
+            ('sequencial', lambda: _sequential(client), True),
+            ('lote', lambda: _batched(client, deadline), True),
+            ('paralelo', lambda: _fan_out(client, deadline), True),
+            ('lote (cache)', lambda: _batched(client, deadline), False)
+        )
+        for name, enrich, cold in modes:
+            await enrich()  # aquecimento (conexão keep-alive já aberta)
+            requests_before = server.http_requests
+            samples = []
+            for _ in range(rounds):
+                if cold:
+                    client.response_cache.clear()
+                started = time.perf_counter()
+                result = await enrich()
+                samples.append((time.perf_counter() - started) * 1000)
+            per_round = (server.http_requests - requests_before) / rounds
+            print(f"{name:>12}: {_summary(samples)} | requisições HTTP por consulta: {per_round:.0f} "
+                  f"| resultados: {len(result)}/3")
+
+        for tool, stats in client.get_tool_stats().items():
+            print(f"{tool:>24}: p50 {stats['latency_p50_ms']:7.1f} ms | timeouts {stats['timeouts']}")
+    finally:
+        await client.disconnect()
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latência do enriquecimento MCP: sequencial x lote JSON-RPC x paralelo")
+    parser.add_argument('--rounds', type=int, default=50)
+    parser.add_argument('--latency', type=float, default=0.02, help="latência simulada por requisição (s)")
+    parser.add_argument('--deadline', type=float, default=1.5, help="prazo de cada chamada (s)")
+    parser.add_argument('--slow-tool', default='', help="ferramenta com atraso adicional (ex.: get_medical_guidelines)")
+    parser.add_argument('--slow-delay', type=float, default=0.5, help="atraso adicional da ferramenta lenta (s)")
+    args = parser.parse_args()
+
+    print(f"Rodadas: {args.rounds} | latência simulada por requisição: {args.latency * 1000:.0f} ms "
+          f"| prazo: {args.deadline * 1000:.0f} ms")
+    asyncio.run(_run(args.rounds, args.latency, args.deadline, args.slow_tool, args.slow_delay))
+
+
+if __name__ == "__main__":
+    main()
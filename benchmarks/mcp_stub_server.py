@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Servidor MCP local de substituição - Médico de Bolso
+
+Responde às chamadas usadas pelo cliente MCP (initialize, resources/list, tools/call e
+notificações) com dados fixos e uma latência simulada por requisição, aceitando mensagens
+individuais e lotes JSON-RPC 2.0, por HTTP ou por stdio (uma mensagem por linha, com
+respostas fora de ordem e uma notificação do servidor após a inicialização). Serve para
+benchmarks e testes manuais sem depender de um servidor MCP real.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.mcp_stub_server --port 8080 --latency 0.02
+    MCP_TRANSPORT=stdio MCP_SERVER_COMMAND="python -m benchmarks.mcp_stub_server --stdio" ...
+"""
+
+import sys
+import json
+import asyncio
+import argparse
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+TOOL_RESULTS = {
+    'get_medical_guidelines': lambda arguments: {
+        'condition': arguments.get('condition'),
+        'guidelines': ["Hidratação e repouso", "Procurar atendimento se os sintomas piorarem"]
+    },
+    'emergency_protocols': lambda arguments: {
+        'symptoms': arguments.get('symptoms', []),
+        'protocol': "Ligue imediatamente para o SAMU (192)"
+    },
+    'check_drug_interactions': lambda arguments: {
+        'medications': arguments.get('medications', []),
+        'interactions': []
+    }
+}
+
+
+class StubMCPServer:
+    """Servidor MCP de substituição com latência configurável"""
+
+    def __init__(self, latency: float = 0.02, batch_support: bool = True, tool_delays: Optional[Dict[str, float]] = None):
+        """`latency`: atraso por requisição HTTP (simula a rede); `batch_support=False` recusa lotes;
+        `tool_delays`: atraso adicional por ferramenta (simula uma ferramenta lenta)"""
+        self.latency = latency
+        self.batch_support = batch_support
+        self.tool_delays = tool_delays or {}
+        self.http_requests = 0
+        self.messages = 0
+        self.notifications: List[Dict[str, Any]] = []
+
+        self.web_app = web.Application()
+        self.web_app.router.add_post('/mcp', self.handle)
+        self._runner: Optional[web.AppRunner] = None
+
+    def _result(self, method: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        if method == 'initialize':
+            return {'protocolVersion': params.get('protocolVersion'), 'serverInfo': {'name': 'stub-mcp'}}
+        if method == 'resources/list':
+            return {'resources': [{'uri': 'medico://resources/1', 'name': f"Material sobre: {params.get('query')}"}]}
+        if method == 'tools/call':
+            tool = TOOL_RESULTS.get(params.get('name'))
+            if tool is None:
+                raise KeyError(params.get('name'))
+            return tool(params.get('arguments', {}))
+        raise KeyError(method)
+
+    @staticmethod
+    def _tool(message: Dict[str, Any]) -> str:
+        if message.get('method') == 'tools/call':
+            return message.get('params', {}).get('name', '')
+        return message.get('method', '')
+
+    def _answer(self, message: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Resposta a uma mensagem (None para notificações)"""
+        self.messages += 1
+        if 'id' not in message:
+            self.notifications.append(message)
+            return None
+        try:
+            return {'jsonrpc': '2.0', 'id': message['id'], 'result': self._result(message['method'], message.get('params', {}))}
+        except KeyError as e:
+            return {'jsonrpc': '2.0', 'id': message['id'], 'error': {'code': -32601, 'message': f"Método não encontrado: {e}"}}
+
+    def _delay(self, payload: Any) -> float:
+        messages = payload if isinstance(payload, list) else [payload]
+        return self.latency + max((self.tool_delays.get(self._tool(message), 0.0) for message in messages), default=0.0)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.http_requests += 1
+        payload = await request.json()
+        await asyncio.sleep(self._delay(payload))
+
+        if isinstance(payload, list):
+            if not self.batch_support:
+                return web.json_response({'jsonrpc': '2.0', 'id': None, 'error': {'code': -32600, 'message': "Lotes não suportados"}})
+            answers = [answer for answer in map(self._answer, payload) if answer is not None]
+            return web.json_response(answers) if answers else web.Response(status=202)
+
+        answer = self._answer(payload)
+        return web.json_response(answer) if answer is not None else web.Response(status=202)
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Inicia o servidor e retorna a URL base (porta 0 = escolhida pelo sistema)"""
+        self._runner = web.AppRunner(self.web_app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{bound_port}"
+
+    async def serve_stdio(self):
+        """Atende pelo stdin/stdout até o fim da entrada; cada mensagem é respondida quando fica pronta"""
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=16 * 1024 * 1024)
+        await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+
+        def write(message: Any):
+            sys.stdout.buffer.write(json.dumps(message, ensure_ascii=False).encode('utf-8') + b'\n')
+            sys.stdout.buffer.flush()
+
+        async def answer(payload: Any):
+            await asyncio.sleep(self._delay(payload))
+            if isinstance(payload, list):
+                answers = [answer for answer in map(self._answer, payload) if answer is not None]
+                if answers:
+                    write(answers)
+            else:
+                answer = self._answer(payload)
+                if answer is not None:
+                    write(answer)
+                elif payload.get('method') == 'notifications/initialized':
+                    write({'jsonrpc': '2.0', 'method': 'notifications/message', 'params': {'level': 'info', 'data': "stub-mcp pronto"}})
+
+        tasks = set()
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            task = asyncio.create_task(answer(json.loads(line)))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.wait(tasks)
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor MCP local de substituição")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.02, help="segundos por requisição HTTP")
+    parser.add_argument('--no-batch', action='store_true', help="recusar lotes JSON-RPC")
+    parser.add_argument('--stdio', action='store_true', help="atender por stdin/stdout em vez de HTTP")
+    args = parser.parse_args()
+
+    server = StubMCPServer(latency=args.latency, batch_support=not args.no_batch)
+    if args.stdio:
+        asyncio.run(server.serve_stdio())
+        return
+    print(f"Servidor MCP de substituição em http://{args.host}:{args.port}/mcp")
+    web.run_app(server.web_app, host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de serialização JSON - Médico de Bolso
+
+Compara a codificação/decodificação pela biblioteca padrão (como era feito antes: dicionários
+intermediários + json.dumps) com a camada src.utils.serialization (orjson, quando instalado),
+para as cargas reais do projeto: lote de requisições MCP, resposta MCP, registro de sessão,
+resposta do Mangaba AI e evento médico.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.serialization_throughput --seconds 0.5
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from dataclasses import asdict
+from typing import Any, Callable
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('SESSION_STORE_URL', 'memory')
+
+from src.utils import serialization
+from src.mcp.client import MCPClient, MCPMessage
+from src.ai.mangaba_ai_core import MangabaAIResponse
+from src.utils.session_manager import SessionManager
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, default=str).encode('utf-8')
+
+
+def _message_dict(message: MCPMessage) -> dict:
+    return {"jsonrpc": message.jsonrpc, "method": message.method, "params": message.params, "id": message.id}
+
+
+def _samples() -> dict:
+    """Cargas representativas (com acentos, como no uso real)"""
+    batch = [
+        MCPClient._resources_request("dor no peito e falta de ar há 2 dias"),
+        MCPClient._protocols_request(["dor_peito", "respiracao"]),
+        MCPClient._guidelines_request("angina estável")
+    ]
+    for request_id, message in enumerate(batch, 1):
+        message.id = str(request_id)
+
+    response = [
+        {'jsonrpc': '2.0', 'id': '1', 'result': {'resources': [
+            {'uri': f'medico://resources/{i}', 'name': f"Orientação sobre dor torácica nº {i}"} for i in range(10)
+        ]}},
+        {'jsonrpc': '2.0', 'id': '2', 'result': {'protocol': "Ligue imediatamente para o SAMU (192)", 'steps': ["Mantenha a calma"] * 8}},
+        {'jsonrpc': '2.0', 'id': '3', 'result': {'guidelines': ["Hidratação e repouso", "Procure atendimento se piorar"] * 5}}
+    ]
+
+    sessions = SessionManager()
+    session = sessions.create_session(123456789, "Usuária")
+    for turn in range(20):
+        sessions.append_message(session, "user", f"estou com dor de cabeça forte desde ontem ({turn})")
+        sessions.append_message(session, "assistant", "Entendo. Há quanto tempo começou? A dor é pulsátil? " * 4)
+    session.medical_context['clinical_answers'] = {'duration': '2 dias', 'intensity': 7, 'age': 42}
+
+    ai_response = MangabaAIResponse(
+        content="Com base nos sintomas descritos, recomendo procurar atendimento médico. " * 6,
+        confidence=0.82,
+        source='hybrid',
+        emergency_level=2,
+        mcp_data={'resources': response[0]['result']['resources']},
+        follow_up_questions=["Em uma escala de 1 a 10, qual a intensidade da dor?", "Há quanto tempo está com febre?"]
+    )
+
+    event = {
+        'user_id': '123456789', 'query': "tenho febre de 38.5 e tosse seca", 'response_source': 'ai',
+        'confidence': 0.7, 'emergency_level': 1, 'timestamp': time.time()
+    }
+    return {
+        'lote MCP (3 req.)': (batch, lambda: _stdlib_dumps([_message_dict(message) for message in batch])),
+        'resposta MCP': (response, lambda: _stdlib_dumps(response)),
+        'registro de sessão': (session.to_record(), None),
+        'resposta Mangaba AI': (ai_response, lambda: _stdlib_dumps(asdict(ai_response))),
+        'evento médico': (event, None)
+    }
+
+
+def _rate(operation: Callable[[], Any], seconds: float) -> float:
+    """Operações por segundo durante `seconds` segundos"""
+    count = 0
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    while time.perf_counter() < deadline:
+        for _ in range(100):
+            operation()
+        count += 100
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão de codificação/decodificação JSON")
+    parser.add_argument('--seconds', type=float, default=0.5, help="duração de cada medição")
+    args = parser.parse_args()
+
+    print(f"Backend da camada de serialização: {serialization.BACKEND}")
+    print(f"{'carga':>20} {'bytes':>7} | {'codif. padrão':>13} {'codif. nova':>12} {'ganho':>6} | "
+          f"{'decod. padrão':>13} {'decod. nova':>12} {'ganho':>6}")
+
+    for name, (payload, stdlib_encode) in _samples().items():
+        stdlib_encode = stdlib_encode or (lambda payload=payload: _stdlib_dumps(payload))
+        encoded = serialization.dumps(payload)
+
+        encode_old = _rate(stdlib_encode, args.seconds)
+        encode_new = _rate(lambda: serialization.dumps(payload), args.seconds)
+        decode_old = _rate(lambda: json.loads(encoded), args.seconds)
+        decode_new = _rate(lambda: serialization.loads(encoded), args.seconds)
+
+        print(f"{name:>20} {len(encoded):>7} | {encode_old:>11,.0f}/s {encode_new:>10,.0f}/s {encode_new / encode_old:>5.1f}x | "
+              f"{decode_old:>11,.0f}/s {decode_new:>10,.0f}/s {decode_new / decode_old:>5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de memória do histórico de sessões - Médico de Bolso
+
+Compara o histórico anterior (lista de dicts por sessão, recortada com messages[-50:] ao
+passar de 50 mensagens) com o buffer circular MessageHistory (registros MessageRecord):
+    - memória alocada (tracemalloc) para N sessões simultâneas com M mensagens cada;
+    - custo de adicionar uma mensagem com o histórico cheio e de ler as últimas 10.
+
+O conteúdo das mensagens é idêntico nos dois formatos e entra nas duas medições.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.session_memory --sessions 100000 --messages 10
+"""
+
+import os
+import sys
+import gc
+import time
+import argparse
+import tracemalloc
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.utils.message_history import MessageHistory
+
+HISTORY_CAPACITY = 50
+ROLES = ('user', 'assistant')
+
+
+class ListHistory:
+    """Histórico anterior: um dict por mensagem, lista recortada ao passar da capacidade"""
+
+    def __init__(self):
+        self.messages: List[Dict[str, Any]] = []
+
+    def append(self, role: str, content: str):
+        self.messages.append({'role': role, 'content': content, 'timestamp': time.time()})
+        if len(self.messages) > HISTORY_CAPACITY:
+            self.messages = self.messages[-HISTORY_CAPACITY:]
+
+    def last(self, limit: int):
+        return self.messages[-limit:]
+
+
+def _content(session_idx: int, message_idx: int) -> str:
+    return f"estou com dor de cabeça desde ontem ({session_idx}.{message_idx})"
+
+
+def _measure_memory(factory: Callable[[], Any], sessions: int, messages: int) -> int:
+    """Bytes alocados pelos históricos (incluindo o conteúdo das mensagens)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        histories = {}
+        for session_idx in range(sessions):
+            history = factory()
+            for message_idx in range(messages):
+                history.append(ROLES[message_idx % 2], _content(session_idx, message_idx))
+            histories[session_idx] = history
+        current, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del histories
+    gc.collect()
+    return current
+
+
+def _time_per_call(operation: Callable[[], Any], rounds: int) -> float:
+    """Microssegundos por chamada"""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        operation()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memória do histórico de sessões: lista de dicts x buffer circular")
+    parser.add_argument('--sessions', type=int, default=100_000, help="sessões simultâneas")
+    parser.add_argument('--messages', type=int, default=10, help="mensagens por sessão")
+    parser.add_argument('--rounds', type=int, default=200_000, help="chamadas medidas por operação")
+    args = parser.parse_args()
+
+    print(f"Sessões: {args.sessions} | mensagens por sessão: {args.messages}")
+    results = {}
+    for name, factory in (('lista de dicts', ListHistory),
+                          ('buffer circular', lambda: MessageHistory(HISTORY_CAPACITY))):
+        results[name] = _measure_memory(factory, args.sessions, args.messages)
+        print(f"{name:>16}: {results[name] / 1e6:8.1f} MB | {results[name] / args.sessions:7.0f} bytes por sessão")
+    before, after = results['lista de dicts'], results['buffer circular']
+    print(f"{'redução':>16}: {(before - after) / 1e6:8.1f} MB ({1 - after / before:.1%})")
+
+    print(f"\nOperações com o histórico cheio ({HISTORY_CAPACITY} mensagens), µs por chamada:")
+    for name, history in (('lista de dicts', ListHistory()), ('buffer circular', MessageHistory(HISTORY_CAPACITY))):
+        for message_idx in range(HISTORY_CAPACITY):
+            history.append(ROLES[message_idx % 2], _content(0, message_idx))
+        content = _content(0, HISTORY_CAPACITY)
+        append_us = _time_per_call(lambda: history.append('user', content), args.rounds)
+        last_us = _time_per_call(lambda: history.last(10), args.rounds)
+        print(f"{name:>16}: adicionar {append_us:6.2f} | últimas 10 {last_us:6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de escalonamento por partições - Médico de Bolso
+
+Mede a vazão do processamento local de mensagens (triagem, extração de respostas,
+respostas rápidas e montagem do prompt, sem chamadas à IA) com 1..N processos de trabalho.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.shard_scaling --messages 20000 --users 500 --max-workers 4
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Sessões apenas em memória (também herdado pelos processos de trabalho)
+os.environ.setdefault('SESSION_STORE_URL', 'memory')
+
+from src.bot.sharding import ShardRouter
+
+SAMPLE_MESSAGES = [
+    "estou com dor de cabeça forte desde ontem",
+    "tenho febre de 38.5 e tosse seca",
+    "minha garganta está arranhando",
+    "sinto queimação no estômago depois de comer",
+    "tomei dipirona mas a dor continua 7 de 10",
+    "começou há 3 dias, tenho 42 anos",
+    "estou com náusea e tontura",
+    "acordo várias vezes à noite",
+]
+
+
+def _bench_worker(index: int, messages: multiprocessing.Queue, results: multiprocessing.Queue):
+    """Processo de trabalho: pipeline local completo para os usuários da sua partição"""
+    from src.ai.gemini_client import GeminiMedicalAI
+    from src.medical.triage import MedicalTriage
+    from src.medical.answer_extractor import AnswerExtractor
+    from src.utils.session_manager import SessionManager
+
+    gemini_ai = GeminiMedicalAI()
+    triage = MedicalTriage()
+    extractor = AnswerExtractor()
+    sessions = SessionManager()
+    results.put(('ready', index))
+
+    processed = 0
+    while True:
+        item = messages.get()
+        if item is None:
+            break
+        user_id, text = item
+
+        session = sessions.get_session(user_id) or sessions.create_session(user_id)
+        sessions.append_message(session, "user", text)
+        history = session.messages.last(10)
+
+        triage_result = triage.update_conversation_state(session.triage_state, triage.analyze_symptoms(text))
+        answers = extractor.extract(text, extractor.expected_fields(None))
+        if answers:
+            session.medical_context['clinical_answers'] = extractor.merge(
+                session.medical_context.get('clinical_answers', {}), answers
+            )
+        triage_result['clinical_answers'] = session.medical_context.get('clinical_answers', {})
+
+        if gemini_ai.conversation_manager.quick_response_engine.find_quick_response(text) is None:
+            gemini_ai._build_conversation_context(text, history, triage_result, session.conversation)
+        sessions.append_message(session, "assistant", "ok")
+        processed += 1
+
+    results.put(('done', processed))
+
+
+async def _run(workers: int, total_messages: int, users: int) -> float:
+    """Executa uma rodada e retorna a vazão (mensagens por segundo)"""
+    results = multiprocessing.get_context('spawn').Queue()
+    router = ShardRouter(workers, _bench_worker, results, queue_size=10000)
+    router.start()
+
+    # Aguardar a inicialização de todos os processos antes de medir
+    for _ in range(workers):
+        results.get()
+
+    started = time.perf_counter()
+    for sequence in range(total_messages):
+        user_id = sequence % users
+        # Sufixo variável evita que o cache de triagem transforme a rodada em consultas de memória
+        text = f"{SAMPLE_MESSAGES[sequence % len(SAMPLE_MESSAGES)]} ({sequence})"
+        await router.route(user_id, (user_id, text))
+
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, router.stop)
+    processed = sum(results.get()[1] for _ in range(workers))
+    elapsed = time.perf_counter() - started
+
+    assert processed == total_messages, f"{processed} de {total_messages} mensagens processadas"
+    return total_messages / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão do processamento local por número de processos")
+    parser.add_argument('--messages', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"CPUs disponíveis: {os.cpu_count()} | mensagens: {args.messages} | usuários: {args.users}")
+    print(f"{'processos':>10} {'msg/s':>10} {'ganho':>8}")
+
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        throughput = asyncio.run(_run(workers, args.messages, args.users))
+        baseline = baseline or throughput
+        print(f"{workers:>10} {throughput:>10.0f} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
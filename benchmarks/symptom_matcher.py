@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark do casamento de sintomas - Médico de Bolso
+
+Compara o SymptomMatcher (tolerante a acentos, plurais e erros de digitação) com o casamento
+exato original (`expressão in mensagem.lower()`) nos quatro vocabulários da triagem:
+    - recall: categorias esperadas encontradas, em mensagens exatas, sem acentos, no plural
+      e com um erro de digitação;
+    - falsos positivos: mensagens sem sintomas (desculpas, agradecimentos, estado civil, frases com
+      palavras vizinhas do vocabulário) com alguma categoria encontrada, por vocabulário;
+    - latência p50/p95 por mensagem (os quatro vocabulários), curtas e de ~300 caracteres.
+
+Uso (a partir da raiz do projeto):
+    python -m benchmarks.symptom_matcher --rounds 2000
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from typing import Callable, Dict, List, Set, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.medical.triage import MedicalTriage
+from src.medical.symptom_matcher import SymptomMatcher, fold_text, _prepare
+
+TEMPLATES = [
+    "estou com {} desde ontem",
+    "oi, {} e não sei o que fazer",
+    "minha mãe está com {} há dois dias",
+]
+
+# Mensagens sem sintomas, muitas com palavras a uma edição do vocabulário (confusão/confuso,
+# casado/cansado, gravada/gravidez, tanto/tonto, cansei/cansado, idosa/idoso)
+NEGATIVE_MESSAGES = [
+    # conversa geral
+    "bom dia, tudo bem com você?",
+    "quero marcar uma consulta de rotina para a semana que vem",
+    "qual o horário de funcionamento do posto de saúde?",
+    "tenho uma dúvida sobre vacinas para viagem internacional",
+    "meu filho quer saber se pode praticar esportes na escola",
+    "preciso de um atestado para o trabalho amanhã cedo",
+    "a farmácia perto de casa fecha às dez da noite",
+    # desculpas e agradecimentos
+    "desculpe a confusão",
+    "obrigada pela confusão resolvida",
+    "foi mal pela confusão de horários",
+    "obrigado por tanto carinho",
+    "obrigada, vocês ajudaram tanto",
+    "valeu, tanto faz o horário",
+    "obrigado pela ajuda, vou seguir as orientações",
+    # estado civil e família
+    "sou casado há dez anos",
+    "sou casada e tenho dois filhos",
+    "o casamento da minha irmã é sábado",
+    "minha vizinha é uma senhora idosa muito simpática",
+    # frases do dia a dia
+    "mandei uma mensagem gravada ontem",
+    "o áudio ficou gravado pela metade",
+    "cansei de esperar na fila do banco",
+    "ele cansou de ligar e desistiu",
+    "comprei uma gravata nova para a festa",
+    "entendo a gravidade da situação política",
+    "o restante do pagamento fica para o mês que vem",
+    "que confusão no trânsito hoje",
+    "fiquei confusa com o horário da reunião",
+]
+LONG_FILLER = (
+    "olá, bom dia. desculpe a mensagem longa, mas quero explicar direito o que está acontecendo "
+    "comigo nos últimos dias, porque fiquei preocupado e não consegui falar com meu médico. "
+)
+
+# Plurais comuns das palavras dos vocabulários
+PLURALS = {'dor': 'dores', 'febre': 'febres', 'vômito': 'vômitos', 'sangramento': 'sangramentos',
+           'convulsão': 'convulsões', 'peito': 'peitos'}
+
+
+VOCABULARY_NAMES = ('emergência', 'alerta', 'comuns', 'risco')
+
+
+def _vocabularies(triage: MedicalTriage) -> List[Dict[str, List[str]]]:
+    return [triage.emergency_keywords, triage.warning_symptoms, triage.common_symptoms, triage.risk_keywords]
+
+
+class ExactMatcher:
+    """Casamento original: expressão contida na mensagem em minúsculas"""
+
+    def __init__(self, keyword_dict: Dict[str, List[str]]):
+        self.keyword_dict = keyword_dict
+
+    def match(self, message: str) -> List[str]:
+        message_lower = message.lower()
+        return [
+            category for category, keywords in self.keyword_dict.items()
+            if any(keyword in message_lower for keyword in keywords)
+        ]
+
+
+def _typo(phrase: str, rng: random.Random) -> str:
+    """Um erro de digitação (troca, omissão ou duplicação) na maior palavra, após a 2ª letra"""
+    words = phrase.split()
+    index = max(range(len(words)), key=lambda i: len(words[i]))
+    word = words[index]
+    if len(word) < 5:
+        return phrase
+    position = rng.randrange(2, len(word) - 1)
+    kind = rng.choice(('swap', 'drop', 'double'))
+    if kind == 'swap':
+        word = word[:position] + word[position + 1] + word[position] + word[position + 2:]
+    elif kind == 'drop':
+        word = word[:position] + word[position + 1:]
+    else:
+        word = word[:position] + word[position] + word[position:]
+    words[index] = word
+    return ' '.join(words)
+
+
+def _plural(phrase: str) -> str:
+    return ' '.join(PLURALS.get(word, word) for word in phrase.split())
+
+
+def _cases(vocabularies: List[Dict[str, List[str]]], rng: random.Random) -> Dict[str, List[Tuple[str, int, str]]]:
+    """Mensagens por variante: (mensagem, vocabulário, categoria esperada)"""
+    cases: Dict[str, List[Tuple[str, int, str]]] = {'exata': [], 'sem acentos': [], 'plural': [], 'erro de digitação': []}
+    for vocab_idx, vocabulary in enumerate(vocabularies):
+        for category, keywords in vocabulary.items():
+            for keyword in keywords:
+                for template in TEMPLATES:
+                    cases['exata'].append((template.format(keyword), vocab_idx, category))
+                    if fold_text(keyword) != keyword.lower():
+                        cases['sem acentos'].append((template.format(fold_text(keyword)), vocab_idx, category))
+                    if _plural(keyword) != keyword:
+                        cases['plural'].append((template.format(_plural(keyword)), vocab_idx, category))
+                    typo = _typo(keyword, rng)
+                    if typo != keyword:
+                        cases['erro de digitação'].append((template.format(typo), vocab_idx, category))
+    return cases
+
+
+def _recall(matchers: List, cases: List[Tuple[str, int, str]]) -> float:
+    hits = sum(category in matchers[vocab_idx].match(message) for message, vocab_idx, category in cases)
+    return hits / len(cases) if cases else 0.0
+
+
+def _false_positives(matcher) -> List[str]:
+    """Mensagens sem sintomas em que o vocabulário encontrou alguma categoria"""
+    return [message for message in NEGATIVE_MESSAGES if matcher.match(message)]
+
+
+def _latency(matchers: List, messages: List[str], rounds: int) -> Tuple[float, float]:
+    """p50/p95 (ms) de uma mensagem nos quatro vocabulários"""
+    samples = []
+    for i in range(rounds):
+        message = messages[i % len(messages)]
+        # Mensagens reais não se repetem: a preparação memorizada vale só dentro da mesma mensagem
+        _prepare.cache_clear()
+        started = time.perf_counter()
+        for matcher in matchers:
+            matcher.match(message)
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall e latência do casamento de sintomas")
+    parser.add_argument('--rounds', type=int, default=2000, help="mensagens medidas por cenário de latência")
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabularies = _vocabularies(MedicalTriage())
+    exact = [ExactMatcher(vocabulary) for vocabulary in vocabularies]
+    fuzzy = [SymptomMatcher(vocabulary) for vocabulary in vocabularies]
+
+    print(f"{'variante':>18} {'casos':>6} | {'recall exato':>12} {'recall novo':>12}")
+    for variant, cases in _cases(vocabularies, rng).items():
+        print(f"{variant:>18} {len(cases):>6} | {_recall(exact, cases):>12.1%} {_recall(fuzzy, cases):>12.1%}")
+
+    print(f"\n{'falsos positivos':>18} {'msgs':>6} | {'exato':>12} {'novo':>12}   (mensagens sem sintomas com categoria)")
+    for name, exact_matcher, fuzzy_matcher in zip(VOCABULARY_NAMES, exact, fuzzy):
+        exact_hits, fuzzy_hits = _false_positives(exact_matcher), _false_positives(fuzzy_matcher)
+        print(f"{name:>18} {len(NEGATIVE_MESSAGES):>6} | {len(exact_hits):>12} {len(fuzzy_hits):>12}")
+        for message in fuzzy_hits:
+            print(f"{'':>18} {'':>6} |   novo: {message!r}")
+    emergency_hits = _false_positives(fuzzy[0])
+    print(f"  emergência (envia SAMU 192): {len(emergency_hits)} de {len(NEGATIVE_MESSAGES)} mensagens sem sintomas")
+
+    short_messages = [template.format(symptom) for template in TEMPLATES
+                      for symptom in ("dor no peitu", "febri alta", "tosse", "nada de especial")]
+    long_messages = [(LONG_FILLER + message + ". " + LONG_FILLER)[:300] for message in short_messages]
+
+    print(f"\n{'mensagem':>18} | {'exato p50':>9} {'p95':>7} | {'novo p50':>9} {'p95':>7}  (ms, 4 vocabulários)")
+    for name, messages in (('curta', short_messages), ('300 caracteres', long_messages)):
+        exact_p50, exact_p95 = _latency(exact, messages, args.rounds)
+        fuzzy_p50, fuzzy_p95 = _latency(fuzzy, messages, args.rounds)
+        print(f"{name:>18} | {exact_p50:>9.3f} {exact_p95:>7.3f} | {fuzzy_p50:>9.3f} {fuzzy_p95:>7.3f}")
+
+
+if __name__ == "__main__":
+    main()
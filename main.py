@@ -9,11 +9,17 @@ Powered by Mangaba AI - Sistema de IA Médica Avançado
 
 import asyncio
 import logging
-from telegram.ext import Application, CommandHandler, MessageHandler, filters
+from telegram.ext import Application
 
 # Importações tradicionais (mantidas para compatibilidade)
-from src.bot.handlers import start_handler, help_handler, medical_consultation_handler, status_handler, reset_handler
-from src.config.settings import TELEGRAM_BOT_TOKEN
+from src.bot.handlers import register_handlers, start_background_tasks, stop_background_tasks, drain_pending_messages
+from src.bot.handlers import ingress_tracker
+from src.bot.ingress import StampedUpdateQueue
+from src.bot.webhook import run_application
+from src.bot.sharding import run_sharded
+from src.bot.concurrency import PerUserUpdateProcessor
+from src.config.settings import TELEGRAM_BOT_TOKEN, BOT_WORKERS, SHARD_QUEUE_SIZE
+from src.config.settings import MAX_CONCURRENT_UPDATES, MAX_PENDING_UPDATES
 from src.utils.logger import setup_logger
 
 # Demonstração do alias mangaba_ai (opcional para marketing)
@@ -42,20 +48,31 @@ def main():
         # Demonstrar branding Mangaba AI
         demonstrar_mangaba_ai()
         
+        # Modo particionado: este processo apenas distribui as atualizações
+        if BOT_WORKERS > 1:
+            logger.info(f"Médico de Bolso iniciado com {BOT_WORKERS} processos de trabalho")
+            run_sharded(TELEGRAM_BOT_TOKEN, BOT_WORKERS, SHARD_QUEUE_SIZE)
+            return
+        
         # Criar aplicação do bot
-        application = Application.builder().token(TELEGRAM_BOT_TOKEN).build()
+        application = (
+            Application.builder()
+            .token(TELEGRAM_BOT_TOKEN)
+            .update_queue(StampedUpdateQueue(ingress_tracker))
+            .concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES, MAX_PENDING_UPDATES))
+            .post_init(start_background_tasks)
+            .post_stop(drain_pending_messages)
+            .post_shutdown(stop_background_tasks)
+            .build()
+        )
         
         # Adicionar handlers (pode usar mangaba_ai.start_handler alternativamente)
-        application.add_handler(CommandHandler("start", start_handler))
-        application.add_handler(CommandHandler("help", help_handler))
-        application.add_handler(CommandHandler("status", status_handler))
-        application.add_handler(CommandHandler("reset", reset_handler))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, medical_consultation_handler))
+        register_handlers(application)
         
         logger.info("Médico de Bolso iniciado com sucesso!")
         
-        # Iniciar o bot
-        application.run_polling()
+        # Iniciar o bot (polling ou webhook, conforme BOT_MODE)
+        run_application(application)
         
     except Exception as e:
         logger.error(f"Erro ao inicializar o bot: {e}")
@@ -12,6 +12,7 @@ from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
 from src.ai.quick_responses import QuickResponseEngine
+from src.medical.answer_extractor import AnswerExtractor
 
 logger = logging.getLogger(__name__)
 
@@ -120,29 +121,36 @@ class ContextAgent:
             "breathing": ["respirar", "falta de ar", "sufoco", "ofegante"]
         }
     
+    @staticmethod
+    def new_context(user_id: str) -> ConversationContext:
+        """Cria um contexto de conversação vazio"""
+        return ConversationContext(
+            user_id=user_id,
+            message_count=0,
+            urgency_level="BAIXO",
+            symptoms=[],
+            conversation_mode=ConversationMode.QUICK,
+            last_response_time=0.0,
+            user_preferences={},
+            session_duration=0.0
+        )
+    
     def get_or_create_context(self, user_id: str) -> ConversationContext:
-        """Obtém ou cria contexto para usuário"""
-        if user_id not in self.user_contexts:
-            self.user_contexts[user_id] = ConversationContext(
-                user_id=user_id,
-                message_count=0,
-                urgency_level="BAIXO",
-                symptoms=[],
-                conversation_mode=ConversationMode.QUICK,
-                last_response_time=0.0,
-                user_preferences={},
-                session_duration=0.0
-            )
-        return self.user_contexts[user_id]
+        """Obtém ou cria contexto para usuário (para chamadas sem sessão própria)"""
+        context = self.user_contexts.get(user_id)
+        if context is None:
+            context = self.user_contexts[user_id] = self.new_context(user_id)
+        return context
     
-    def update_context(self, user_id: str, message: str, urgency_level: str = None):
+    def update_context(self, context: ConversationContext, message: str, urgency_level: str = None):
         """Atualiza contexto baseado na mensagem"""
-        context = self.get_or_create_context(user_id)
         context.message_count += 1
         
         # Detectar sintomas na mensagem
         detected_symptoms = self._detect_symptoms(message)
-        context.symptoms.extend(detected_symptoms)
+        for symptom in detected_symptoms:
+            if symptom not in context.symptoms:
+                context.symptoms.append(symptom)
         
         # Atualizar nível de urgência se fornecido
         if urgency_level:
@@ -196,6 +204,14 @@ class FlowAgent:
                 "next_flow": "followup"
             }
         }
+        
+        # Dados clínicos coletados localmente, na ordem em que são perguntados
+        self.data_questions = [
+            ("duration_hours", "Há quanto tempo isso começou?"),
+            ("pain_scale", "Qual a intensidade de 0 a 10?"),
+            ("medications", "Você tomou algum medicamento? Qual?"),
+            ("age_years", "Qual a sua idade?")
+        ]
     
     def get_next_question(self, context: ConversationContext, current_flow: str = "initial") -> Optional[str]:
         """Retorna próxima pergunta baseada no fluxo"""
@@ -209,6 +225,16 @@ class FlowAgent:
                 return questions[question_index]
         
         return None
+    
+    def get_next_data_question(self, collected: Dict[str, Any]) -> Optional[str]:
+        """Retorna a próxima pergunta sobre um dado clínico ainda não informado
+        
+        Basta a chave estar presente: uma negativa ("medications": []) também conta como resposta.
+        """
+        for field_name, question in self.data_questions:
+            if field_name not in collected:
+                return question
+        return None
 
 class ConversationManager:
     """Gerenciador principal dos agentes de conversação"""
@@ -218,18 +244,57 @@ class ConversationManager:
         self.context_agent = ContextAgent()
         self.flow_agent = FlowAgent()
         self.quick_response_engine = QuickResponseEngine()
+        self.answer_extractor = AnswerExtractor()
         
-    async def process_message(self, user_id: str, message: str, triage_data: Dict = None) -> Tuple[str, bool]:
-        """Processa mensagem e retorna resposta dinâmica otimizada"""
-        # Atualizar contexto
-        urgency_level = triage_data.get('urgency_level') if triage_data else None
-        self.context_agent.update_context(user_id, message, urgency_level)
+    async def process_message(
+        self,
+        user_id: str,
+        message: str,
+        triage_data: Dict = None,
+        context: Optional[ConversationContext] = None
+    ) -> Tuple[str, bool]:
+        """Processa mensagem e retorna resposta dinâmica otimizada
+        
+        O contexto normalmente vem do estado do usuário (UserSession.conversation);
+        sem ele, é usado o registro interno do ContextAgent.
+        """
+        context = self.begin_message(user_id, message, triage_data, context)
+        return self.decide_response(message, context, triage_data)
+    
+    def begin_message(
+        self,
+        user_id: str,
+        message: str,
+        triage_data: Dict = None,
+        context: Optional[ConversationContext] = None
+    ) -> ConversationContext:
+        """Incorpora a mensagem ao contexto (a partir daqui o prompt da IA completa já pode ser montado)"""
+        if context is None:
+            context = self.context_agent.get_or_create_context(user_id)
         
-        context = self.context_agent.get_or_create_context(user_id)
+        urgency_level = triage_data.get('urgency_level') if triage_data else None
+        self.context_agent.update_context(context, message, urgency_level)
+        return context
+    
+    def decide_response(
+        self,
+        message: str,
+        context: ConversationContext,
+        triage_data: Dict = None
+    ) -> Tuple[str, bool]:
+        """Decide localmente entre resposta rápida e IA completa: (resposta, precisa_de_ia_completa)"""
+        # Respostas diretas às perguntas de acompanhamento ("38,5", "uns 3 dias", "8")
+        answer_response = self._answer_follow_up_locally(message, context, triage_data)
+        if answer_response:
+            return answer_response, False
         
         # Primeiro: verificar respostas rápidas do novo sistema
         quick_response = self.quick_response_engine.get_contextual_response(message, context.message_count)
         
+        # Respostas do FAQ são orientações gerais: não valem quando a triagem indica gravidade
+        if quick_response and quick_response.source == "faq" and context.urgency_level in ["EMERGÊNCIA", "URGENTE"]:
+            quick_response = None
+        
         if quick_response:
             # Se é emergência, sempre usar IA completa também
             if quick_response.urgency_level == "EMERGÊNCIA":
@@ -272,6 +337,58 @@ class ConversationManager:
         # Para conversas mais complexas, usar IA completa
         return "", True
     
+    def _answer_follow_up_locally(
+        self,
+        message: str,
+        context: ConversationContext,
+        triage_data: Optional[Dict]
+    ) -> Optional[str]:
+        """Registra a resposta e avança para a próxima pergunta sem usar a IA completa"""
+        if not triage_data or not triage_data.get('new_answers'):
+            return None
+        
+        new_answers = triage_data['new_answers']
+        if context.urgency_level in ["EMERGÊNCIA", "URGENTE"]:
+            return None
+        if not self.answer_extractor.is_direct_answer(message) or self.answer_extractor.has_alarm_values(new_answers):
+            return None
+        
+        # Com todos os dados coletados, a IA completa faz a análise final
+        next_question = self.flow_agent.get_next_data_question(triage_data.get('clinical_answers', new_answers))
+        if not next_question:
+            return None
+        
+        return f"Anotado: {self.answer_extractor.describe(new_answers)}. 📝 {next_question}"
+    
+    def emergency_instructions(
+        self,
+        message: str,
+        context: ConversationContext,
+        triage_data: Dict = None
+    ) -> Optional[str]:
+        """Instruções locais de emergência, enviadas antes da orientação da IA completa
+        
+        Considera apenas a mensagem atual (respostas rápidas ou triagem da mensagem): mensagens
+        seguintes de uma conversa que já foi de emergência não repetem as instruções.
+        """
+        quick_response = self.quick_response_engine.find_quick_response(message)
+        quick_emergency = quick_response is not None and quick_response.urgency_level == "EMERGÊNCIA"
+        message_urgency = None
+        if triage_data:
+            message_urgency = triage_data.get('message_urgency_level', triage_data.get('urgency_level'))
+        if not quick_emergency and message_urgency != "EMERGÊNCIA":
+            return None
+        
+        lines = [quick_response.response if quick_emergency else "🚨 EMERGÊNCIA MÉDICA! Procure atendimento IMEDIATO!"]
+        recommendations = []
+        if triage_data and triage_data.get('urgency_level') == "EMERGÊNCIA":
+            recommendations = list(triage_data.get('recommendations') or [])
+        if not any('192' in recommendation for recommendation in recommendations):
+            recommendations.insert(0, "📞 Ligue agora para o SAMU (192)")
+        lines.extend(recommendations)
+        lines.append("⏳ Estou preparando orientações mais detalhadas e envio em seguida.")
+        return "\n\n".join(lines)
+    
     def _detect_message_category(self, message: str) -> Optional[str]:
         """Detecta categoria da mensagem"""
         message_lower = message.lower()
@@ -290,9 +407,16 @@ class ConversationManager:
         
         return None
     
+    def forget_user(self, user_id: str):
+        """Remove o contexto de conversação do usuário (ao finalizar a sessão)"""
+        self.context_agent.user_contexts.pop(user_id, None)
+    
     def get_conversation_stats(self, user_id: str) -> Dict:
         """Retorna estatísticas da conversação"""
-        context = self.context_agent.get_or_create_context(user_id)
+        return self.get_context_stats(self.context_agent.get_or_create_context(user_id))
+    
+    def get_context_stats(self, context: ConversationContext) -> Dict:
+        """Retorna estatísticas de um contexto de conversação"""
         return {
             "message_count": context.message_count,
             "urgency_level": context.urgency_level,
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice Semântico de FAQ - Médico de Bolso
+Banco de respostas validadas com busca por similaridade (vetorização por hashing + cosseno)
+
+Construção offline do índice (parte da implantação; o bot apenas carrega o índice pronto):
+    python -m src.ai.faq_index                       # caminhos das configurações
+    python -m src.ai.faq_index <banco.json> <diretorio_indice>
+"""
+
+import os
+import re
+import sys
+import json
+import zlib
+import shutil
+import hashlib
+import logging
+import tempfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+
+from src.medical.symptom_matcher import fold_text
+
+logger = logging.getLogger(__name__)
+
+# Número de posições do vetor esparso (2^18 torna colisões de hashing raras)
+HASH_DIMENSIONS = 1 << 18
+
+_TOKEN_PATTERN = re.compile(r'[a-z]{2,}')
+_STEM_LENGTH = 5
+_STOPWORDS = frozenset({
+    'de', 'da', 'do', 'das', 'dos', 'em', 'no', 'na', 'nos', 'nas', 'um', 'uma', 'uns', 'umas',
+    'eu', 'me', 'meu', 'minha', 'meus', 'minhas', 'se', 'que', 'com', 'por', 'para', 'pra',
+    'esta', 'estou', 'estar', 'ta', 'to', 'muito', 'mais', 'mas', 'ou', 'os', 'as', 'ao',
+    'ja', 'tem', 'tenho', 'ando', 'fico', 'fiquei', 'sinto', 'depois', 'desde', 'todo'
+})
+
+# Busca com pontuações compactas (só linhas tocadas) quando as listas percorridas têm menos de
+# 1/64 das linhas do índice; acima disso, np.unique (ordenação) custa mais que o bincount denso
+COMPACT_SCORING_RATIO = 64
+
+_ARRAY_FILES = ('indptr', 'rows', 'weights', 'idf', 'row_entry')
+
+
+@dataclass
+class FAQMatch:
+    """Resposta validada encontrada no índice"""
+    entry_id: str
+    answer: str
+    follow_up_question: Optional[str]
+    urgency_level: str
+    similarity: float
+
+
+def _feature_buckets(text: str) -> Dict[int, float]:
+    """Extrai características (palavras, radicais e pares de radicais) como posições de hashing"""
+    tokens = [token for token in _TOKEN_PATTERN.findall(fold_text(text)) if token not in _STOPWORDS]
+    stems = [token[:_STEM_LENGTH] for token in tokens]
+
+    features = [f"w:{token}" for token in tokens]
+    features += [f"s:{stem}" for stem in stems]
+    features += [f"b:{first}_{second}" for first, second in zip(stems, stems[1:])]
+
+    buckets: Dict[int, float] = {}
+    for feature in features:
+        # crc32 é estável entre processos (hash() do Python é aleatorizado por processo)
+        bucket = zlib.crc32(feature.encode('ascii')) % HASH_DIMENSIONS
+        buckets[bucket] = buckets.get(bucket, 0.0) + 1.0
+    return buckets
+
+
+def bank_version(bank_path: str) -> str:
+    """Versão do banco de respostas (hash do conteúdo)"""
+    with open(bank_path, 'rb') as bank_file:
+        return hashlib.sha1(bank_file.read()).hexdigest()[:12]
+
+
+def build_index(bank_path: str, index_dir: str) -> int:
+    """Constrói o índice (matriz esparsa transposta, vetores normalizados) e salva em disco
+
+    O índice é escrito em um diretório temporário ao lado do destino e trocado de lugar com
+    os.replace: um leitor nunca vê um índice pela metade, e processos que já mapearam o
+    índice anterior continuam com os arquivos antigos (o sistema só os libera ao fechar).
+    """
+    with open(bank_path, encoding='utf-8') as bank_file:
+        entries = json.load(bank_file)
+
+    row_features: List[Dict[int, float]] = []
+    row_entry: List[int] = []
+    for entry_idx, entry in enumerate(entries):
+        for question in entry['questions']:
+            row_features.append(_feature_buckets(question))
+            row_entry.append(entry_idx)
+
+    # IDF suavizado: características comuns a muitas perguntas pesam menos
+    document_frequency: Dict[int, int] = {}
+    for features in row_features:
+        for bucket in features:
+            document_frequency[bucket] = document_frequency.get(bucket, 0) + 1
+    n_rows = len(row_features)
+    idf = np.ones(HASH_DIMENSIONS, dtype=np.float32) * np.float32(np.log(n_rows + 1) + 1)
+    for bucket, frequency in document_frequency.items():
+        idf[bucket] = np.log((n_rows + 1) / (frequency + 1)) + 1
+
+    # Lista invertida: para cada posição, as linhas que a contêm e o peso normalizado
+    postings: Dict[int, List[tuple]] = {}
+    for row_idx, features in enumerate(row_features):
+        weighted = {bucket: count * idf[bucket] for bucket, count in features.items()}
+        norm = float(np.sqrt(sum(value * value for value in weighted.values()))) or 1.0
+        for bucket, value in weighted.items():
+            postings.setdefault(bucket, []).append((row_idx, value / norm))
+
+    indptr = np.zeros(HASH_DIMENSIONS + 1, dtype=np.int64)
+    rows: List[int] = []
+    weights: List[float] = []
+    for bucket in range(HASH_DIMENSIONS):
+        for row_idx, weight in postings.get(bucket, ()):
+            rows.append(row_idx)
+            weights.append(weight)
+        indptr[bucket + 1] = len(rows)
+
+    index_dir = os.path.abspath(index_dir)
+    parent_dir = os.path.dirname(index_dir)
+    os.makedirs(parent_dir, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix='.faq_index-', dir=parent_dir)
+    try:
+        os.chmod(build_dir, 0o755)  # mkdtemp cria com 0o700; o índice é lido por outros processos
+        _write_index(build_dir, bank_path, entries, row_entry, indptr, rows, weights, idf)
+        _swap_into_place(build_dir, index_dir)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Índice de FAQ construído: {len(entries)} respostas, {n_rows} perguntas")
+    return n_rows
+
+
+def _write_index(index_dir: str, bank_path: str, entries: List[Dict[str, Any]], row_entry: List[int],
+                 indptr: np.ndarray, rows: List[int], weights: List[float], idf: np.ndarray):
+    """Grava as matrizes e os metadados do índice em `index_dir`"""
+    arrays = {
+        'indptr': indptr,
+        'rows': np.asarray(rows, dtype=np.int32),
+        'weights': np.asarray(weights, dtype=np.float32),
+        'idf': idf,
+        'row_entry': np.asarray(row_entry, dtype=np.int32)
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(index_dir, f"{name}.npy"), array)
+
+    meta = {
+        'version': bank_version(bank_path),
+        'dimensions': HASH_DIMENSIONS,
+        'entries': [
+            {
+                'id': entry['id'],
+                'answer': entry['answer'],
+                'follow_up_question': entry.get('follow_up_question'),
+                'urgency_level': entry.get('urgency_level', 'BAIXO')
+            }
+            for entry in entries
+        ]
+    }
+    with open(os.path.join(index_dir, 'meta.json'), 'w', encoding='utf-8') as meta_file:
+        json.dump(meta, meta_file, ensure_ascii=False)
+
+
+def _swap_into_place(build_dir: str, index_dir: str):
+    """Move o índice recém-construído para o destino (os.replace não sobrescreve diretório com arquivos)"""
+    previous_dir = None
+    if os.path.exists(index_dir):
+        previous_dir = tempfile.mkdtemp(prefix='.faq_index-old-', dir=os.path.dirname(index_dir))
+        os.replace(index_dir, os.path.join(previous_dir, 'index'))
+    try:
+        os.replace(build_dir, index_dir)
+    except OSError:
+        if previous_dir:
+            os.replace(os.path.join(previous_dir, 'index'), index_dir)
+        raise
+    finally:
+        if previous_dir:
+            shutil.rmtree(previous_dir, ignore_errors=True)
+
+
+class FAQIndex:
+    """Índice de respostas validadas, mapeado em memória (compartilhado entre processos)"""
+
+    def __init__(self, index_dir: str):
+        """Carrega o índice com mmap: as páginas são compartilhadas pelo sistema operacional"""
+        with open(os.path.join(index_dir, 'meta.json'), encoding='utf-8') as meta_file:
+            meta = json.load(meta_file)
+
+        self.version = meta['version']
+        self.entries: List[Dict[str, Any]] = meta['entries']
+        arrays = {
+            name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode='r')
+            for name in _ARRAY_FILES
+        }
+        self.indptr = arrays['indptr']
+        self.rows = arrays['rows']
+        self.weights = arrays['weights']
+        self.idf = arrays['idf']
+        self.row_entry = arrays['row_entry']
+        self.n_rows = len(self.row_entry)
+
+    @classmethod
+    def load(cls, bank_path: str, index_dir: str) -> Optional['FAQIndex']:
+        """Carrega o índice pronto (não constrói: a construção é feita com python -m src.ai.faq_index)"""
+        try:
+            index = cls(index_dir)
+        except FileNotFoundError:
+            logger.warning(f"Índice de FAQ não encontrado em {index_dir}; construa com: python -m src.ai.faq_index")
+            return None
+        except Exception as e:
+            logger.warning(f"Índice de FAQ indisponível: {e}")
+            return None
+
+        try:
+            if bank_version(bank_path) != index.version:
+                logger.warning("Índice de FAQ desatualizado em relação ao banco; "
+                               "reconstrua com: python -m src.ai.faq_index")
+        except OSError as e:
+            logger.warning(f"Banco de FAQ não verificado: {e}")
+
+        logger.info(f"Índice de FAQ carregado ({len(index.entries)} respostas, versão {index.version})")
+        return index
+
+    def search(self, message: str, threshold: float) -> Optional[FAQMatch]:
+        """Retorna a resposta validada mais similar, se acima do limiar"""
+        buckets = _feature_buckets(message)
+        if not buckets or not self.n_rows:
+            return None
+
+        bucket_ids = np.fromiter(buckets.keys(), dtype=np.int64, count=len(buckets))
+        query = np.fromiter(buckets.values(), dtype=np.float32, count=len(buckets)) * self.idf[bucket_ids]
+        query /= np.linalg.norm(query)
+
+        # Produto escalar esparso: percorre apenas as listas das posições presentes na consulta
+        # (fatias contíguas do mmap, sem vetor de índices por entrada)
+        starts = self.indptr[bucket_ids].tolist()
+        ends = self.indptr[bucket_ids + 1].tolist()
+        present = [idx for idx in range(len(starts)) if ends[idx] > starts[idx]]
+        if not present:
+            return None
+        rows = np.concatenate([self.rows[starts[idx]:ends[idx]] for idx in present])
+        contributions = np.concatenate([self.weights[starts[idx]:ends[idx]] * query[idx] for idx in present])
+
+        if len(rows) * COMPACT_SCORING_RATIO < self.n_rows:
+            # Poucas linhas tocadas: pontuações em ids compactos, sem vetor do tamanho do índice
+            touched_rows, compact_ids = np.unique(rows, return_inverse=True)
+            scores = np.bincount(compact_ids, weights=contributions)
+            best = int(scores.argmax())
+            best_row = int(touched_rows[best])
+        else:
+            # Boa parte do índice tocada: ordenar as linhas custaria mais que o vetor denso
+            scores = np.bincount(rows, weights=contributions, minlength=self.n_rows)
+            best = best_row = int(scores.argmax())
+        similarity = float(scores[best])
+        if similarity < threshold:
+            return None
+
+        entry = self.entries[int(self.row_entry[best_row])]
+        return FAQMatch(
+            entry_id=entry['id'],
+            answer=entry['answer'],
+            follow_up_question=entry.get('follow_up_question'),
+            urgency_level=entry['urgency_level'],
+            similarity=round(similarity, 3)
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) == 3:
+        build_index(sys.argv[1], sys.argv[2])
+    elif len(sys.argv) == 1:
+        from src.config.settings import FAQ_BANK_PATH, FAQ_INDEX_DIR
+        build_index(FAQ_BANK_PATH, FAQ_INDEX_DIR)
+    else:
+        print("Uso: python -m src.ai.faq_index [<banco.json> <diretorio_indice>]")
+        sys.exit(1)
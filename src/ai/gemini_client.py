@@ -10,12 +10,18 @@ import logging
 import asyncio
 import time
 import google.generativeai as genai
-from typing import List, Dict, Any, Optional, Tuple
+from collections import deque
+from typing import List, Dict, Any, Optional, Tuple, Sequence, Deque, Callable, Awaitable
 from src.config.settings import GEMINI_API_KEYS, GEMINI_MODELS
-from src.ai.conversation_agents import ConversationManager
+from src.config.settings import GEMINI_SPECULATIVE_PREFETCH, GEMINI_SPECULATION_BUDGET
+from src.ai.conversation_agents import ConversationManager, ConversationContext
+from src.utils.message_history import MessageRecord
 
 logger = logging.getLogger(__name__)
 
+# Janela (segundos) do orçamento de chamadas especulativas
+SPECULATION_WINDOW = 60.0
+
 class GeminiMedicalAI:
     """Cliente para integração com Gemini AI com sistema de fallback"""
     
@@ -32,6 +38,12 @@ class GeminiMedicalAI:
         # Initialize conversation manager for dynamic responses
         self.conversation_manager = ConversationManager()
         
+        # Prefetch especulativo: orçamento por janela e métricas de acerto/desperdício
+        self.speculative_prefetch = GEMINI_SPECULATIVE_PREFETCH
+        self.speculation_budget = GEMINI_SPECULATION_BUDGET
+        self._speculation_starts: Deque[float] = deque()
+        self.speculation_stats = {'started': 0, 'hits': 0, 'wasted': 0, 'over_budget': 0}
+        
         # Initialize first working combination
         self.current_client = None
         self._initialize_client()
@@ -166,23 +178,77 @@ Lembre-se: Você é um assistente inteligente de triagem que se adapta ao usuár
         self, 
         user_message: str, 
         user_id: str = None,
-        session_history: List[Dict[str, Any]] = None,
-        triage_data: Dict[str, Any] = None
+        session_history: Sequence[MessageRecord] = None,
+        triage_data: Dict[str, Any] = None,
+        conversation_context: Optional[ConversationContext] = None,
+        on_emergency: Optional[Callable[[str], Awaitable[Any]]] = None
     ) -> str:
-        """Processa consulta médica usando Gemini AI com sistema de fallback e agentes de conversação"""
+        """Processa consulta médica usando Gemini AI com sistema de fallback e agentes de conversação
+        
+        Em emergências, `on_emergency` recebe as instruções locais (SAMU 192, recomendações da
+        triagem) assim que a decisão local é tomada; a resposta retornada é a orientação da IA.
+        """
+        
+        # Contexto de conversação do estado do usuário (ou do registro interno, sem sessão)
+        if user_id and conversation_context is None:
+            conversation_context = self.conversation_manager.context_agent.get_or_create_context(user_id)
         
         # Usar agentes de conversação para respostas dinâmicas
-        if user_id:
-            quick_response, needs_full_ai = await self.conversation_manager.process_message(
-                user_id, user_message, triage_data
+        if conversation_context:
+            self.conversation_manager.begin_message(user_id, user_message, triage_data, conversation_context)
+            
+            # Com o contexto atualizado o prompt já pode ser montado: a chamada especulativa sai
+            # antes da decisão local (respostas rápidas, FAQ), que roda durante a ida à rede
+            speculative = None
+            if self.speculative_prefetch and self._reserve_speculation():
+                speculative = asyncio.create_task(self.generate_full_response(
+                    user_message, session_history, triage_data, conversation_context
+                ))
+                await asyncio.sleep(0)
+            
+            quick_response, needs_full_ai = self.conversation_manager.decide_response(
+                user_message, conversation_context, triage_data
             )
             
             # Se não precisa da IA completa, retornar resposta rápida
             if not needs_full_ai:
+                if speculative:
+                    speculative.cancel()
+                    self.speculation_stats['wasted'] += 1
                 logger.info(f"Resposta rápida gerada para usuário {user_id}")
                 return quick_response
+            
+            full_response = speculative
+            if speculative:
+                self.speculation_stats['hits'] += 1
+            
+            # Emergência: a IA completa começa antes do envio das instruções locais, que não a atrasam
+            instructions = on_emergency and self.conversation_manager.emergency_instructions(
+                user_message, conversation_context, triage_data
+            )
+            if instructions:
+                if full_response is None:
+                    full_response = asyncio.create_task(self.generate_full_response(
+                        user_message, session_history, triage_data, conversation_context
+                    ))
+                try:
+                    await on_emergency(instructions)
+                except Exception as e:
+                    logger.error(f"Erro ao enviar instruções de emergência: {e}")
+            
+            if full_response:
+                return await full_response
         
-        # Processar com IA completa para casos complexos
+        return await self.generate_full_response(user_message, session_history, triage_data, conversation_context)
+    
+    async def generate_full_response(
+        self,
+        user_message: str,
+        session_history: Sequence[MessageRecord] = None,
+        triage_data: Dict[str, Any] = None,
+        conversation_context: Optional[ConversationContext] = None
+    ) -> str:
+        """Gera a resposta com a IA completa (sem a etapa de respostas rápidas, já decidida pelo chamador)"""
         max_retries = len(self.api_keys) * len(self.models)
         
         for attempt in range(max_retries):
@@ -191,19 +257,20 @@ Lembre-se: Você é um assistente inteligente de triagem que se adapta ao usuár
                     if not self._initialize_client():
                         break
                 
-                # Construir contexto da conversa
-                conversation_context = self._build_conversation_context(
-                    user_message, session_history, triage_data, user_id
+                # Construir contexto da conversa (prompt)
+                prompt = self._build_conversation_context(
+                    user_message, session_history, triage_data, conversation_context
                 )
                 
                 # Gerar resposta
-                response = await self._generate_response_with_retry(conversation_context)
+                response = await self._generate_response_with_retry(prompt)
                 
                 if response:
                     # Adaptar resposta baseada no contexto do usuário
-                    if user_id:
-                        context = self.conversation_manager.context_agent.get_or_create_context(user_id)
-                        response = self.conversation_manager.response_agent.adapt_response_style(response, context)
+                    if conversation_context:
+                        response = self.conversation_manager.response_agent.adapt_response_style(
+                            response, conversation_context
+                        )
                     
                     return response
                     
@@ -217,7 +284,45 @@ Lembre-se: Você é um assistente inteligente de triagem que se adapta ao usuár
         logger.error("Todas as combinações de API/modelo falharam")
         return self._get_fallback_response()
     
-    def _build_conversation_context(self, user_message: str, session_history: List[Dict], triage_data: Dict, user_id: str = None) -> str:
+    def _reserve_speculation(self) -> bool:
+        """Reserva uma chamada especulativa no orçamento da janela atual (False se esgotado)"""
+        now = time.monotonic()
+        while self._speculation_starts and now - self._speculation_starts[0] >= SPECULATION_WINDOW:
+            self._speculation_starts.popleft()
+        
+        if len(self._speculation_starts) >= self.speculation_budget:
+            self.speculation_stats['over_budget'] += 1
+            return False
+        
+        self._speculation_starts.append(now)
+        self.speculation_stats['started'] += 1
+        return True
+    
+    def emergency_instructions(
+        self,
+        message: str,
+        conversation_context: ConversationContext,
+        triage_data: Dict[str, Any]
+    ) -> Optional[str]:
+        """Instruções locais de emergência para a mensagem (None se ela não indica emergência)"""
+        return self.conversation_manager.emergency_instructions(message, conversation_context, triage_data)
+    
+    def get_speculation_stats(self) -> Dict[str, Any]:
+        """Chamadas especulativas: iniciadas, aproveitadas, canceladas (desperdiçadas) e fora do orçamento"""
+        stats = dict(self.speculation_stats)
+        decided = stats['hits'] + stats['wasted']
+        stats['hit_rate'] = round(stats['hits'] / decided, 3) if decided else 0.0
+        stats['enabled'] = self.speculative_prefetch
+        stats['budget_per_minute'] = self.speculation_budget
+        return stats
+    
+    def _build_conversation_context(
+        self,
+        user_message: str,
+        session_history: Sequence[MessageRecord],
+        triage_data: Dict,
+        conversation_context: Optional[ConversationContext] = None
+    ) -> str:
         """Constrói o contexto da conversa para o Gemini com informações dinâmicas"""
         context_parts = [self.medical_prompt]
         
@@ -229,8 +334,8 @@ Lembre-se: Você é um assistente inteligente de triagem que se adapta ao usuár
         if session_history:
             context_parts.append("\nHISTÓRICO DA CONVERSA:")
             for msg in session_history[-5:]:  # Últimas 5 mensagens
-                role = "Paciente" if msg['role'] == 'user' else "Médico de Bolso"
-                context_parts.append(f"{role}: {msg['content']}")
+                role = "Paciente" if msg.role == 'user' else "Médico de Bolso"
+                context_parts.append(f"{role}: {msg.content}")
         
         # Adicionar mensagem atual
         context_parts.append(f"\nMENSAGEM ATUAL DO PACIENTE:\n{user_message}")
@@ -241,9 +346,8 @@ Lembre-se: Você é um assistente inteligente de triagem que se adapta ao usuár
         )
         
         # Adicionar informações de contexto dinâmico se disponível
-        if user_id:
-            context = self.conversation_manager.context_agent.get_or_create_context(user_id)
-            stats = self.conversation_manager.get_conversation_stats(user_id)
+        if conversation_context:
+            stats = self.conversation_manager.get_context_stats(conversation_context)
             
             context_parts.append(f"\nCONTEXTO DA CONVERSA:")
             context_parts.append(f"Número de mensagens: {stats['message_count']}")
@@ -267,10 +371,21 @@ Lembre-se: Você é um assistente inteligente de triagem que se adapta ao usuár
         formatted = []
         if 'urgency_level' in triage_data:
             formatted.append(f"Nível de urgência: {triage_data['urgency_level']}")
-        if 'symptoms_detected' in triage_data:
+        if triage_data.get('message_urgency_level', triage_data.get('urgency_level')) != triage_data.get('urgency_level'):
+            formatted.append(f"Urgência da mensagem atual: {triage_data['message_urgency_level']}")
+        if triage_data.get('symptom_timeline'):
+            now = time.time()
+            timeline = [
+                f"{symptom} (há {int((now - first_seen) / 60)} min)"
+                for symptom, first_seen in triage_data['symptom_timeline'].items()
+            ]
+            formatted.append(f"Sintomas relatados na conversa: {', '.join(timeline)}")
+        elif 'symptoms_detected' in triage_data:
             formatted.append(f"Sintomas detectados: {', '.join(triage_data['symptoms_detected'])}")
         if 'risk_factors' in triage_data:
             formatted.append(f"Fatores de risco: {', '.join(triage_data['risk_factors'])}")
+        if triage_data.get('clinical_answers'):
+            formatted.append(f"Dados informados pelo paciente: {self.conversation_manager.answer_extractor.describe(triage_data['clinical_answers'])}")
         
         return "\n".join(formatted)
     
@@ -356,7 +471,8 @@ Lembre-se: Você é um assistente inteligente de triagem que se adapta ao usuár
             "total_models": len(self.models),
             "failed_combinations": len(self.failed_combinations),
             "rate_limited_combinations": len([c for c in self.rate_limit_cooldowns.keys() if self._is_rate_limited(c)]),
-            "available_combinations": 0
+            "available_combinations": 0,
+            "speculation": self.get_speculation_stats()
         }
         
         # Count available combinations
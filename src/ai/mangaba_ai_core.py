@@ -13,9 +13,14 @@ from dataclasses import dataclass
 from .gemini_client import GeminiMedicalAI
 from .conversation_agents import ConversationManager, ConversationMode
 from .quick_responses import QuickResponseEngine
+from .stage_graph import Stage, StageGraph
 from ..mcp.client import MCPClient, mcp_client
+from ..mcp.events import MCPEventShipper
 from ..medical.triage import MedicalTriage
-from ..utils.session_manager import SessionManager
+from ..utils.session_manager import SessionManager, UserSession
+from ..config.settings import (
+    MCP_EVENT_QUEUE_SIZE, MCP_EVENT_BATCH_SIZE, MCP_EVENT_FLUSH_INTERVAL, MCP_EVENT_SPILL_PATH
+)
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +34,7 @@ class MangabaAIResponse:
     mcp_data: Optional[Dict[str, Any]] = None
     follow_up_questions: List[str] = None
     medical_resources: List[Dict[str, Any]] = None
+    stage_timings_ms: Optional[Dict[str, float]] = None  # duração de cada estágio executado
 
 class MangabaAICore:
     """Sistema central do Mangaba AI integrando MCP e A2A"""
@@ -37,22 +43,57 @@ class MangabaAICore:
         """Inicializa o sistema Mangaba AI"""
         # Componentes A2A
         self.gemini_ai = GeminiMedicalAI()
-        self.conversation_manager = ConversationManager()
+        # Mesmo gerenciador do Gemini: um único contexto de conversação por usuário
+        self.conversation_manager = self.gemini_ai.conversation_manager
         self.quick_response_engine = QuickResponseEngine()
         
         # Componentes médicos
         self.triage = MedicalTriage()
         self.session_manager = SessionManager()
+        self.session_manager.add_eviction_listener(
+            lambda user_id: self.conversation_manager.forget_user(str(user_id))
+        )
         
         # Cliente MCP
         self.mcp_client = mcp_client
+        self.event_shipper = MCPEventShipper(
+            mcp_client,
+            max_queue=MCP_EVENT_QUEUE_SIZE,
+            batch_size=MCP_EVENT_BATCH_SIZE,
+            flush_interval=MCP_EVENT_FLUSH_INTERVAL,
+            spill_path=MCP_EVENT_SPILL_PATH or None
+        )
         
         # Estado do sistema
         self.mcp_enabled = True
         self.a2a_enabled = True
         
+        # Estágios da consulta (executados como grafo de dependências)
+        self.stages = self._build_stage_graph()
+        
         logger.info("Mangaba AI Core inicializado com MCP + A2A")
     
+    def _build_stage_graph(self) -> StageGraph:
+        """Estágios da consulta e suas dependências
+        
+        Triagem de emergência e contexto rodam juntos; sem resposta rápida, a IA Gemini, o
+        enriquecimento MCP e as perguntas de follow-up rodam ao mesmo tempo.
+        """
+        needs_ai = lambda results: results['quick'] is None
+        return StageGraph([
+            Stage('context', lambda r: self._build_integrated_context(r['user_id'], r['message'], r['session_data'])),
+            Stage('emergency', lambda r: self._assess_emergency_level(r['message'], {})),
+            Stage('quick', lambda r: self._try_quick_response(r['user_id'], r['message'], r['context']),
+                  after=('context',), when=lambda r: self.a2a_enabled),
+            Stage('ai', lambda r: self._generate_ai_response(r['user_id'], r['message'], r['context']),
+                  after=('context', 'quick'), when=needs_ai),
+            Stage('mcp', lambda r: self._enrich_with_mcp(r['message'], r['context']),
+                  after=('context', 'quick', 'emergency'),
+                  when=lambda r: self.mcp_enabled and (r['quick'] is None or r['emergency'] > 2)),
+            Stage('follow_up', lambda r: self._generate_follow_up(r['context']),
+                  after=('context', 'quick'), when=needs_ai)
+        ])
+    
     async def process_medical_query(
         self, 
         user_id: str, 
@@ -61,46 +102,34 @@ class MangabaAICore:
     ) -> MangabaAIResponse:
         """Processa consulta médica usando sistema integrado MCP + A2A"""
         try:
-            # 1. Análise inicial com A2A
-            context = await self._build_integrated_context(user_id, message, session_data)
+            results, timings = await self.stages.run({
+                'user_id': user_id, 'message': message, 'session_data': session_data
+            })
+            emergency_level = results['emergency']
+            mcp_data = results['mcp']
             
-            # 2. Verificar se é emergência
-            emergency_level = await self._assess_emergency_level(message, context)
-            
-            # 3. Tentar resposta rápida primeiro (A2A)
-            quick_response = None
-            if self.a2a_enabled:
-                quick_response = await self._try_quick_response(user_id, message, context)
-            
-            # 4. Se não há resposta rápida, usar IA + MCP
-            if not quick_response:
-                ai_response = await self._generate_ai_response(user_id, message, context)
-                mcp_data = await self._enrich_with_mcp(message, context) if self.mcp_enabled else None
-                
+            if results['quick'] is None:
                 return MangabaAIResponse(
-                    content=ai_response,
+                    content=results['ai'],
                     confidence=0.85,
                     source='hybrid' if mcp_data else 'ai',
                     emergency_level=emergency_level,
                     mcp_data=mcp_data,
-                    follow_up_questions=await self._generate_follow_up(context),
-                    medical_resources=mcp_data.get('resources', []) if mcp_data else []
-                )
-            else:
-                # Enriquecer resposta rápida com MCP se necessário
-                mcp_data = None
-                if self.mcp_enabled and emergency_level > 2:
-                    mcp_data = await self._enrich_with_mcp(message, context)
-                
-                return MangabaAIResponse(
-                    content=quick_response,
-                    confidence=0.95,
-                    source='quick',
-                    emergency_level=emergency_level,
-                    mcp_data=mcp_data,
-                    follow_up_questions=[],
-                    medical_resources=mcp_data.get('resources', []) if mcp_data else []
+                    follow_up_questions=results['follow_up'],
+                    medical_resources=mcp_data.get('resources', []) if mcp_data else [],
+                    stage_timings_ms=timings
                 )
+            
+            return MangabaAIResponse(
+                content=results['quick'],
+                confidence=0.95,
+                source='quick',
+                emergency_level=emergency_level,
+                mcp_data=mcp_data,
+                follow_up_questions=[],
+                medical_resources=mcp_data.get('resources', []) if mcp_data else [],
+                stage_timings_ms=timings
+            )
                 
         except Exception as e:
             logger.error(f"Erro no processamento Mangaba AI: {e}")
@@ -118,11 +147,18 @@ class MangabaAICore:
         session_data: Optional[Dict]
     ) -> Dict[str, Any]:
         """Constrói contexto integrado A2A + MCP"""
+        # Estado do usuário (sessão fornecida ou do gerenciador local)
+        session = session_data if isinstance(session_data, UserSession) else self.session_manager.get_session(user_id)
+        conversation_context = session.conversation if session else None
+        
         # Contexto A2A
-        a2a_stats = self.conversation_manager.get_conversation_stats(user_id)
+        if conversation_context:
+            a2a_stats = self.conversation_manager.get_context_stats(conversation_context)
+        else:
+            a2a_stats = self.conversation_manager.get_conversation_stats(user_id)
         
         # Dados da sessão
-        session_info = session_data or self.session_manager.get_session(user_id)
+        session_info = session_data or session
         
         # Análise de triagem
         triage_data = self.triage.analyze_symptoms(message)
@@ -131,6 +167,7 @@ class MangabaAICore:
             'user_id': user_id,
             'message': message,
             'a2a_context': a2a_stats,
+            'conversation_context': conversation_context,
             'session_info': session_info,
             'triage_data': triage_data,
             'timestamp': asyncio.get_event_loop().time()
@@ -162,7 +199,7 @@ class MangabaAICore:
         """Tenta gerar resposta rápida com A2A"""
         try:
             response, needs_ai = await self.conversation_manager.process_message(
-                user_id, message, context.get('triage_data')
+                user_id, message, context.get('triage_data'), context.get('conversation_context')
             )
             # Se não precisa de IA, retorna a resposta rápida
             return response if not needs_ai else None
@@ -176,12 +213,17 @@ class MangabaAICore:
         message: str, 
         context: Dict
     ) -> str:
-        """Gera resposta usando IA Gemini"""
+        """Gera resposta usando IA Gemini
+        
+        A etapa de respostas rápidas já foi decidida no estágio 'quick': aqui vai direto à IA completa.
+        """
         try:
-            return await self.gemini_ai.process_medical_query(
-                message, 
-                context.get('session_info', {}),
-                user_id
+            session = context.get('session_info')
+            return await self.gemini_ai.generate_full_response(
+                message,
+                session_history=session.messages.last(10) if isinstance(session, UserSession) else None,
+                triage_data=context.get('triage_data'),
+                conversation_context=context.get('conversation_context')
             )
         except Exception as e:
             logger.error(f"Erro na IA Gemini: {e}")
@@ -194,29 +236,14 @@ class MangabaAICore:
     ) -> Optional[Dict[str, Any]]:
         """Enriquece resposta com dados MCP"""
         try:
-            mcp_data = {}
-            
-            # Buscar recursos médicos
-            resources = await self.mcp_client.get_medical_resources(message)
-            if resources:
-                mcp_data['resources'] = resources
-            
-            # Verificar protocolos de emergência se necessário
-            triage_data = context.get('triage_data', {})
-            if triage_data.get('symptoms'):
-                protocols = await self.mcp_client.get_emergency_protocols(
-                    triage_data['symptoms']
-                )
-                if protocols:
-                    mcp_data['emergency_protocols'] = protocols
-            
-            # Buscar diretrizes médicas
-            if triage_data.get('condition'):
-                guidelines = await self.mcp_client.get_medical_guidelines(
-                    triage_data['condition']
-                )
-                if guidelines:
-                    mcp_data['guidelines'] = guidelines
+            # Recursos, protocolos e diretrizes em um lote JSON-RPC (ou em paralelo), dentro do prazo
+            # Protocolos apenas para as categorias de emergência detectadas na triagem
+            triage_data = context.get('triage_data') or {}
+            emergency_categories = [
+                symptom for symptom in triage_data.get('symptoms_detected', [])
+                if symptom in self.triage.emergency_keywords
+            ]
+            mcp_data = await self.mcp_client.get_enrichment(message, symptoms=emergency_categories)
             
             return mcp_data if mcp_data else None
             
@@ -263,12 +290,23 @@ class MangabaAICore:
                 'timestamp': asyncio.get_event_loop().time()
             }
             
+            # Fora do caminho da resposta: enviado depois, em lote
             if self.mcp_enabled:
-                await self.mcp_client.log_medical_event(event_data)
+                self.event_shipper.emit(event_data)
             
         except Exception as e:
             logger.warning(f"Erro ao registrar interação: {e}")
     
+    async def warm_up(self):
+        """Aquece o cache MCP com os protocolos de todas as categorias de emergência da triagem"""
+        if self.mcp_enabled:
+            await self.mcp_client.prefetch_emergency_protocols(self.triage.emergency_keywords.keys())
+    
+    async def shutdown(self):
+        """Envia (ou grava em arquivo) os eventos pendentes e encerra o cliente MCP"""
+        await self.event_shipper.close()
+        await self.mcp_client.disconnect()
+    
     def enable_mcp(self, enabled: bool = True):
         """Habilita/desabilita MCP"""
         self.mcp_enabled = enabled
@@ -285,6 +323,11 @@ class MangabaAICore:
             'mcp_enabled': self.mcp_enabled,
             'a2a_enabled': self.a2a_enabled,
             'mcp_connected': self.mcp_client.connected,
+            'mcp_connection': self.mcp_client.get_connection_stats(),
+            'mcp_tools': self.mcp_client.get_tool_stats(),
+            'mcp_cache': self.mcp_client.get_cache_stats(),
+            'mcp_events': self.event_shipper.get_stats(),
+            'stages': self.stages.get_stats(),
             'components': {
                 'gemini_ai': bool(self.gemini_ai),
                 'conversation_manager': bool(self.conversation_manager),
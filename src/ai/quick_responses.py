@@ -5,13 +5,22 @@ Sistema de Respostas Rápidas - Médico de Bolso
 Respostas instantâneas para consultas médicas comuns
 """
 
+import hashlib
 import logging
 import re
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Any
+from dataclasses import dataclass, replace
+from src.config.settings import (
+    FAQ_BANK_PATH, FAQ_INDEX_DIR, FAQ_SIMILARITY_THRESHOLD, QUICK_RESPONSE_CACHE_SIZE
+)
+from src.ai.faq_index import FAQIndex
+from src.utils.lru_cache import LRUCache, MISSING
 
 logger = logging.getLogger(__name__)
 
+# Mensagens mais longas que isso não são memorizadas (raramente se repetem)
+QUICK_RESPONSE_CACHE_MAX_LENGTH = 120
+
 @dataclass
 class QuickResponse:
     """Estrutura para respostas rápidas"""
@@ -19,6 +28,7 @@ class QuickResponse:
     follow_up_question: Optional[str] = None
     urgency_level: str = "BAIXO"
     requires_full_ai: bool = False
+    source: str = "pattern"  # 'pattern', 'faq'
 
 class QuickResponseEngine:
     """Motor de respostas rápidas para consultas comuns"""
@@ -27,6 +37,40 @@ class QuickResponseEngine:
         self.response_patterns = self._initialize_patterns()
         self.common_medications = self._initialize_medications()
         self.symptom_responses = self._initialize_symptom_responses()
+        
+        self.emergency_pattern_sources = [
+            r'\b(dor no peito|infarto|ataque cardíaco)\b',
+            r'\b(falta de ar severa|não consigo respirar)\b',
+            r'\b(desmaiei|perdi consciência)\b',
+            r'\b(sangramento intenso|muito sangue)\b',
+            r'\b(convulsão|convulsões)\b'
+        ]
+        
+        # Índice semântico de respostas validadas (paráfrases que os padrões não cobrem)
+        self.faq_index = FAQIndex.load(FAQ_BANK_PATH, FAQ_INDEX_DIR)
+        
+        # Padrões pré-compilados e cache das buscas por mensagem normalizada
+        self.ruleset_version = None
+        self.lookup_cache = LRUCache(QUICK_RESPONSE_CACHE_SIZE)
+        self.rebuild_rules()
+    
+    def rebuild_rules(self):
+        """Recompila os padrões; invalida o cache se os padrões ou o banco de FAQ mudaram"""
+        rules = (
+            self.response_patterns, self.common_medications, self.symptom_responses,
+            self.emergency_pattern_sources, self.faq_index.version if self.faq_index else None
+        )
+        version = hashlib.sha1(repr(rules).encode('utf-8')).hexdigest()[:12]
+        if version == self.ruleset_version:
+            return
+        
+        self.emergency_patterns = [re.compile(pattern) for pattern in self.emergency_pattern_sources]
+        self.compiled_patterns = [
+            (re.compile(pattern), response) for pattern, response in self.response_patterns.items()
+        ]
+        self.ruleset_version = version
+        self.lookup_cache.clear()
+        logger.info(f"Padrões de respostas rápidas carregados (versão {version})")
     
     def _initialize_patterns(self) -> Dict[str, QuickResponse]:
         """Inicializa padrões de respostas rápidas"""
@@ -154,25 +198,30 @@ class QuickResponseEngine:
         }
     
     def find_quick_response(self, message: str) -> Optional[QuickResponse]:
-        """Encontra resposta rápida para a mensagem"""
-        message_lower = message.lower()
+        """Encontra resposta rápida para a mensagem (as respostas retornadas são compartilhadas)"""
+        message_lower = ' '.join(message.lower().split())
+        if len(message_lower) > QUICK_RESPONSE_CACHE_MAX_LENGTH:
+            return self._match_quick_response(message_lower)
         
-        # Verificar padrões de emergência primeiro
-        emergency_patterns = [
-            r'\b(dor no peito|infarto|ataque cardíaco)\b',
-            r'\b(falta de ar severa|não consigo respirar)\b',
-            r'\b(desmaiei|perdi consciência)\b',
-            r'\b(sangramento intenso|muito sangue)\b',
-            r'\b(convulsão|convulsões)\b'
-        ]
+        cache_key = (self.ruleset_version, message_lower)
+        cached = self.lookup_cache.get(cache_key)
+        if cached is not MISSING:
+            return cached
         
-        for pattern in emergency_patterns:
-            if re.search(pattern, message_lower):
+        quick_response = self._match_quick_response(message_lower)
+        self.lookup_cache.put(cache_key, quick_response)
+        return quick_response
+    
+    def _match_quick_response(self, message_lower: str) -> Optional[QuickResponse]:
+        """Procura a resposta rápida nos padrões pré-compilados"""
+        # Verificar padrões de emergência primeiro
+        for pattern in self.emergency_patterns:
+            if pattern.search(message_lower):
                 return self.symptom_responses["emergency_symptoms"]
         
         # Verificar padrões normais
-        for pattern, response in self.response_patterns.items():
-            if re.search(pattern, message_lower):
+        for pattern, response in self.compiled_patterns:
+            if pattern.search(message_lower):
                 return response
         
         # Verificar medicamentos
@@ -184,6 +233,17 @@ class QuickResponseEngine:
                     requires_full_ai=True
                 )
         
+        # Verificar banco de respostas validadas (nunca para mensagens com sinais de alerta)
+        if self.faq_index and not self.is_emergency_keyword(message_lower):
+            faq_match = self.faq_index.search(message_lower, FAQ_SIMILARITY_THRESHOLD)
+            if faq_match:
+                return QuickResponse(
+                    response=faq_match.answer,
+                    follow_up_question=faq_match.follow_up_question,
+                    urgency_level=faq_match.urgency_level,
+                    source="faq"
+                )
+        
         return None
     
     def get_contextual_response(self, message: str, conversation_count: int) -> Optional[QuickResponse]:
@@ -191,16 +251,24 @@ class QuickResponseEngine:
         quick_response = self.find_quick_response(message)
         
         if quick_response:
-            # Adaptar resposta baseada no contexto da conversa
+            # Adaptar resposta baseada no contexto da conversa (cópia: o original é compartilhado)
             if conversation_count == 1:  # Primeira mensagem
                 if quick_response.urgency_level != "EMERGÊNCIA":
-                    quick_response.response += " Vou te ajudar a entender melhor."
+                    quick_response = replace(
+                        quick_response, response=quick_response.response + " Vou te ajudar a entender melhor."
+                    )
             
             elif conversation_count > 3:  # Conversa longa
-                quick_response.requires_full_ai = True  # Usar IA completa para análise detalhada
+                quick_response = replace(quick_response, requires_full_ai=True)  # Usar IA completa para análise detalhada
         
         return quick_response
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do cache de respostas rápidas"""
+        stats = self.lookup_cache.get_stats()
+        stats['ruleset_version'] = self.ruleset_version
+        return stats
+    
     def is_emergency_keyword(self, message: str) -> bool:
         """Verifica se a mensagem contém palavras-chave de emergência"""
         emergency_keywords = [
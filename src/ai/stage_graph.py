@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Grafo de Estágios - Médico de Bolso
+Executa os estágios de uma consulta como grafo de dependências: cada estágio começa assim
+que os estágios de que depende terminam, e estágios independentes rodam ao mesmo tempo.
+A duração de cada estágio é medida (por execução e em percentis acumulados).
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Amostras de duração mantidas por estágio para os percentis
+STAGE_SAMPLES = 500
+
+
+@dataclass
+class Stage:
+    """Estágio do grafo: `run` recebe os resultados já disponíveis (entradas + estágios anteriores)
+
+    `when`, avaliado depois das dependências, decide se o estágio roda; se não rodar, seu
+    resultado é None.
+    """
+    name: str
+    run: Callable[[Dict[str, Any]], Awaitable[Any]]
+    after: Tuple[str, ...] = ()
+    when: Optional[Callable[[Dict[str, Any]], bool]] = None
+
+
+class _StageStats:
+    """Contadores e durações recentes de um estágio"""
+
+    def __init__(self):
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.samples: Deque[float] = deque(maxlen=STAGE_SAMPLES)
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+
+        def percentile(fraction: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 1) if ordered else 0.0
+
+        return {
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'p50_ms': percentile(0.5),
+            'p95_ms': percentile(0.95)
+        }
+
+
+class StageGraph:
+    """Grafo de estágios assíncronos (as dependências devem ser declaradas antes do estágio)"""
+
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages: List[Stage] = []
+        self._stats: Dict[str, _StageStats] = {}
+        for stage in stages:
+            missing = [name for name in stage.after if name not in self._stats]
+            if missing:
+                raise ValueError(f"Estágio '{stage.name}' depende de estágios não declarados antes: {missing}")
+            if stage.name in self._stats:
+                raise ValueError(f"Estágio duplicado: '{stage.name}'")
+            self.stages.append(stage)
+            self._stats[stage.name] = _StageStats()
+
+    async def run(self, inputs: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, float]]:
+        """Executa o grafo; retorna (resultados por nome de estágio e entrada, duração em ms por estágio)
+
+        Um erro em qualquer estágio cancela os demais e é propagado.
+        """
+        results = dict(inputs)
+        timings: Dict[str, float] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def execute(stage: Stage):
+            if stage.after:
+                await asyncio.gather(*(tasks[name] for name in stage.after))
+            stats = self._stats[stage.name]
+            if stage.when is not None and not stage.when(results):
+                results[stage.name] = None
+                stats.skipped += 1
+                return
+
+            started = time.perf_counter()
+            try:
+                results[stage.name] = await stage.run(results)
+            except Exception:
+                stats.errors += 1
+                raise
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                timings[stage.name] = round(elapsed, 1)
+                stats.samples.append(elapsed)
+                stats.runs += 1
+
+        for stage in self.stages:
+            tasks[stage.name] = asyncio.create_task(execute(stage))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            pending = [task for task in tasks.values() if not task.done()]
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        return results, timings
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Execuções, estágios pulados, erros e percentis de duração por estágio"""
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
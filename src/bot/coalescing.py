@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agrupamento de Mensagens - Médico de Bolso
+Junta as mensagens enviadas em sequência rápida por um usuário em uma única consulta
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Burst:
+    """Rajada de mensagens de um usuário ainda aberta a novas mensagens"""
+    items: List[Any]
+    first_arrival: float
+    deadline: float
+    urgent: bool = False
+    wakeup: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class MessageCoalescer:
+    """Janela de espera (debounce) por usuário: cada mensagem nova adia o fechamento da rajada
+
+    A janela é renovada a cada mensagem, limitada a `max_window` desde a primeira, e cai para
+    `urgent_window` quando uma mensagem é marcada como urgente. Rajadas de um mesmo usuário são
+    processadas em ordem: uma rajada só fecha depois que a anterior terminou. Com `runner`, o
+    processamento de cada rajada é entregue a ele (ex.: a caixa de mensagens do usuário e as
+    vagas globais de PerUserUpdateProcessor.run_for_user).
+    """
+
+    def __init__(
+        self,
+        window: float,
+        max_window: float,
+        urgent_window: float,
+        on_burst: Callable[[Hashable, List[Any]], Awaitable[None]],
+        heartbeat: Optional[Callable[[Any], Awaitable[None]]] = None,
+        heartbeat_interval: float = 4.0,
+        runner: Optional[Callable[[Hashable, Awaitable[None]], Awaitable[None]]] = None
+    ):
+        """Cria o agrupador; `heartbeat` é chamado periodicamente enquanto a rajada aguarda e é processada"""
+        self.window = window
+        self.max_window = max(max_window, window)
+        self.urgent_window = min(urgent_window, window)
+        self.on_burst = on_burst
+        self.runner = runner
+        self.heartbeat = heartbeat
+        self.heartbeat_interval = heartbeat_interval
+
+        self._open: Dict[Hashable, _Burst] = {}
+        self._tail: Dict[Hashable, asyncio.Task] = {}  # última rajada de cada usuário
+
+        # Métricas
+        self._bursts_total = 0
+        self._messages_total = 0
+        self._closed_messages_total = 0
+        self._max_burst_size = 0
+        self._urgent_bursts = 0
+
+    def add(self, key: Hashable, item: Any, urgent: bool = False):
+        """Adiciona uma mensagem à rajada aberta do usuário (ou abre uma nova)"""
+        now = asyncio.get_running_loop().time()
+        burst = self._open.get(key)
+
+        if burst is None:
+            burst = _Burst(items=[item], first_arrival=now, deadline=now + self.window)
+            self._open[key] = burst
+            task = asyncio.create_task(self._run(key, burst, self._tail.get(key)))
+            self._tail[key] = task
+            task.add_done_callback(lambda done: self._forget_tail(key, done))
+        else:
+            burst.items.append(item)
+            burst.deadline = min(now + self.window, burst.first_arrival + self.max_window)
+
+        if urgent:
+            burst.urgent = True
+            burst.deadline = min(burst.deadline, now + self.urgent_window)
+        burst.wakeup.set()
+        self._messages_total += 1
+
+    def _forget_tail(self, key: Hashable, task: asyncio.Task):
+        if self._tail.get(key) is task:
+            del self._tail[key]
+
+    async def _wait_deadline(self, burst: _Burst):
+        """Aguarda o fechamento da janela, que pode ser adiada ou antecipada por novas mensagens"""
+        loop = asyncio.get_running_loop()
+        while True:
+            remaining = burst.deadline - loop.time()
+            if remaining <= 0:
+                return
+            burst.wakeup.clear()
+            try:
+                await asyncio.wait_for(burst.wakeup.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _keep_alive(self, burst: _Burst):
+        """Renova o sinal de atividade (ex.: "digitando...") enquanto a rajada está pendente"""
+        while True:
+            try:
+                await self.heartbeat(burst.items[-1])
+            except Exception as e:
+                logger.debug(f"Falha ao renovar sinal de atividade: {e}")
+            await asyncio.sleep(self.heartbeat_interval)
+
+    async def _run(self, key: Hashable, burst: _Burst, previous: Optional[asyncio.Task]):
+        """Fecha a rajada ao fim da janela (e da rajada anterior) e a processa de uma vez"""
+        keep_alive = asyncio.create_task(self._keep_alive(burst)) if self.heartbeat else None
+        try:
+            while True:
+                await self._wait_deadline(burst)
+                if previous is None or previous.done():
+                    break
+                # Mensagens que chegarem enquanto a rajada anterior é processada entram nesta
+                await asyncio.wait({previous})
+
+            if self._open.get(key) is burst:
+                del self._open[key]
+
+            self._bursts_total += 1
+            self._closed_messages_total += len(burst.items)
+            self._max_burst_size = max(self._max_burst_size, len(burst.items))
+            if burst.urgent:
+                self._urgent_bursts += 1
+
+            if self.runner:
+                await self.runner(key, self.on_burst(key, burst.items))
+            else:
+                await self.on_burst(key, burst.items)
+
+        except Exception as e:
+            logger.error(f"Erro ao processar rajada de mensagens de {key}: {e}")
+        finally:
+            if keep_alive:
+                keep_alive.cancel()
+
+    async def drain(self):
+        """Fecha imediatamente as rajadas abertas e aguarda seu processamento (no encerramento)"""
+        for burst in self._open.values():
+            burst.deadline = 0.0
+            burst.wakeup.set()
+        if self._tail:
+            await asyncio.gather(*self._tail.values(), return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas de agrupamento"""
+        return {
+            'open_bursts': len(self._open),
+            'bursts_total': self._bursts_total,
+            'messages_total': self._messages_total,
+            'messages_coalesced': self._closed_messages_total - self._bursts_total,
+            'max_burst_size': self._max_burst_size,
+            'urgent_bursts': self._urgent_bursts
+        }
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Concorrência por Usuário - Médico de Bolso
+Processa atualizações de usuários diferentes em paralelo, mantendo a ordem
+(e a exclusividade sobre a sessão) das mensagens de cada usuário.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class _Mailbox:
+    """Fila de um usuário: trava FIFO + atualizações pendentes (aguardando ou em execução)"""
+
+    __slots__ = ('lock', 'depth')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.depth = 0
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Processador de atualizações com uma caixa de mensagens por usuário
+
+    O semáforo da classe base limita as atualizações aceitas (pendentes + em execução);
+    o limite de handlers simultâneos só é ocupado por quem está na frente da sua caixa,
+    de modo que mensagens enfileiradas de um usuário não bloqueiam os demais. Trabalho
+    adiado de um usuário (ex.: rajadas de mensagens agrupadas) entra na mesma caixa e
+    nas mesmas vagas por `run_for_user`. `on_arrival`, se definido, é chamado com cada
+    atualização assim que ela chega, antes de aguardar a vez na caixa (ex.: emergências).
+    """
+
+    def __init__(self, max_concurrent_handlers: int, max_pending_updates: int):
+        super().__init__(max(max_pending_updates, max_concurrent_handlers))
+        self.max_concurrent_handlers = max_concurrent_handlers
+        self._handler_slots: Optional[asyncio.BoundedSemaphore] = None
+        self._mailboxes: Dict[int, _Mailbox] = {}
+        self.on_arrival: Optional[Callable[[object], None]] = None
+
+        # Métricas
+        self._running = 0
+        self._pending = 0
+        self._processed_total = 0
+        self._queued_behind_user_total = 0
+        self._max_mailbox_depth = 0
+
+    @staticmethod
+    def _mailbox_key(update: object) -> Optional[int]:
+        """Usuário (ou chat) dono da atualização; None para atualizações sem dono"""
+        if isinstance(update, Update):
+            if update.effective_user:
+                return update.effective_user.id
+            if update.effective_chat:
+                return update.effective_chat.id
+        return None
+
+    async def initialize(self) -> None:
+        # Criado aqui para pertencer ao event loop da aplicação
+        self._handler_slots = asyncio.BoundedSemaphore(self.max_concurrent_handlers)
+
+    async def shutdown(self) -> None:
+        if self._mailboxes:
+            logger.warning(f"Encerrando com {len(self._mailboxes)} caixas de mensagens não vazias")
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        if self.on_arrival:
+            try:
+                self.on_arrival(update)
+            except Exception as e:
+                logger.error(f"Erro ao tratar chegada de atualização: {e}")
+
+        key = self._mailbox_key(update)
+        if key is None:
+            await self._run(coroutine)
+            return
+        await self._run_in_mailbox(key, coroutine)
+
+    async def run_for_user(self, key: int, coroutine: Awaitable[Any]) -> None:
+        """Executa trabalho adiado de um usuário na caixa dele (atrás das atualizações já recebidas)
+
+        Ocupa uma vaga de handler como uma atualização, sem contar no limite de atualizações
+        pendentes da classe base.
+        """
+        await self._run_in_mailbox(key, coroutine)
+
+    async def _run_in_mailbox(self, key: int, coroutine: Awaitable[Any]) -> None:
+        """Aguarda a vez na caixa do usuário e executa o handler"""
+        mailbox = self._mailboxes.get(key)
+        if mailbox is None:
+            mailbox = self._mailboxes[key] = _Mailbox()
+        mailbox.depth += 1
+        self._pending += 1
+        if mailbox.depth > 1:
+            self._queued_behind_user_total += 1
+        self._max_mailbox_depth = max(self._max_mailbox_depth, mailbox.depth)
+
+        try:
+            # asyncio.Lock atende em ordem de chegada: preserva a ordem das mensagens do usuário
+            async with mailbox.lock:
+                self._pending -= 1
+                await self._run(coroutine)
+        finally:
+            mailbox.depth -= 1
+            if mailbox.depth == 0:
+                del self._mailboxes[key]
+
+    async def _run(self, coroutine: Awaitable[Any]) -> None:
+        """Executa o handler ocupando uma das vagas globais"""
+        async with self._handler_slots:
+            self._running += 1
+            try:
+                await coroutine
+            finally:
+                self._running -= 1
+                self._processed_total += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas de concorrência e profundidade das caixas de mensagens"""
+        depths = [mailbox.depth for mailbox in self._mailboxes.values()]
+        return {
+            'running_handlers': self._running,
+            'max_concurrent_handlers': self.max_concurrent_handlers,
+            'pending_updates': self._pending,
+            'active_mailboxes': len(depths),
+            'deepest_mailbox': max(depths, default=0),
+            'max_mailbox_depth_seen': self._max_mailbox_depth,
+            'queued_behind_same_user_total': self._queued_behind_user_total,
+            'processed_total': self._processed_total
+        }
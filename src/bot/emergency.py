@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Respostas de Emergência - Médico de Bolso
+Mede o tempo até as primeiras instruções de emergência (SLO próprio) e até a orientação
+completa da IA, que chega em uma segunda mensagem.
+"""
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from src.bot.ingress import LATENCY_SAMPLES, _percentiles
+
+
+class EmergencyLatencyTracker:
+    """Latências das respostas de emergência em duas fases"""
+
+    def __init__(self, slo_seconds: float):
+        """`slo_seconds`: prazo, desde o envio da mensagem, para as primeiras instruções"""
+        self.slo_ms = slo_seconds * 1000
+        self._first_instruction_ms: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._handler_to_first_instruction_ms: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._ai_guidance_ms: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._emergencies_total = 0
+        self._slo_breaches = 0
+
+    @staticmethod
+    def _since_message(message: Any) -> Optional[float]:
+        """Milissegundos desde a data da mensagem no Telegram (resolução de 1s)"""
+        if message is None or getattr(message, 'date', None) is None:
+            return None
+        return max(0.0, (time.time() - message.date.timestamp()) * 1000)
+
+    def first_instruction_sent(self, message: Any, handler_started: float):
+        """Registra o envio das instruções locais (`handler_started`: time.perf_counter() no início)"""
+        self._emergencies_total += 1
+        self._handler_to_first_instruction_ms.append((time.perf_counter() - handler_started) * 1000)
+        elapsed = self._since_message(message)
+        if elapsed is not None:
+            self._first_instruction_ms.append(elapsed)
+            if elapsed > self.slo_ms:
+                self._slo_breaches += 1
+
+    def ai_guidance_sent(self, message: Any):
+        """Registra o envio da orientação da IA (segunda fase)"""
+        elapsed = self._since_message(message)
+        if elapsed is not None:
+            self._ai_guidance_ms.append(elapsed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Percentis (ms) e cumprimento do SLO de tempo até a primeira instrução"""
+        return {
+            'emergencies_total': self._emergencies_total,
+            'slo_ms': self.slo_ms,
+            'slo_breaches': self._slo_breaches,
+            'first_instruction_ms': _percentiles(self._first_instruction_ms),
+            'handler_to_first_instruction_ms': _percentiles(self._handler_to_first_instruction_ms),
+            'ai_guidance_ms': _percentiles(self._ai_guidance_ms)
+        }
@@ -5,21 +5,77 @@ Handlers do Bot Telegram - Médico de Bolso
 Gerencia comandos e mensagens dos usuários
 """
 
+import time
+import asyncio
 import logging
-from telegram import Update
-from telegram.ext import ContextTypes
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from telegram import Update, Message
+from telegram.ext import ContextTypes, CommandHandler, MessageHandler, TypeHandler, filters
 from telegram.constants import ParseMode
-from src.config.settings import WELCOME_MESSAGE, HELP_MESSAGE, DISCLAIMER_MESSAGE
+from src.config.settings import WELCOME_MESSAGE, HELP_MESSAGE, DISCLAIMER_MESSAGE, SESSION_STORE_URL
+from src.config.settings import BOT_MODE, BOT_WORKERS
+from src.config.settings import OUTBOUND_GLOBAL_RATE, OUTBOUND_CHAT_RATE, OUTBOUND_CHAT_BURST, OUTBOUND_MAX_RETRIES
+from src.config.settings import MESSAGE_DEBOUNCE_WINDOW, MESSAGE_DEBOUNCE_MAX_WINDOW, MESSAGE_DEBOUNCE_EMERGENCY_WINDOW
+from src.config.settings import EMERGENCY_FIRST_INSTRUCTION_SLO
 from src.ai.gemini_client import GeminiMedicalAI
 from src.medical.triage import MedicalTriage
-from src.utils.session_manager import SessionManager
+from src.medical.answer_extractor import AnswerExtractor
+from src.utils.session_manager import SessionManager, UserSession
+from src.utils.session_store import create_session_store
+from src.bot.concurrency import PerUserUpdateProcessor
+from src.bot.sharding import current_shard
+from src.bot.coalescing import MessageCoalescer
+from src.bot.ingress import IngressLatencyTracker
+from src.bot.emergency import EmergencyLatencyTracker
+from src.bot.outbound import OutboundScheduler, PRIORITY_EMERGENCY, PRIORITY_NORMAL
 
 logger = logging.getLogger(__name__)
 
+SESSION_EXPIRED_MESSAGE = (
+    "😊 Olá! Parece que nossa conversa anterior expirou. \n\n"
+    "Para sua segurança e para oferecer o melhor atendimento, use /start para iniciarmos uma nova consulta!"
+)
+
 # Instâncias globais
 gemini_ai = GeminiMedicalAI()
 medical_triage = MedicalTriage()
+answer_extractor = AnswerExtractor()
+# O armazenamento é aberto em start_background_tasks: só então o processo de trabalho conhece sua partição
 session_manager = SessionManager()
+ingress_tracker = IngressLatencyTracker(BOT_MODE)
+emergency_tracker = EmergencyLatencyTracker(EMERGENCY_FIRST_INSTRUCTION_SLO)
+# Com vários processos de trabalho, o limite global do bot é dividido entre eles
+outbound_scheduler = OutboundScheduler(
+    OUTBOUND_GLOBAL_RATE / max(1, BOT_WORKERS),
+    OUTBOUND_CHAT_RATE,
+    OUTBOUND_CHAT_BURST,
+    OUTBOUND_MAX_RETRIES
+)
+
+async def send_reply(message: Message, text: str, priority: int = PRIORITY_NORMAL, **kwargs) -> Message:
+    """Responde pela fila central de saída (limites de taxa do Telegram e RetryAfter)"""
+    return await outbound_scheduler.send(message.chat_id, lambda: message.reply_text(text, **kwargs), priority)
+
+async def start_background_tasks(application) -> None:
+    """Inicia tarefas de fundo no event loop do bot (post_init)"""
+    session_manager.attach_store(create_session_store(SESSION_STORE_URL, current_shard()))
+    await session_manager.open_store()
+    application.bot_data['session_sweeper'] = asyncio.create_task(session_manager.run_expiry_sweeper())
+    application.bot_data['session_writer'] = asyncio.create_task(session_manager.run_write_behind())
+
+async def drain_pending_messages(application) -> None:
+    """Responde às mensagens ainda agrupadas enquanto o bot pode enviar (post_stop)"""
+    await message_coalescer.drain()
+    await outbound_scheduler.drain()
+
+async def stop_background_tasks(application) -> None:
+    """Cancela as tarefas de fundo e grava as sessões pendentes (post_shutdown)"""
+    for task_name in ('session_sweeper', 'session_writer'):
+        task = application.bot_data.pop(task_name, None)
+        if task:
+            task.cancel()
+    
+    await session_manager.close_store()
 
 async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handler para o comando /start"""
@@ -32,35 +88,33 @@ async def start_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         # Inicializar sessão do usuário
         session_manager.create_session(user_id)
         
-        # Enviar mensagem de boas-vindas
-        await update.message.reply_text(
-            f"Olá, {user_name}!\n\n{WELCOME_MESSAGE}",
-            parse_mode=ParseMode.MARKDOWN
-        )
-        
-        # Enviar disclaimer médico
-        await update.message.reply_text(
-            DISCLAIMER_MESSAGE,
+        # Enviar boas-vindas e disclaimer médico em uma única mensagem
+        await send_reply(
+            update.message,
+            f"Olá, {user_name}!\n\n{WELCOME_MESSAGE}\n{DISCLAIMER_MESSAGE}",
             parse_mode=ParseMode.MARKDOWN
         )
         
     except Exception as e:
         logger.error(f"Erro no handler start: {e}")
-        await update.message.reply_text(
+        await send_reply(
+            update.message,
             "❌ Ocorreu um erro ao iniciar o atendimento. Tente novamente."
         )
 
 async def help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handler para o comando /help"""
     try:
-        await update.message.reply_text(
+        await send_reply(
+            update.message,
             HELP_MESSAGE,
             parse_mode=ParseMode.MARKDOWN
         )
         
     except Exception as e:
         logger.error(f"Erro no handler help: {e}")
-        await update.message.reply_text(
+        await send_reply(
+            update.message,
             "❌ Erro ao exibir ajuda. Tente novamente."
         )
 
@@ -69,6 +123,7 @@ async def status_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     try:
         # Obter status do sistema
         status = gemini_ai.get_system_status()
+        triage_cache = medical_triage.get_cache_stats()
         
         status_message = (
             f"🤖 **Status do Sistema de IA - Tudo sob controle!**\n\n"
@@ -77,9 +132,36 @@ async def status_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             f"📊 **Informações técnicas:**\n"
             f"• ✅ Combinações disponíveis: {status['available_combinations']}\n"
             f"• ⚠️ Combinações com problemas: {status['failed_combinations']}\n"
-            f"• ⏳ Aguardando liberação: {status['rate_limited_combinations']}\n\n"
+            f"• ⏳ Aguardando liberação: {status['rate_limited_combinations']}\n"
+            f"• ⚡ Cache de triagem: {triage_cache['hit_ratio']:.0%} de acertos ({triage_cache['size']} mensagens)\n"
         )
         
+        processor = context.application.update_processor
+        if isinstance(processor, PerUserUpdateProcessor):
+            concurrency = processor.get_stats()
+            status_message += (
+                f"• 🔀 Atendimentos simultâneos: {concurrency['running_handlers']}/{concurrency['max_concurrent_handlers']} "
+                f"({concurrency['pending_updates']} mensagens na fila, maior fila por usuário: {concurrency['deepest_mailbox']})\n"
+            )
+        ingress = ingress_tracker.get_stats()
+        status_message += (
+            f"• 📥 Entrada ({ingress['mode']}): fila→handler p95 {ingress['queue_to_handler_ms']['p95']:.0f}ms, "
+            f"Telegram→handler p95 {ingress['telegram_to_handler_ms']['p95']:.0f}ms\n"
+        )
+        outbound = outbound_scheduler.get_stats()
+        status_message += (
+            f"• 📤 Fila de envio: {outbound['queued']} pendentes, atraso p95 {outbound['queue_delay_p95_ms']:.0f}ms "
+            f"(emergências {outbound['emergency_queue_delay_p95_ms']:.0f}ms), limites do Telegram: {outbound['retry_after_total']}\n"
+        )
+        emergencies = emergency_tracker.get_stats()
+        status_message += (
+            f"• 🚨 Emergências: {emergencies['emergencies_total']}, primeiras instruções p95 "
+            f"{emergencies['first_instruction_ms']['p95']:.0f}ms (meta {emergencies['slo_ms']:.0f}ms, "
+            f"{emergencies['slo_breaches']} acima da meta)\n"
+        )
+        bursts = message_coalescer.get_stats()
+        status_message += f"• 🧩 Mensagens agrupadas em consultas: {bursts['messages_coalesced']} (maior sequência: {bursts['max_burst_size']})\n\n"
+        
         if status['available_combinations'] > 0:
             status_message += "🟢 **Sistema funcionando perfeitamente - pronto para atendê-lo!**"
         elif status['rate_limited_combinations'] > 0:
@@ -87,14 +169,16 @@ async def status_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         else:
             status_message += "🔴 **Sistema temporariamente indisponível - tente novamente em alguns minutos**"
         
-        await update.message.reply_text(
+        await send_reply(
+            update.message,
             status_message,
             parse_mode=ParseMode.MARKDOWN
         )
         
     except Exception as e:
         logger.error(f"Erro no handler status: {e}")
-        await update.message.reply_text(
+        await send_reply(
+            update.message,
             "❌ Ops! Não consegui verificar o status no momento. Tente novamente em instantes."
         )
 
@@ -104,7 +188,8 @@ async def reset_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         # Reset das combinações falhadas
         gemini_ai.reset_failed_combinations()
         
-        await update.message.reply_text(
+        await send_reply(
+            update.message,
             "🔄 **Sistema Reiniciado com Sucesso!**\n\n"
             "✨ Todas as combinações foram resetadas com cuidado\n"
             "🔧 O sistema está novamente otimizado para oferecer o melhor atendimento\n"
@@ -114,70 +199,221 @@ async def reset_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
         
     except Exception as e:
         logger.error(f"Erro no handler reset: {e}")
-        await update.message.reply_text(
+        await send_reply(
+            update.message,
             "❌ Ops! Não consegui reiniciar o sistema no momento. Tente novamente em instantes."
         )
 
 async def medical_consultation_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Handler principal para consultas médicas"""
+    """Handler principal para consultas médicas (mensagens em sequência rápida viram uma só consulta)"""
     try:
         user_id = update.effective_user.id
-        user_message = update.message.text
         
-        # Verificar se usuário tem sessão ativa
-        if not session_manager.has_active_session(user_id):
-            await update.message.reply_text(
-                "😊 Olá! Parece que nossa conversa anterior expirou. \n\n"
-                "Para sua segurança e para oferecer o melhor atendimento, use /start para iniciarmos uma nova consulta!"
-            )
+        # Estado do usuário: obtido uma única vez por atualização
+        session = await session_manager.get_or_load_session(user_id)
+        if session is None:
+            emergency_on_arrival.pop((update.message.chat_id, update.message.message_id), None)
+            await send_reply(update.message, SESSION_EXPIRED_MESSAGE)
+            return
+        
+        # Emergência encurta a janela de agrupamento (triagem de mensagens curtas é memorizada)
+        urgent = medical_triage.analyze_symptoms(update.message.text)['urgency_level'] == 'EMERGÊNCIA'
+        message_coalescer.add(user_id, update.message, urgent)
+        
+    except Exception as e:
+        logger.error(f"Erro no handler de consulta médica: {e}")
+        await send_reply(
+            update.message,
+            "❌ Ocorreu um erro ao processar sua consulta. Tente reformular sua pergunta."
+        )
+
+async def answer_message_burst(user_id: int, messages: List[Message]) -> None:
+    """Responde, com uma única consulta, às mensagens agrupadas de um usuário"""
+    last_message = messages[-1]
+    started = time.perf_counter()
+    try:
+        # Instruções de emergência já enviadas na chegada das mensagens (não são repetidas)
+        arrival_instructions = []
+        for message in messages:
+            task = emergency_on_arrival.pop((message.chat_id, message.message_id), None)
+            instructions = await task if task else None
+            if instructions:
+                arrival_instructions.append(instructions)
+        
+        session = await session_manager.get_or_load_session(user_id)
+        if session is None:
+            await send_reply(last_message, SESSION_EXPIRED_MESSAGE)
             return
         
-        # Mostrar que o bot está processando
-        await update.message.reply_chat_action("typing")
+        # Adicionar mensagens do usuário ao histórico
+        for message in messages:
+            session_manager.append_message(session, "user", message.text)
+        user_message = "\n".join(message.text for message in messages)
         
-        # Adicionar mensagem do usuário ao histórico
-        session_manager.add_message(user_id, "user", user_message)
+        # Emergência: instruções locais enviadas na hora (se não saíram na chegada), antes da IA
+        instructions_sent = bool(arrival_instructions)
+        
+        async def send_emergency_instructions(instructions: str) -> None:
+            nonlocal instructions_sent
+            if instructions_sent:
+                return
+            await send_reply(last_message, instructions, priority=PRIORITY_EMERGENCY)
+            instructions_sent = True
+            emergency_tracker.first_instruction_sent(messages[0], started)
+            session_manager.append_message(session, "assistant", instructions)
         
         # Processar consulta médica
-        response = await process_medical_consultation(user_id, user_message)
+        response = await process_medical_consultation(session, user_message, send_emergency_instructions)
         
-        # Adicionar resposta do bot ao histórico
-        session_manager.add_message(user_id, "assistant", response)
+        # Adicionar resposta do bot ao histórico (depois das instruções enviadas na chegada)
+        for instructions in arrival_instructions:
+            session_manager.append_message(session, "assistant", instructions)
+        session_manager.append_message(session, "assistant", response)
         
-        # Enviar resposta
-        await update.message.reply_text(
+        # Enviar resposta (emergências passam à frente na fila de saída)
+        emergency = instructions_sent or session.medical_context.get('last_urgency') == 'EMERGÊNCIA'
+        await send_reply(
+            last_message,
             response,
+            priority=PRIORITY_EMERGENCY if emergency else PRIORITY_NORMAL,
             parse_mode=ParseMode.MARKDOWN
         )
+        if instructions_sent:
+            emergency_tracker.ai_guidance_sent(messages[0])
         
         # Atualizar timestamp da sessão
-        session_manager.update_session(user_id)
+        session_manager.touch_session(session)
         
     except Exception as e:
-        logger.error(f"Erro no handler de consulta médica: {e}")
-        await update.message.reply_text(
+        logger.error(f"Erro ao responder consulta médica: {e}")
+        await send_reply(
+            last_message,
             "❌ Ocorreu um erro ao processar sua consulta. Tente reformular sua pergunta."
         )
 
-async def process_medical_consultation(user_id: int, user_message: str) -> str:
-    """Processa consulta médica usando IA, triagem e conversação dinâmica"""
+# Instruções de emergência enviadas na chegada, por (chat, mensagem): a rajada que contém a
+# mensagem aguarda o envio e não as repete
+emergency_on_arrival: Dict[Tuple[int, int], "asyncio.Task[Optional[str]]"] = {}
+
+def send_emergency_on_arrival(update: object) -> None:
+    """Envia as instruções locais de emergência assim que a mensagem chega
+    
+    Não aguarda a caixa de mensagens do usuário, que pode estar ocupada pela consulta anterior;
+    a orientação da IA continua em ordem, pela rajada. Só dispara com sintoma de emergência citado
+    literalmente: casamentos aproximados ficam para a triagem da rajada.
+    """
+    if not isinstance(update, Update) or update.effective_user is None:
+        return
+    message = update.message
+    if message is None or not message.text or message.text.startswith('/'):
+        return
+    
+    if not medical_triage.precise_emergency(message.text):
+        return
+    triage_result = medical_triage.analyze_symptoms(message.text)
+    if triage_result['urgency_level'] != 'EMERGÊNCIA':
+        return
+    emergency_on_arrival[(message.chat_id, message.message_id)] = asyncio.create_task(
+        _send_arrival_instructions(update.effective_user.id, message, triage_result, time.perf_counter())
+    )
+
+async def _send_arrival_instructions(
+    user_id: int,
+    message: Message,
+    triage_result: Dict[str, Any],
+    started: float
+) -> Optional[str]:
+    """Envia as instruções de emergência da mensagem; retorna o texto enviado (None se nada foi enviado)"""
+    try:
+        session = await session_manager.get_or_load_session(user_id)
+        if session is None:
+            return None
+        instructions = gemini_ai.emergency_instructions(message.text, session.conversation, triage_result)
+        if not instructions:
+            return None
+        await send_reply(message, instructions, priority=PRIORITY_EMERGENCY)
+        emergency_tracker.first_instruction_sent(message, started)
+        return instructions
+    except Exception as e:
+        logger.error(f"Erro ao enviar instruções de emergência: {e}")
+        return None
+
+async def _send_typing(message: Message) -> None:
+    """Mantém o indicador "digitando..." enquanto a consulta aguarda ou é processada"""
+    await message.reply_chat_action("typing")
+
+message_coalescer = MessageCoalescer(
+    MESSAGE_DEBOUNCE_WINDOW,
+    MESSAGE_DEBOUNCE_MAX_WINDOW,
+    MESSAGE_DEBOUNCE_EMERGENCY_WINDOW,
+    on_burst=answer_message_burst,
+    heartbeat=_send_typing
+)
+
+async def process_medical_consultation(
+    session: UserSession,
+    user_message: str,
+    on_emergency: Optional[Callable[[str], Awaitable[Any]]] = None
+) -> str:
+    """Processa consulta médica usando IA, triagem e conversação dinâmica
+    
+    `on_emergency` recebe as instruções locais de emergência antes da orientação da IA.
+    """
     try:
         # Obter histórico da sessão
-        session_history = session_manager.get_session_history(user_id)
+        session_history = session.messages.last(10)
         
         # Análise de triagem inicial
         triage_result = medical_triage.analyze_symptoms(user_message)
         
+        # Incorporar ao estado de triagem da conversa (sintomas e urgência de mensagens anteriores)
+        triage_result = medical_triage.update_conversation_state(session.triage_state, triage_result)
+        session.medical_context['last_urgency'] = triage_result['urgency_level']
+        
+        # Extrair respostas às perguntas de acompanhamento (temperatura, dor, duração, idade, medicamentos)
+        last_question = next(
+            (msg.content for msg in reversed(session_history) if msg.role == 'assistant'), None
+        )
+        new_answers = answer_extractor.extract(user_message, answer_extractor.expected_fields(last_question))
+        collected = session.medical_context.get('clinical_answers', {})
+        if new_answers:
+            collected = answer_extractor.merge(collected, new_answers)
+            session.medical_context['clinical_answers'] = collected
+        triage_result['new_answers'] = new_answers
+        triage_result['clinical_answers'] = collected
+        
         # Processar com Gemini AI usando conversação dinâmica
         ai_response = await gemini_ai.process_medical_query(
             user_message=user_message,
-            user_id=str(user_id),  # Converter para string para compatibilidade
+            user_id=session.conversation.user_id,
             session_history=session_history,
-            triage_data=triage_result
+            triage_data=triage_result,
+            conversation_context=session.conversation,
+            on_emergency=on_emergency
         )
         
         return ai_response
         
     except Exception as e:
         logger.error(f"Erro ao processar consulta médica: {e}")
-        return "❌ Não foi possível processar sua consulta no momento. Tente novamente em alguns instantes."
\ No newline at end of file
+        return "❌ Não foi possível processar sua consulta no momento. Tente novamente em alguns instantes."
+
+def attach_update_processor(processor: PerUserUpdateProcessor) -> None:
+    """Integra as rajadas agrupadas e as emergências às caixas de mensagens por usuário"""
+    # Rajadas rodam na caixa do usuário (em ordem com /start e /reset) e ocupam as mesmas
+    # vagas globais (MAX_CONCURRENT_UPDATES) que as atualizações
+    message_coalescer.runner = processor.run_for_user
+    # Instruções de emergência saem na chegada, sem esperar a consulta anterior do usuário
+    processor.on_arrival = send_emergency_on_arrival
+
+def register_handlers(application) -> None:
+    """Registra os handlers de comandos e mensagens na aplicação"""
+    if isinstance(application.update_processor, PerUserUpdateProcessor):
+        attach_update_processor(application.update_processor)
+    # Grupo -1: mede a latência de entrada antes de qualquer outro handler
+    application.add_handler(TypeHandler(Update, ingress_tracker.handle), group=-1)
+    application.add_handler(CommandHandler("start", start_handler))
+    application.add_handler(CommandHandler("help", help_handler))
+    application.add_handler(CommandHandler("status", status_handler))
+    application.add_handler(CommandHandler("reset", reset_handler))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, medical_consultation_handler))
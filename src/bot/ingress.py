@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Entrada de Atualizações - Médico de Bolso
+Mede a latência entre a chegada de uma atualização e o início do seu processamento,
+igualmente para os modos polling e webhook.
+"""
+
+import time
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict
+
+from telegram import Update
+
+# Amostras mantidas para os percentis
+LATENCY_SAMPLES = 1000
+
+
+def _percentiles(samples: Deque[float]) -> Dict[str, float]:
+    if not samples:
+        return {'p50': 0.0, 'p95': 0.0, 'max': 0.0}
+    ordered = sorted(samples)
+    return {
+        'p50': round(ordered[len(ordered) // 2], 1),
+        'p95': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+        'max': round(ordered[-1], 1)
+    }
+
+
+class IngressLatencyTracker:
+    """Latências de entrada: Telegram → handler (data da mensagem) e fila → handler"""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self._received_at: Dict[int, float] = {}
+        self._queue_to_handler_ms: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._telegram_to_handler_ms: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._updates_total = 0
+
+    def stamp(self, update: Any):
+        """Registra a chegada de uma atualização (ao entrar na fila da aplicação)"""
+        if isinstance(update, Update):
+            self._received_at[update.update_id] = time.perf_counter()
+
+    def observe(self, update: Update):
+        """Registra o início do processamento de uma atualização"""
+        received_at = self._received_at.pop(update.update_id, None)
+        if received_at is not None:
+            self._queue_to_handler_ms.append((time.perf_counter() - received_at) * 1000)
+
+        # A data da mensagem tem resolução de 1s: inclui a espera do long polling ou do envio do webhook
+        message = update.effective_message
+        if message is not None and message.date is not None:
+            self._telegram_to_handler_ms.append(max(0.0, (time.time() - message.date.timestamp()) * 1000))
+        self._updates_total += 1
+
+    async def handle(self, update: Update, context) -> None:
+        """Handler de grupo -1: executado antes dos demais para cada atualização"""
+        self.observe(update)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Percentis de latência de entrada (ms)"""
+        return {
+            'mode': self.mode,
+            'updates_total': self._updates_total,
+            'queue_to_handler_ms': _percentiles(self._queue_to_handler_ms),
+            'telegram_to_handler_ms': _percentiles(self._telegram_to_handler_ms)
+        }
+
+
+class StampedUpdateQueue(asyncio.Queue):
+    """Fila de atualizações da aplicação que registra o instante de chegada de cada uma"""
+
+    def __init__(self, tracker: IngressLatencyTracker):
+        super().__init__()
+        self.tracker = tracker
+
+    def put_nowait(self, item: Any) -> None:
+        # Queue.put também termina em put_nowait: cobre updater (polling), webhook e partições
+        self.tracker.stamp(item)
+        super().put_nowait(item)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Envio de Mensagens - Médico de Bolso
+Fila central de saída com limites de taxa do Telegram (global e por chat),
+prioridade para respostas de emergência e tratamento automático de RetryAfter.
+"""
+
+import time
+import asyncio
+import heapq
+import itertools
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+# Prioridades (menor valor = enviado primeiro)
+PRIORITY_EMERGENCY = 0
+PRIORITY_NORMAL = 1
+
+# Amostras de atraso na fila mantidas para os percentis
+DELAY_SAMPLES = 1000
+
+
+class TokenBucket:
+    """Balde de fichas: `rate` envios por segundo com rajadas de até `capacity`"""
+
+    __slots__ = ('rate', 'capacity', '_tokens', '_updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self) -> float:
+        """Segundos até haver uma ficha disponível (0 se já houver)"""
+        self._refill(time.monotonic())
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def consume(self):
+        """Consome uma ficha (chamar após delay() == 0)"""
+        self._refill(time.monotonic())
+        self._tokens -= 1
+
+    def pause(self, seconds: float):
+        """Adia a próxima ficha em pelo menos `seconds` segundos (após um RetryAfter)"""
+        self._refill(time.monotonic())
+        self._tokens = min(self._tokens, 1 - seconds * self.rate)
+
+
+@dataclass
+class _Job:
+    """Envio pendente"""
+    send: Callable[[], Awaitable[Any]]
+    priority: int
+    enqueued_at: float
+    future: asyncio.Future
+    attempts: int = 0
+
+
+@dataclass
+class _ChatLane:
+    """Fila de um chat: envios em ordem, limitados pelo balde do chat"""
+    bucket: TokenBucket
+    jobs: Deque[_Job] = field(default_factory=deque)
+    task: Optional[asyncio.Task] = None
+
+
+class OutboundScheduler:
+    """Agendador de envios: ordem por chat, taxa global e por chat, emergências primeiro"""
+
+    def __init__(self, global_rate: float, chat_rate: float, chat_burst: float, max_retries: int = 3):
+        self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.max_retries = max_retries
+
+        self._lanes: Dict[int, _ChatLane] = {}
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []  # vez no limite global, por prioridade
+        self._sequence = itertools.count()
+        self._gate_wakeup: Optional[asyncio.Event] = None
+        self._gate_task: Optional[asyncio.Task] = None
+
+        # Métricas
+        self._sent_total = 0
+        self._failed_total = 0
+        self._retry_after_total = 0
+        self._queued = 0
+        self._max_queued = 0
+        self._delays_ms: Dict[int, Deque[float]] = {
+            PRIORITY_EMERGENCY: deque(maxlen=DELAY_SAMPLES),
+            PRIORITY_NORMAL: deque(maxlen=DELAY_SAMPLES)
+        }
+
+    async def send(self, chat_id: int, send: Callable[[], Awaitable[Any]], priority: int = PRIORITY_NORMAL) -> Any:
+        """Enfileira um envio e aguarda sua conclusão (retorna o resultado de `send`)"""
+        loop = asyncio.get_running_loop()
+        job = _Job(send=send, priority=priority, enqueued_at=time.perf_counter(), future=loop.create_future())
+
+        lane = self._lanes.get(chat_id)
+        if lane is None:
+            lane = self._lanes[chat_id] = _ChatLane(bucket=TokenBucket(self.chat_rate, self.chat_burst))
+
+        if priority == PRIORITY_EMERGENCY:
+            # Emergências passam à frente dos envios comuns já enfileirados no mesmo chat
+            position = next((i for i, queued in enumerate(lane.jobs) if queued.priority > priority), len(lane.jobs))
+            lane.jobs.insert(position, job)
+        else:
+            lane.jobs.append(job)
+
+        self._queued += 1
+        self._max_queued = max(self._max_queued, self._queued)
+        if lane.task is None:
+            lane.task = asyncio.create_task(self._drain_lane(chat_id, lane))
+
+        return await job.future
+
+    async def _acquire_global(self, priority: int):
+        """Aguarda a vez no limite global (emergências atendidas primeiro)"""
+        if self._gate_task is None or self._gate_task.done():
+            self._gate_wakeup = asyncio.Event()
+            self._gate_task = asyncio.create_task(self._run_gate())
+
+        turn = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), turn))
+        self._gate_wakeup.set()
+        await turn
+
+    async def _run_gate(self):
+        """Libera um envio por ficha do balde global, sempre para o pedido de maior prioridade"""
+        while True:
+            if not self._waiters:
+                self._gate_wakeup.clear()
+                await self._gate_wakeup.wait()
+                continue
+
+            wait = self.global_bucket.delay()
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            _, _, turn = heapq.heappop(self._waiters)
+            if not turn.done():
+                self.global_bucket.consume()
+                turn.set_result(None)
+
+    async def _drain_lane(self, chat_id: int, lane: _ChatLane):
+        """Envia em ordem os pedidos de um chat, respeitando os limites e o RetryAfter"""
+        try:
+            while lane.jobs:
+                job = lane.jobs[0]
+
+                wait = lane.bucket.delay()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                await self._acquire_global(job.priority)
+                lane.bucket.consume()
+
+                if job.attempts == 0:
+                    self._delays_ms[job.priority].append((time.perf_counter() - job.enqueued_at) * 1000)
+                job.attempts += 1
+
+                try:
+                    result = await job.send()
+                except RetryAfter as e:
+                    self._retry_after_total += 1
+                    retry_after = e.retry_after
+                    seconds = retry_after.total_seconds() if isinstance(retry_after, timedelta) else float(retry_after)
+                    if job.attempts <= self.max_retries:
+                        logger.warning(f"Limite do Telegram no chat {chat_id}: nova tentativa em {seconds:.0f}s")
+                        lane.bucket.pause(seconds)
+                        continue
+                    self._finish(lane, job, error=e)
+                except Exception as e:
+                    self._finish(lane, job, error=e)
+                else:
+                    self._finish(lane, job, result=result)
+        finally:
+            lane.task = None
+            if not lane.jobs and self._lanes.get(chat_id) is lane:
+                del self._lanes[chat_id]
+
+    def _finish(self, lane: _ChatLane, job: _Job, result: Any = None, error: Optional[BaseException] = None):
+        """Conclui um envio e entrega o resultado (ou o erro) a quem o pediu"""
+        # Uma emergência pode ter entrado à frente durante o envio: remover o próprio pedido
+        lane.jobs.remove(job)
+        self._queued -= 1
+        if error is not None:
+            self._failed_total += 1
+            if not job.future.done():
+                job.future.set_exception(error)
+        else:
+            self._sent_total += 1
+            if not job.future.done():
+                job.future.set_result(result)
+
+    async def drain(self, timeout: float = 10.0):
+        """Aguarda os envios pendentes (no encerramento)"""
+        tasks = [lane.task for lane in self._lanes.values() if lane.task is not None]
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+        if self._gate_task is not None:
+            self._gate_task.cancel()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas de envio e atraso na fila (ms)"""
+        def p95(samples: Deque[float]) -> float:
+            if not samples:
+                return 0.0
+            ordered = sorted(samples)
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1)
+
+        return {
+            'queued': self._queued,
+            'max_queued': self._max_queued,
+            'active_chats': len(self._lanes),
+            'sent_total': self._sent_total,
+            'failed_total': self._failed_total,
+            'retry_after_total': self._retry_after_total,
+            'queue_delay_p95_ms': p95(self._delays_ms[PRIORITY_NORMAL]),
+            'emergency_queue_delay_p95_ms': p95(self._delays_ms[PRIORITY_EMERGENCY])
+        }
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Particionamento de Usuários - Médico de Bolso
+Processo de entrada recebe as atualizações e as distribui, pelo hash do user_id,
+entre N processos de trabalho; cada processo mantém apenas o estado dos seus usuários.
+
+Como todas as atualizações de um usuário vão sempre para o mesmo processo (e fila),
+a ordem das mensagens de cada usuário é preservada.
+"""
+
+import zlib
+import queue
+import asyncio
+import logging
+import multiprocessing
+from typing import Any, Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Processos novos (spawn): nenhum estado herdado do processo de entrada
+_mp_context = multiprocessing.get_context('spawn')
+
+# Partição atendida por este processo (definida apenas nos processos de trabalho)
+_worker_shard: Optional[int] = None
+
+
+def current_shard() -> Optional[int]:
+    """Partição do processo de trabalho atual (None no processo único)"""
+    return _worker_shard
+
+
+def shard_for(user_id: Optional[int], shard_count: int) -> int:
+    """Partição de um usuário (crc32 é estável entre processos e reinícios)"""
+    if user_id is None:
+        return 0
+    return zlib.crc32(str(user_id).encode('ascii')) % shard_count
+
+
+def replica_for(user_id: Optional[int], replica_count: int, workers: int) -> int:
+    """Réplica de entrada dona de um usuário
+    
+    As partições globais (crc32 % réplicas*processos) são numeradas por réplica: a réplica k atende
+    as partições [k*processos, (k+1)*processos), e shard_for(user_id, processos) dentro dela coincide
+    com a partição global - cada usuário tem um único processo em todo o serviço.
+    """
+    return shard_for(user_id, replica_count * workers) // workers
+
+
+class ShardRouter:
+    """Distribui cargas entre processos de trabalho, um por partição"""
+
+    def __init__(self, shard_count: int, worker_target: Callable, *worker_args: Any, queue_size: int = 1000):
+        """Cria as filas e processos; `worker_target(indice, fila, *worker_args)` roda em cada processo"""
+        self.shard_count = shard_count
+        self.worker_target = worker_target
+        self.worker_args = worker_args
+        self.queues = [_mp_context.Queue(maxsize=queue_size) for _ in range(shard_count)]
+        self.processes: List[multiprocessing.Process] = [self._new_process(index) for index in range(shard_count)]
+        self.routed = [0] * shard_count
+        self.restarts = 0
+
+    def _new_process(self, index: int) -> multiprocessing.Process:
+        return _mp_context.Process(
+            target=self.worker_target,
+            args=(index, self.queues[index], *self.worker_args),
+            name=f"shard-{index}",
+            daemon=True
+        )
+
+    def start(self):
+        """Inicia os processos de trabalho"""
+        for process in self.processes:
+            process.start()
+        logger.info(f"{self.shard_count} processos de trabalho iniciados")
+
+    def _ensure_alive(self, index: int):
+        """Reinicia um processo de trabalho que terminou inesperadamente"""
+        if not self.processes[index].is_alive():
+            logger.error(f"Processo da partição {index} terminou (código {self.processes[index].exitcode}) - reiniciando")
+            self.processes[index] = self._new_process(index)
+            self.processes[index].start()
+            self.restarts += 1
+
+    async def route(self, user_id: Optional[int], payload: Any):
+        """Envia a carga ao processo dono do usuário (aguarda, sem bloquear o loop, se a fila estiver cheia)"""
+        index = shard_for(user_id, self.shard_count)
+        self._ensure_alive(index)
+        try:
+            self.queues[index].put_nowait(payload)
+        except queue.Full:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.queues[index].put, payload)
+        self.routed[index] += 1
+
+    def stop(self, timeout: float = 30.0):
+        """Sinaliza o fim aos processos (após esvaziarem suas filas) e aguarda o encerramento"""
+        for worker_queue in self.queues:
+            worker_queue.put(None)
+        for process in self.processes:
+            process.join(timeout)
+            if process.is_alive():
+                logger.warning(f"Processo {process.name} não encerrou a tempo - finalizando")
+                process.terminate()
+        logger.info(f"Processos de trabalho encerrados (atualizações por partição: {self.routed})")
+
+
+def run_bot_worker(index: int, updates: multiprocessing.Queue, token: str):
+    """Processo de trabalho: aplicação completa do bot, alimentada pela fila da sua partição"""
+    global _worker_shard
+    _worker_shard = index  # usado por start_background_tasks (arquivo de sessões da partição)
+    from src.utils.logger import setup_logger
+    setup_logger()
+    asyncio.run(_bot_worker_loop(index, updates, token))
+
+
+async def _bot_worker_loop(index: int, updates: multiprocessing.Queue, token: str):
+    """Recebe atualizações da fila e as entrega à aplicação local (sem polling próprio)"""
+    from telegram import Update
+    from telegram.ext import Application
+    from src.bot.handlers import register_handlers, start_background_tasks, stop_background_tasks, drain_pending_messages
+    from src.bot.handlers import ingress_tracker
+    from src.bot.ingress import StampedUpdateQueue
+    from src.bot.concurrency import PerUserUpdateProcessor
+    from src.config.settings import MAX_CONCURRENT_UPDATES, MAX_PENDING_UPDATES
+
+    application = (
+        Application.builder()
+        .token(token)
+        .updater(None)
+        .update_queue(StampedUpdateQueue(ingress_tracker))
+        .concurrent_updates(PerUserUpdateProcessor(MAX_CONCURRENT_UPDATES, MAX_PENDING_UPDATES))
+        .build()
+    )
+    register_handlers(application)
+
+    await application.initialize()
+    await start_background_tasks(application)
+    await application.start()
+    logger.info(f"Partição {index} pronta")
+
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            data = await loop.run_in_executor(None, updates.get)
+            if data is None:
+                break
+            await application.update_queue.put(Update.de_json(data, application.bot))
+
+        # Aguardar o processamento das atualizações já recebidas
+        await application.update_queue.join()
+    finally:
+        await drain_pending_messages(application)
+        await application.stop()
+        await stop_background_tasks(application)
+        await application.shutdown()
+        logger.info(f"Partição {index} encerrada")
+
+
+def run_sharded(token: str, workers: int, queue_size: int = 1000):
+    """Processo de entrada: recebe atualizações (polling ou webhook) e as distribui entre os processos"""
+    from telegram import Update
+    from telegram.ext import Application, TypeHandler
+    from src.bot.webhook import run_application
+
+    router = ShardRouter(workers, run_bot_worker, token, queue_size=queue_size)
+
+    async def route_update(update: Update, context) -> None:
+        user = update.effective_user
+        await router.route(user.id if user else None, update.to_dict())
+
+    async def start_router(application) -> None:
+        router.start()
+
+    async def stop_router(application) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, router.stop)
+
+    application = (
+        Application.builder()
+        .token(token)
+        .post_init(start_router)
+        .post_shutdown(stop_router)
+        .build()
+    )
+    application.add_handler(TypeHandler(Update, route_update))
+
+    logger.info(f"Distribuindo atualizações entre {workers} processos de trabalho")
+    run_application(application)
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Modo Webhook - Médico de Bolso
+Servidor HTTP assíncrono (aiohttp) embutido que recebe as atualizações do Telegram
+e as entrega à fila da aplicação, com verificação do token secreto.
+
+Com várias réplicas atrás de um balanceador, cada usuário pertence a uma só réplica (pelo hash
+do user_id); a réplica que recebe a atualização de outro usuário a encaminha à dona antes de
+responder ao Telegram. Assim sessões, ordem por usuário e agrupamento de mensagens continuam
+em um único processo.
+"""
+
+import hmac
+import signal
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+from src.config.settings import (
+    BOT_MODE, BOT_WORKERS, WEBHOOK_LISTEN, WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_URL, WEBHOOK_SECRET_TOKEN,
+    WEBHOOK_REGISTER, WEBHOOK_PEERS, WEBHOOK_REPLICA_INDEX
+)
+from src.bot.sharding import replica_for
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+# Marca as atualizações encaminhadas entre réplicas (processadas onde chegam, sem novo encaminhamento)
+FORWARDED_HEADER = 'X-Medico-Bolso-Forwarded-From'
+FORWARD_TIMEOUT = 10.0  # segundos; o Telegram reenvia a atualização se a resposta falhar
+
+
+class WebhookServer:
+    """Servidor de webhook: valida, decodifica e enfileira atualizações"""
+
+    def __init__(
+        self,
+        application: Application,
+        path: str,
+        secret_token: Optional[str],
+        peers: Optional[List[str]] = None,
+        replica_index: int = 0,
+        workers: int = 1
+    ):
+        self.application = application
+        self.path = path
+        self.secret_token = secret_token
+        self.peers = peers or []
+        self.replica_index = replica_index
+        self.workers = workers
+        self.client: Optional[aiohttp.ClientSession] = None  # encaminhamento entre réplicas
+        self.rejected_total = 0
+        self.received_total = 0
+        self.forwarded_total = 0
+
+        self.web_app = web.Application()
+        self.web_app.router.add_post(path, self.handle_update)
+        self.web_app.router.add_get('/healthz', self.handle_health)
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        """Recebe uma atualização; responde logo após enfileirar (o processamento é assíncrono)"""
+        if self.secret_token:
+            received_token = request.headers.get(SECRET_TOKEN_HEADER, '')
+            if not hmac.compare_digest(received_token, self.secret_token):
+                self.rejected_total += 1
+                logger.warning(f"Webhook recusado: token secreto inválido (origem {request.remote})")
+                return web.Response(status=403)
+
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except Exception as e:
+            logger.warning(f"Webhook com corpo inválido: {e}")
+            return web.Response(status=400)
+
+        owner = self.owner_of(update)
+        if owner != self.replica_index:
+            if not request.headers.get(FORWARDED_HEADER):
+                return await self.forward(owner, data)
+            logger.warning(f"Atualização encaminhada para a réplica errada ({owner} esperada) - verifique WEBHOOK_PEERS")
+
+        await self.application.update_queue.put(update)
+        self.received_total += 1
+        return web.Response()
+
+    def owner_of(self, update: Update) -> int:
+        """Réplica dona do usuário da atualização (esta, se não houver outras)"""
+        if len(self.peers) <= 1:
+            return self.replica_index
+        user = update.effective_user
+        return replica_for(user.id if user else None, len(self.peers), self.workers)
+
+    async def forward(self, owner: int, data: Dict[str, Any]) -> web.Response:
+        """Encaminha a atualização à réplica dona; o Telegram recebe a resposta dela (e reenvia em caso de erro)"""
+        headers = {FORWARDED_HEADER: str(self.replica_index)}
+        if self.secret_token:
+            headers[SECRET_TOKEN_HEADER] = self.secret_token
+        try:
+            async with self.client.post(f"{self.peers[owner]}{self.path}", json=data, headers=headers) as response:
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Falha ao encaminhar atualização à réplica {owner}: {e}")
+            return web.Response(status=502)
+        if status == 200:
+            self.forwarded_total += 1
+        return web.Response(status=status)
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        """Verificação de saúde para o balanceador de carga"""
+        return web.json_response({
+            'status': 'ok' if self.application.running else 'starting',
+            'received_total': self.received_total,
+            'forwarded_total': self.forwarded_total,
+            'rejected_total': self.rejected_total,
+            'queued_updates': self.application.update_queue.qsize()
+        })
+
+
+async def _serve(
+    application: Application,
+    listen: str,
+    port: int,
+    path: str,
+    webhook_url: Optional[str],
+    secret_token: Optional[str],
+    register: bool,
+    peers: List[str],
+    replica_index: int,
+    workers: int
+):
+    """Ciclo de vida equivalente ao de run_polling, com o servidor HTTP no lugar do updater"""
+    server = WebhookServer(application, path, secret_token, peers, replica_index, workers)
+    runner = web.AppRunner(server.web_app, access_log=None)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for stop_signal in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(stop_signal, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: encerramento por KeyboardInterrupt
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+
+        if len(peers) > 1:
+            server.client = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=FORWARD_TIMEOUT))
+
+        # Sem SO_REUSEPORT: dois processos de entrada na mesma porta dividiriam os usuários
+        await runner.setup()
+        site = web.TCPSite(runner, listen, port)
+        await site.start()
+        logger.info(f"Webhook escutando em {listen}:{port}{path}")
+        if len(peers) > 1:
+            logger.info(f"Réplica {replica_index} de {len(peers)}: usuários de outras réplicas são encaminhados")
+
+        # Apenas uma instância precisa registrar a URL (as demais usam WEBHOOK_REGISTER=False)
+        if register:
+            await application.bot.set_webhook(
+                url=webhook_url,
+                secret_token=secret_token,
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"Webhook registrado no Telegram: {webhook_url}")
+
+        await stop_event.wait()
+
+    finally:
+        # Parar de aceitar requisições, processar o que já foi enfileirado e encerrar.
+        # O webhook não é removido: o Telegram guarda as atualizações até a volta do serviço
+        # (ou até o modo polling, que o remove ao iniciar).
+        await runner.cleanup()
+        if server.client is not None:
+            await server.client.close()
+        if application.running:
+            await application.update_queue.join()
+            await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        logger.info("Servidor de webhook encerrado")
+
+
+def run_webhook(
+    application: Application,
+    listen: str,
+    port: int,
+    path: str,
+    webhook_url: Optional[str],
+    secret_token: Optional[str],
+    register: bool = True,
+    peers: Optional[List[str]] = None,
+    replica_index: int = 0,
+    workers: int = 1
+):
+    """Executa a aplicação em modo webhook até receber SIGINT/SIGTERM
+    
+    Topologias suportadas: uma réplica de entrada (com BOT_WORKERS processos de trabalho) ou
+    várias réplicas listadas em WEBHOOK_PEERS, que encaminham cada usuário à sua réplica dona.
+    """
+    peers = peers or []
+    if register and not webhook_url:
+        raise ValueError("WEBHOOK_URL deve ser configurada para registrar o webhook")
+    if not register and len(peers) <= 1:
+        raise ValueError(
+            "WEBHOOK_REGISTER=False indica réplica adicional: configure WEBHOOK_PEERS e WEBHOOK_REPLICA_INDEX "
+            "para que cada usuário seja atendido por uma única réplica"
+        )
+    if peers and not 0 <= replica_index < len(peers):
+        raise ValueError(f"WEBHOOK_REPLICA_INDEX deve estar entre 0 e {len(peers) - 1}")
+    if not secret_token:
+        logger.warning("WEBHOOK_SECRET_TOKEN não configurado - atualizações não serão autenticadas")
+
+    try:
+        asyncio.run(_serve(
+            application, listen, port, path, webhook_url, secret_token, register, peers, replica_index, workers
+        ))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_application(application: Application):
+    """Executa a aplicação no modo de entrada configurado (BOT_MODE: polling ou webhook)"""
+    if BOT_MODE == 'webhook':
+        run_webhook(
+            application,
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            path=WEBHOOK_PATH,
+            webhook_url=WEBHOOK_URL,
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            register=WEBHOOK_REGISTER,
+            peers=WEBHOOK_PEERS,
+            replica_index=WEBHOOK_REPLICA_INDEX,
+            workers=BOT_WORKERS
+        )
+    else:
+        # Ao iniciar, o polling remove um webhook registrado anteriormente (troca de modo sem perdas)
+        application.run_polling()
@@ -45,9 +45,68 @@ GEMINI_MODELS = [
     'gemini-live-2.5-flash-preview'
 ]
 
+# Prefetch especulativo: chamada ao Gemini iniciada junto com a decisão local (cancelada se ela responder)
+GEMINI_SPECULATIVE_PREFETCH = os.getenv('GEMINI_SPECULATIVE_PREFETCH', 'False').lower() == 'true'
+GEMINI_SPECULATION_BUDGET = int(os.getenv('GEMINI_SPECULATION_BUDGET', '30'))  # chamadas especulativas por minuto
+
 # Configurações MCP
 MCP_SERVER_URL = os.getenv('MCP_SERVER_URL', 'http://localhost:8080')
 MCP_API_KEY = os.getenv('MCP_API_KEY')
+MCP_REQUEST_TIMEOUT = float(os.getenv('MCP_REQUEST_TIMEOUT', '5'))  # segundos por chamada
+MCP_CONNECT_TIMEOUT = float(os.getenv('MCP_CONNECT_TIMEOUT', '2'))  # segundos para abrir a conexão
+MCP_POOL_SIZE = int(os.getenv('MCP_POOL_SIZE', '20'))  # conexões keep-alive no total
+MCP_POOL_PER_HOST = int(os.getenv('MCP_POOL_PER_HOST', '10'))  # conexões por servidor
+MCP_KEEPALIVE_TIMEOUT = float(os.getenv('MCP_KEEPALIVE_TIMEOUT', '30'))  # segundos de conexão ociosa
+MCP_RECONNECT_MIN_DELAY = float(os.getenv('MCP_RECONNECT_MIN_DELAY', '1'))  # espera inicial entre reconexões
+MCP_RECONNECT_MAX_DELAY = float(os.getenv('MCP_RECONNECT_MAX_DELAY', '60'))  # espera máxima entre reconexões
+MCP_CALL_DEADLINE = float(os.getenv('MCP_CALL_DEADLINE', '1.5'))  # prazo (s) de cada chamada de enriquecimento
+MCP_ENRICHMENT_MODE = os.getenv('MCP_ENRICHMENT_MODE', 'batch').lower()  # batch (um lote) ou fanout (paralelo)
+MCP_CACHE_SIZE = int(os.getenv('MCP_CACHE_SIZE', '256'))  # diretrizes e protocolos em cache
+MCP_CACHE_TTL = float(os.getenv('MCP_CACHE_TTL', '3600'))  # segundos em que a entrada é considerada atual
+MCP_CACHE_STALE_TTL = float(os.getenv('MCP_CACHE_STALE_TTL', '86400'))  # segundos extras servida enquanto atualiza
+MCP_CACHE_PATH = os.getenv('MCP_CACHE_PATH', '')  # arquivo JSON do cache (vazio = apenas memória)
+MCP_EVENT_QUEUE_SIZE = int(os.getenv('MCP_EVENT_QUEUE_SIZE', '10000'))  # eventos aguardando envio
+MCP_EVENT_BATCH_SIZE = int(os.getenv('MCP_EVENT_BATCH_SIZE', '100'))  # eventos por lote de notificações
+MCP_EVENT_FLUSH_INTERVAL = float(os.getenv('MCP_EVENT_FLUSH_INTERVAL', '2'))  # segundos entre envios
+MCP_EVENT_SPILL_PATH = os.getenv('MCP_EVENT_SPILL_PATH', 'mcp_events.jsonl')  # eventos não enviados (vazio = descartar)
+MCP_TRANSPORT = os.getenv('MCP_TRANSPORT', 'http').lower()  # http (POST por chamada) ou stdio (servidor local)
+MCP_SERVER_COMMAND = os.getenv('MCP_SERVER_COMMAND', '')  # comando do servidor MCP local (transporte stdio)
+MCP_MAX_IN_FLIGHT = int(os.getenv('MCP_MAX_IN_FLIGHT', '64'))  # requisições simultâneas no canal stdio
+
+# Concorrência: handlers simultâneos (usuários diferentes) e atualizações aceitas aguardando vez
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '64'))
+MAX_PENDING_UPDATES = int(os.getenv('MAX_PENDING_UPDATES', '1024'))
+
+# Agrupamento de mensagens em sequência rápida (segundos; janela 0 desativa)
+MESSAGE_DEBOUNCE_WINDOW = float(os.getenv('MESSAGE_DEBOUNCE_WINDOW', '1.5'))  # espera após a última mensagem
+MESSAGE_DEBOUNCE_MAX_WINDOW = float(os.getenv('MESSAGE_DEBOUNCE_MAX_WINDOW', '6'))  # espera máxima desde a primeira
+MESSAGE_DEBOUNCE_EMERGENCY_WINDOW = float(os.getenv('MESSAGE_DEBOUNCE_EMERGENCY_WINDOW', '0'))  # com emergência detectada
+
+# Emergências: instruções locais enviadas na hora, orientação da IA em seguida (SLO em segundos desde a mensagem)
+EMERGENCY_FIRST_INSTRUCTION_SLO = float(os.getenv('EMERGENCY_FIRST_INSTRUCTION_SLO', '3'))
+
+# Escalonamento horizontal: processos de trabalho com usuários particionados (1 = processo único)
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '1'))
+SHARD_QUEUE_SIZE = int(os.getenv('SHARD_QUEUE_SIZE', '1000'))  # atualizações pendentes por processo
+
+# Fila de saída: limites do Telegram (~30 mensagens/s no total, ~1/s por chat)
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', '25'))  # mensagens por segundo (todas as conversas)
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', '1'))  # mensagens por segundo por chat
+OUTBOUND_CHAT_BURST = float(os.getenv('OUTBOUND_CHAT_BURST', '3'))  # rajada permitida por chat
+OUTBOUND_MAX_RETRIES = int(os.getenv('OUTBOUND_MAX_RETRIES', '3'))  # novas tentativas após RetryAfter
+
+# Modo de entrada das atualizações: "polling" ou "webhook"
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # URL pública registrada no Telegram
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN')
+WEBHOOK_REGISTER = os.getenv('WEBHOOK_REGISTER', 'True').lower() == 'true'  # False nas réplicas adicionais
+# Várias réplicas de entrada: URLs base de todas, na mesma ordem em cada uma, e a posição desta réplica.
+# Cada réplica encaminha à dona (pelo hash do user_id) as atualizações dos usuários que não são seus.
+WEBHOOK_PEERS = [url.strip().rstrip('/') for url in os.getenv('WEBHOOK_PEERS', '').split(',') if url.strip()]
+WEBHOOK_REPLICA_INDEX = int(os.getenv('WEBHOOK_REPLICA_INDEX', '0'))
 
 # Configurações de logging
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -56,6 +115,22 @@ LOG_FILE = os.getenv('LOG_FILE', 'medico_bolso.log')
 # Configurações médicas
 MAX_CONSULTATION_LENGTH = int(os.getenv('MAX_CONSULTATION_LENGTH', '2000'))
 SESSION_TIMEOUT = int(os.getenv('SESSION_TIMEOUT', '1800'))  # 30 minutos
+SESSION_SWEEP_INTERVAL = int(os.getenv('SESSION_SWEEP_INTERVAL', '30'))  # varredura de sessões expiradas (segundos)
+
+# Persistência das sessões (gravação em lote fora do event loop; vazio ou "memory" desativa)
+SESSION_STORE_URL = os.getenv('SESSION_STORE_URL', os.getenv('DATABASE_URL', 'sqlite:///medico_bolso.db'))
+SESSION_FLUSH_INTERVAL = float(os.getenv('SESSION_FLUSH_INTERVAL', '2'))  # intervalo entre gravações (segundos)
+
+TRIAGE_URGENCY_DECAY = int(os.getenv('TRIAGE_URGENCY_DECAY', '900'))  # segundos por nível de urgência
+TRIAGE_CACHE_SIZE = int(os.getenv('TRIAGE_CACHE_SIZE', '2048'))  # mensagens curtas memorizadas
+QUICK_RESPONSE_CACHE_SIZE = int(os.getenv('QUICK_RESPONSE_CACHE_SIZE', '2048'))  # respostas rápidas memorizadas
+
+# Banco de respostas validadas (FAQ semântico sem uso da IA completa)
+# Caminhos relativos são resolvidos a partir da raiz do projeto, não do diretório atual
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FAQ_BANK_PATH = os.path.join(PROJECT_ROOT, os.getenv('FAQ_BANK_PATH', 'data/faq_bank.json'))
+FAQ_INDEX_DIR = os.path.join(PROJECT_ROOT, os.getenv('FAQ_INDEX_DIR', 'data/faq_index'))
+FAQ_SIMILARITY_THRESHOLD = float(os.getenv('FAQ_SIMILARITY_THRESHOLD', '0.6'))
 
 # Mensagens do sistema
 WELCOME_MESSAGE = """
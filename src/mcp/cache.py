@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de Respostas MCP - Médico de Bolso
+Cache limitado com validade (TTL) para conteúdo que muda pouco (diretrizes, protocolos):
+entradas vencidas continuam sendo servidas enquanto são atualizadas em segundo plano
+(stale-while-revalidate), com persistência opcional em disco para reinícios sem cache frio.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, Tuple
+
+from src.utils.lru_cache import LRUCache, MISSING
+from src.utils.serialization import dumps, dumps_str, loads
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(method: str, params: Dict[str, Any]) -> str:
+    """Chave canônica: método + parâmetros serializados com chaves ordenadas"""
+    return method + ' ' + dumps_str(params, sort_keys=True)
+
+
+class StaleWhileRevalidateCache:
+    """Cache LRU com TTL: dentro de `ttl` a entrada é fresca; até `ttl + stale_ttl` é servida
+    como está e atualizada em segundo plano; depois disso é tratada como ausente."""
+
+    def __init__(self, max_size: int, ttl: float, stale_ttl: float, path: Optional[str] = None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.path = path
+        self._entries = LRUCache(max_size)  # chave -> (valor, instante da busca em time.time())
+        self._refreshing: Set[Hashable] = set()
+        self._refresh_tasks: Set[asyncio.Task] = set()
+        self._fetching: Dict[Hashable, asyncio.Future] = {}  # buscas em andamento (uma por chave)
+        self._dirty = False
+
+        # Métricas
+        self.fresh_hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.shared_fetches = 0
+        self.refreshes = 0
+        self.refresh_failures = 0
+
+        if path:
+            self.load()
+
+    def lookup(self, key: Hashable) -> Tuple[Any, bool]:
+        """Retorna (valor ou MISSING, precisa_atualizar)"""
+        entry = self._entries.get(key)
+        if entry is MISSING:
+            self.misses += 1
+            return MISSING, True
+
+        value, fetched_at = entry
+        age = time.time() - fetched_at
+        if age < self.ttl:
+            self.fresh_hits += 1
+            return value, False
+        if age < self.ttl + self.stale_ttl:
+            self.stale_hits += 1
+            return value, True
+        self.misses += 1
+        return MISSING, True
+
+    def store(self, key: Hashable, value: Any):
+        """Armazena um valor obtido agora (valores vazios não são guardados)"""
+        if value:
+            self._entries.put(key, (value, time.time()))
+            self._dirty = True
+
+    def refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]):
+        """Atualiza a entrada em segundo plano (no máximo uma atualização por chave)"""
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = asyncio.create_task(self._refresh(key, fetch))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]):
+        try:
+            value = await fetch()
+            if value:
+                self.store(key, value)
+                self.refreshes += 1
+            else:
+                self.refresh_failures += 1  # Mantém a entrada antiga até a próxima tentativa
+        except Exception as e:
+            self.refresh_failures += 1
+            logger.warning(f"Falha ao atualizar cache MCP: {e}")
+        finally:
+            self._refreshing.discard(key)
+
+    async def get_or_fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Valor em cache (fresco ou vencido, com atualização em segundo plano) ou buscado agora"""
+        value, needs_refresh = self.lookup(key)
+        if value is MISSING:
+            # Faltas simultâneas da mesma chave aguardam uma única busca
+            pending = self._fetching.get(key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._fetch(key, fetch))
+                self._fetching[key] = pending
+                pending.add_done_callback(lambda _: self._fetching.pop(key, None))
+            else:
+                self.shared_fetches += 1
+            return await asyncio.shield(pending)
+        if needs_refresh:
+            self.refresh(key, fetch)
+        return value
+
+    async def _fetch(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        value = await fetch()
+        self.store(key, value)
+        return value
+
+    def clear(self):
+        """Esvazia o cache (mantém as estatísticas)"""
+        self._entries.clear()
+        self._dirty = True
+
+    def load(self):
+        """Carrega as entradas gravadas em disco (reinício com cache já aquecido)"""
+        try:
+            with open(self.path, 'rb') as file:
+                entries = loads(file.read())
+            expired_before = time.time() - self.ttl - self.stale_ttl
+            for key, value, fetched_at in entries:
+                if fetched_at > expired_before:
+                    self._entries.put(key, (value, fetched_at))
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            # Arquivo corrompido ou de outro formato: começa com o cache vazio
+            self._entries.clear()
+            logger.warning(f"Cache MCP em disco ignorado ({self.path}): {e}")
+            return
+        logger.info(f"Cache MCP carregado do disco: {len(self._entries)} entradas")
+
+    def save(self):
+        """Grava as entradas em disco (escrita atômica); nada a fazer sem alterações"""
+        if not self.path or not self._dirty:
+            return
+        entries = [[key, value, fetched_at] for key, (value, fetched_at) in self._entries.items()]
+        temporary_path = f"{self.path}.tmp"
+        try:
+            with open(temporary_path, 'wb') as file:
+                file.write(dumps(entries))
+            os.replace(temporary_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            logger.warning(f"Erro ao gravar cache MCP em disco: {e}")
+
+    async def close(self):
+        """Cancela as atualizações pendentes e grava o cache"""
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        self.save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas do cache"""
+        return {
+            'size': len(self._entries),
+            'max_size': self._entries.max_size,
+            'fresh_hits': self.fresh_hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'shared_fetches': self.shared_fetches,
+            'refreshes': self.refreshes,
+            'refresh_failures': self.refresh_failures,
+            'refreshing': len(self._refreshing),
+            'fetching': len(self._fetching)
+        }
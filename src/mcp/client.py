@@ -5,16 +5,33 @@ Cliente MCP - Médico de Bolso
 Model Context Protocol para comunicação avançada
 """
 
+import time
 import asyncio
-import json
+import shlex
+import random
+import itertools
 import logging
 import aiohttp
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Any, Optional
+from dataclasses import dataclass, field
 from src.config.settings import MCP_SERVER_URL, MCP_API_KEY
+from src.config.settings import (
+    MCP_REQUEST_TIMEOUT, MCP_CONNECT_TIMEOUT, MCP_POOL_SIZE, MCP_POOL_PER_HOST, MCP_KEEPALIVE_TIMEOUT,
+    MCP_RECONNECT_MIN_DELAY, MCP_RECONNECT_MAX_DELAY, MCP_CALL_DEADLINE, MCP_ENRICHMENT_MODE,
+    MCP_CACHE_SIZE, MCP_CACHE_TTL, MCP_CACHE_STALE_TTL, MCP_CACHE_PATH,
+    MCP_TRANSPORT, MCP_SERVER_COMMAND, MCP_MAX_IN_FLIGHT
+)
+from src.mcp.cache import StaleWhileRevalidateCache, cache_key
+from src.mcp.transport import StdioTransport
+from src.utils.lru_cache import MISSING
+from src.utils.serialization import dumps, loads
 
 logger = logging.getLogger(__name__)
 
+# Falhas de comunicação que tornam o servidor indisponível (cache negativo até a reconexão)
+TRANSPORT_ERRORS = (aiohttp.ClientConnectionError, ConnectionError, asyncio.TimeoutError)
+
 @dataclass
 class MCPMessage:
     """Mensagem do protocolo MCP"""
@@ -31,32 +48,100 @@ class MCPResponse:
     id: Optional[str] = None
     jsonrpc: str = "2.0"
 
+@dataclass
+class MCPCall:
+    """Chamada de um fan-out: chave do resultado, mensagem, conversão da resposta e prazo (s)"""
+    key: str
+    message: MCPMessage
+    parse: Callable[[Optional[MCPResponse]], Any]
+    deadline: float = MCP_CALL_DEADLINE
+    cache_key: Optional[str] = None  # resultado guardado no cache de respostas
+
+@dataclass
+class _ToolStats:
+    """Contadores de uma ferramenta MCP"""
+    calls: int = 0
+    timeouts: int = 0
+    errors: int = 0
+    latencies_ms: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
 class MCPClient:
     """Cliente para comunicação via Model Context Protocol"""
     
-    def __init__(self):
-        """Inicializa o cliente MCP"""
+    def __init__(self, transport: str = MCP_TRANSPORT, server_command: str = MCP_SERVER_COMMAND):
+        """Inicializa o cliente MCP
+        
+        `transport`: 'http' (um POST por mensagem ou lote, em `server_url`) ou 'stdio'
+        (canal persistente com o servidor local iniciado por `server_command`).
+        """
         self.server_url = MCP_SERVER_URL
         self.api_key = MCP_API_KEY
         self.session = None
         self.connected = False
+        
+        # Notificações enviadas pelo servidor (apenas no transporte stdio)
+        self._notification_handlers: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+        self.stdio: Optional[StdioTransport] = None
+        if transport == 'stdio':
+            if not server_command:
+                raise ValueError("MCP_SERVER_COMMAND deve ser configurado para o transporte stdio")
+            self.stdio = StdioTransport(
+                shlex.split(server_command),
+                request_timeout=MCP_REQUEST_TIMEOUT,
+                max_in_flight=MCP_MAX_IN_FLIGHT,
+                on_notification=self._on_notification
+            )
+        
+        # Reconexão em segundo plano (uma única tarefa compartilhada)
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._reconnect_attempts = 0
+        self._skipped_calls = 0
+        self._last_error: Optional[str] = None
+        
+        # JSON-RPC: ids de requisição e suporte do servidor a lotes
+        self._request_ids = itertools.count(1)
+        self._batch_supported = True
+        self._batches_sent = 0
+        self._batched_calls = 0
+        
+        # Métricas por ferramenta (chamadas em paralelo com prazo)
+        self._tool_stats: Dict[str, _ToolStats] = {}
+        
+        # Diretrizes e protocolos mudam pouco: cache com atualização em segundo plano
+        self.response_cache = StaleWhileRevalidateCache(
+            MCP_CACHE_SIZE, MCP_CACHE_TTL, MCP_CACHE_STALE_TTL, MCP_CACHE_PATH or None
+        )
         logger.info("Cliente MCP inicializado")
     
-    async def connect(self) -> bool:
-        """Conecta ao servidor MCP"""
-        try:
+    def _ensure_session(self) -> aiohttp.ClientSession:
+        """Sessão HTTP única e duradoura, com pool de conexões keep-alive"""
+        if self.session is None or self.session.closed:
+            headers = {'Content-Type': 'application/json'}
+            if self.api_key:
+                headers['Authorization'] = f'Bearer {self.api_key}'
+            
             self.session = aiohttp.ClientSession(
-                headers={
-                    'Content-Type': 'application/json',
-                    'Authorization': f'Bearer {self.api_key}' if self.api_key else None
-                },
-                timeout=aiohttp.ClientTimeout(total=30)
+                headers=headers,
+                connector=aiohttp.TCPConnector(
+                    limit=MCP_POOL_SIZE,
+                    limit_per_host=MCP_POOL_PER_HOST,
+                    keepalive_timeout=MCP_KEEPALIVE_TIMEOUT,
+                    ttl_dns_cache=300
+                ),
+                timeout=aiohttp.ClientTimeout(total=MCP_REQUEST_TIMEOUT, connect=MCP_CONNECT_TIMEOUT)
             )
-            
-            # Testar conexão
-            response = await self._send_message(MCPMessage(
-                method="initialize",
-                params={
+        return self.session
+    
+    async def _handshake(self) -> bool:
+        """Executa o initialize do protocolo (no transporte stdio, inicia o servidor local antes)"""
+        try:
+            if self.stdio is not None:
+                await self.stdio.start()
+            data = await self._post({
+                "jsonrpc": "2.0",
+                "id": str(next(self._request_ids)),
+                "method": "initialize",
+                "params": {
                     "protocolVersion": "2024-11-05",
                     "capabilities": {
                         "roots": {"listChanged": True},
@@ -67,47 +152,171 @@ class MCPClient:
                         "version": "1.0.0"
                     }
                 }
-            ))
-            
-            if response and not response.error:
-                self.connected = True
-                logger.info("Conectado ao servidor MCP com sucesso")
-                return True
-            else:
-                logger.error(f"Erro ao conectar MCP: {response.error if response else 'Sem resposta'}")
-                return False
-                
+            })
         except Exception as e:
-            logger.error(f"Erro ao conectar ao servidor MCP: {e}")
+            self._last_error = str(e) or type(e).__name__
             return False
+        
+        if data is None or data.get('error'):
+            self._last_error = str(data.get('error')) if data else "Sem resposta"
+            return False
+        
+        try:
+            await self._post({"jsonrpc": "2.0", "method": "notifications/initialized"})
+        except Exception as e:
+            logger.debug(f"Falha ao confirmar inicialização MCP: {e}")
+        return True
+    
+    async def connect(self) -> bool:
+        """Conecta ao servidor MCP (uma tentativa; se falhar, a reconexão continua em segundo plano)"""
+        if await self._handshake():
+            self._mark_available()
+            return True
+        
+        logger.error(f"Erro ao conectar ao servidor MCP: {self._last_error}")
+        self._mark_unavailable(self._last_error)
+        return False
+    
+    def _mark_available(self):
+        if not self.connected:
+            logger.info("Conectado ao servidor MCP com sucesso")
+        self.connected = True
+        self._last_error = None
+    
+    def _mark_unavailable(self, reason: Optional[str]):
+        """Registra o servidor como indisponível: chamadas seguintes retornam vazio sem esperar"""
+        if self.connected:
+            logger.warning(f"Servidor MCP indisponível: {reason}")
+        self.connected = False
+        self._last_error = reason
+        self._schedule_reconnect()
+    
+    def _schedule_reconnect(self):
+        """Garante uma única tarefa de reconexão em andamento"""
+        if self._reconnect_task is None or self._reconnect_task.done():
+            try:
+                self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect_loop())
+            except RuntimeError:
+                pass  # Sem event loop: a próxima chamada assíncrona agenda a reconexão
+    
+    async def _reconnect_loop(self):
+        """Tenta reconectar com espera exponencial (com variação aleatória) entre as tentativas"""
+        delay = MCP_RECONNECT_MIN_DELAY
+        first_attempt = True
+        while not self.connected:
+            if not first_attempt:
+                await asyncio.sleep(delay * random.uniform(0.8, 1.2))
+                delay = min(delay * 2, MCP_RECONNECT_MAX_DELAY)
+            first_attempt = False
+            
+            self._reconnect_attempts += 1
+            if await self._handshake():
+                self._mark_available()
+                return
+            logger.debug(f"Reconexão MCP falhou ({self._last_error}); próxima em ~{delay:.0f}s")
+    
+    def _available(self) -> bool:
+        """Verificação O(1) antes de cada chamada: com o servidor fora, não há espera na consulta"""
+        if self.connected:
+            return True
+        self._skipped_calls += 1
+        self._schedule_reconnect()
+        return False
     
     async def disconnect(self):
         """Desconecta do servidor MCP"""
+        if self._reconnect_task:
+            self._reconnect_task.cancel()
+            self._reconnect_task = None
+        await self.response_cache.close()
         if self.session:
             await self.session.close()
             self.session = None
+        if self.stdio:
+            await self.stdio.close()
         self.connected = False
         logger.info("Desconectado do servidor MCP")
     
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """Estado da conexão e da reconexão"""
+        return {
+            'connected': self.connected,
+            'reconnecting': self._reconnect_task is not None and not self._reconnect_task.done(),
+            'reconnect_attempts': self._reconnect_attempts,
+            'skipped_calls': self._skipped_calls,
+            'last_error': self._last_error,
+            'batch_supported': self._batch_supported,
+            'batches_sent': self._batches_sent,
+            'batched_calls': self._batched_calls,
+            'transport': 'stdio' if self.stdio else 'http',
+            'stdio': self.stdio.get_stats() if self.stdio else None
+        }
+    
+    def add_notification_handler(self, method: str, handler: Callable[[Dict[str, Any]], None]):
+        """Registra uma função chamada a cada notificação `method` enviada pelo servidor"""
+        self._notification_handlers.setdefault(method, []).append(handler)
+    
+    def _on_notification(self, message: Dict[str, Any]):
+        method = message.get('method', '')
+        handlers = self._notification_handlers.get(method)
+        if not handlers:
+            logger.debug(f"Notificação MCP sem tratamento: {method}")
+            return
+        for handler in handlers:
+            handler(message.get('params', {}))
+    
+    @staticmethod
+    def _resources_request(query: str) -> MCPMessage:
+        return MCPMessage(method="resources/list", params={"query": query, "type": "medical"})
+    
+    @staticmethod
+    def _parse_resources(response: Optional[MCPResponse]) -> List[Dict[str, Any]]:
+        if response and response.result:
+            return response.result.get('resources', [])
+        return []
+    
+    @staticmethod
+    def _guidelines_request(condition: str) -> MCPMessage:
+        return MCPMessage(
+            method="tools/call",
+            params={
+                "name": "get_medical_guidelines",
+                "arguments": {
+                    "condition": condition,
+                    "language": "pt-BR"
+                }
+            }
+        )
+    
+    @staticmethod
+    def _protocols_request(symptoms: List[str]) -> MCPMessage:
+        return MCPMessage(
+            method="tools/call",
+            params={
+                "name": "emergency_protocols",
+                "arguments": {
+                    "symptoms": sorted(set(symptoms)),  # ordem irrelevante: uma só chave de cache
+                    "language": "pt-BR"
+                }
+            }
+        )
+    
+    @staticmethod
+    def _parse_result(response: Optional[MCPResponse]) -> Dict[str, Any]:
+        if response and response.result:
+            return response.result
+        return {}
+    
     async def get_medical_resources(self, query: str) -> List[Dict[str, Any]]:
         """Busca recursos médicos via MCP"""
-        if not self.connected:
-            await self.connect()
+        if not self._available():
+            return []
         
         try:
-            response = await self._send_message(MCPMessage(
-                method="resources/list",
-                params={
-                    "query": query,
-                    "type": "medical"
-                }
-            ))
-            
-            if response and response.result:
-                return response.result.get('resources', [])
-            else:
+            resources = self._parse_resources(await self._send_message(self._resources_request(query)))
+            if not resources:
                 logger.warning(f"Nenhum recurso médico encontrado para: {query}")
-                return []
+            return resources
                 
         except Exception as e:
             logger.error(f"Erro ao buscar recursos médicos: {e}")
@@ -115,8 +324,8 @@ class MCPClient:
     
     async def get_drug_interactions(self, medications: List[str]) -> Dict[str, Any]:
         """Verifica interações medicamentosas via MCP"""
-        if not self.connected:
-            await self.connect()
+        if not self._available():
+            return {}
         
         try:
             response = await self._send_message(MCPMessage(
@@ -140,35 +349,36 @@ class MCPClient:
             return {}
     
     async def get_medical_guidelines(self, condition: str) -> Dict[str, Any]:
-        """Busca diretrizes médicas para uma condição"""
-        if not self.connected:
-            await self.connect()
+        """Busca diretrizes médicas para uma condição (com cache)"""
+        return await self._cached_fetch(lambda: self._guidelines_request(condition), self._parse_result)
+    
+    async def _fetch(self, message: MCPMessage, parse: Callable[[Optional[MCPResponse]], Any]) -> Any:
+        """Uma chamada ao servidor; com o servidor indisponível ou em erro, retorna o vazio de `parse`"""
+        if not self._available():
+            return parse(None)
         
         try:
-            response = await self._send_message(MCPMessage(
-                method="tools/call",
-                params={
-                    "name": "get_medical_guidelines",
-                    "arguments": {
-                        "condition": condition,
-                        "language": "pt-BR"
-                    }
-                }
-            ))
-            
-            if response and response.result:
-                return response.result
-            else:
-                return {}
-                
+            return parse(await self._send_message(message))
         except Exception as e:
-            logger.error(f"Erro ao buscar diretrizes médicas: {e}")
-            return {}
+            logger.error(f"Erro na chamada MCP '{self._tool_name(message)}': {e}")
+            return parse(None)
+    
+    async def _cached_fetch(
+        self,
+        build_message: Callable[[], MCPMessage],
+        parse: Callable[[Optional[MCPResponse]], Any]
+    ) -> Any:
+        """Chamada servida pelo cache de respostas (entradas vencidas são atualizadas em segundo plano)"""
+        message = build_message()
+        return await self.response_cache.get_or_fetch(
+            cache_key(message.method, message.params),
+            lambda: self._fetch(build_message(), parse)
+        )
     
     async def log_medical_event(self, event_data: Dict[str, Any]) -> bool:
         """Registra evento médico via MCP"""
-        if not self.connected:
-            await self.connect()
+        if not self._available():
+            return False
         
         try:
             response = await self._send_message(MCPMessage(
@@ -181,68 +391,290 @@ class MCPClient:
         except Exception as e:
             logger.error(f"Erro ao registrar evento médico: {e}")
             return False
-    
+
+    async def send_notifications(self, method: str, params_list: List[Dict[str, Any]]) -> bool:
+        """Envia várias notificações em um único lote; True se o servidor as recebeu"""
+        if not params_list or not self._available():
+            return False
+
+        messages = [MCPMessage(method=method, params=params) for params in params_list]
+        if not self._batch_supported or len(messages) == 1:
+            responses = await asyncio.gather(*(self._send_message(message) for message in messages))
+            return all(response is not None and not response.error for response in responses)
+
+        try:
+            data = await self._post([self._payload(message) for message in messages])
+        except TRANSPORT_ERRORS as e:
+            self._mark_unavailable(str(e) or type(e).__name__)
+            return False
+        except Exception as e:
+            logger.error(f"Erro ao enviar notificações MCP: {e}")
+            return False
+
+        if isinstance(data, dict) and data.get('error'):
+            logger.warning(f"Servidor MCP não aceita lotes JSON-RPC ({data['error']}) - enviando individualmente")
+            self._batch_supported = False
+            return await self.send_notifications(method, params_list)
+
+        if data is not None:
+            self._batches_sent += 1
+            self._batched_calls += len(messages)
+        return data is not None
+
     async def get_emergency_protocols(self, symptoms: List[str]) -> Dict[str, Any]:
-        """Busca protocolos de emergência baseados em sintomas"""
+        """Busca protocolos de emergência baseados em sintomas (com cache)"""
+        return await self._cached_fetch(lambda: self._protocols_request(symptoms), self._parse_result)
+    
+    async def prefetch_emergency_protocols(self, categories: Iterable[str]) -> int:
+        """Aquece o cache com os protocolos de cada categoria de emergência (na inicialização)"""
         if not self.connected:
             await self.connect()
         
-        try:
-            response = await self._send_message(MCPMessage(
-                method="tools/call",
-                params={
-                    "name": "emergency_protocols",
-                    "arguments": {
-                        "symptoms": symptoms,
-                        "language": "pt-BR"
-                    }
-                }
+        categories = list(categories)
+        protocols = await asyncio.gather(*(self.get_emergency_protocols([category]) for category in categories))
+        self.response_cache.save()
+        
+        loaded = sum(1 for protocol in protocols if protocol)
+        logger.info(f"Protocolos de emergência em cache: {loaded} de {len(categories)} categorias")
+        return loaded
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Estatísticas do cache de respostas"""
+        return self.response_cache.get_stats()
+    
+    async def get_enrichment(
+        self,
+        query: str,
+        symptoms: Optional[List[str]] = None,
+        condition: Optional[str] = None,
+        deadline: float = MCP_CALL_DEADLINE
+    ) -> Dict[str, Any]:
+        """Recursos, protocolos de emergência e diretrizes, limitados ao prazo `deadline`
+        
+        Protocolos e diretrizes em cache não vão ao servidor. No modo 'batch' (padrão) as
+        demais chamadas vão em um único lote JSON-RPC; no modo 'fanout' (ou se o servidor não
+        aceitar lotes) vão em paralelo e o que não terminar a tempo é descartado, sem atrasar
+        os demais resultados.
+        """
+        enrichment: Dict[str, Any] = {}
+        calls = [MCPCall('resources', self._resources_request(query), self._parse_resources, deadline)]
+        if symptoms:
+            self._add_cached_call(calls, enrichment, MCPCall(
+                'emergency_protocols', self._protocols_request(symptoms), self._parse_result, deadline
             ))
-            
-            if response and response.result:
-                return response.result
-            else:
-                return {}
-                
+        if condition:
+            self._add_cached_call(calls, enrichment, MCPCall(
+                'guidelines', self._guidelines_request(condition), self._parse_result, deadline
+            ))
+        
+        if not self._available():
+            return enrichment
+        
+        results = await self._call_all(calls, deadline)
+        for call in calls:
+            if call.cache_key and call.key in results:
+                self.response_cache.store(call.cache_key, results[call.key])
+        enrichment.update(results)
+        return enrichment
+    
+    def _add_cached_call(self, calls: List[MCPCall], enrichment: Dict[str, Any], call: MCPCall):
+        """Usa o valor em cache (atualizando-o em segundo plano se vencido) ou inclui a chamada"""
+        call.cache_key = cache_key(call.message.method, call.message.params)
+        value, needs_refresh = self.response_cache.lookup(call.cache_key)
+        if value is MISSING:
+            calls.append(call)
+            return
+        
+        enrichment[call.key] = value
+        if needs_refresh:
+            self.response_cache.refresh(call.cache_key, lambda: self._fetch(call.message, call.parse))
+    
+    async def _call_all(self, calls: List[MCPCall], deadline: float) -> Dict[str, Any]:
+        """Executa as chamadas em lote ou em paralelo (conforme MCP_ENRICHMENT_MODE)"""
+        if MCP_ENRICHMENT_MODE == 'fanout' or not self._batch_supported:
+            return await self.fan_out(calls)
+        
+        try:
+            responses = await asyncio.wait_for(self.send_batch([call.message for call in calls]), deadline)
+        except asyncio.TimeoutError:
+            logger.warning(f"Lote de enriquecimento MCP excedeu o prazo de {deadline:.1f}s")
+            return {}
         except Exception as e:
-            logger.error(f"Erro ao buscar protocolos de emergência: {e}")
+            logger.error(f"Erro ao buscar dados de enriquecimento MCP: {e}")
             return {}
+        
+        results = {}
+        for call, response in zip(calls, responses):
+            value = call.parse(response)
+            if value:
+                results[call.key] = value
+        return results
     
-    async def _send_message(self, message: MCPMessage) -> Optional[MCPResponse]:
-        """Envia mensagem para o servidor MCP"""
-        if not self.session:
+    async def fan_out(self, calls: List[MCPCall]) -> Dict[str, Any]:
+        """Executa as chamadas em paralelo, cada uma com o seu prazo
+        
+        Retorna apenas os resultados (não vazios) que chegaram a tempo; chamadas que excedem
+        o prazo são canceladas e contadas como timeout da ferramenta.
+        """
+        if not calls or not self._available():
+            return {}
+        
+        values = await asyncio.gather(*(self._timed_call(call) for call in calls))
+        return {call.key: value for call, value in zip(calls, values) if value}
+    
+    @staticmethod
+    def _tool_name(message: MCPMessage) -> str:
+        if message.method == 'tools/call':
+            return message.params.get('name', message.method)
+        return message.method
+    
+    async def _timed_call(self, call: MCPCall) -> Any:
+        """Uma chamada do fan-out, com prazo e métricas da ferramenta"""
+        tool = self._tool_name(call.message)
+        stats = self._tool_stats.get(tool)
+        if stats is None:
+            stats = self._tool_stats[tool] = _ToolStats()
+        stats.calls += 1
+        
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self._send_message(call.message), call.deadline)
+        except asyncio.TimeoutError:
+            stats.timeouts += 1
+            logger.warning(f"Chamada MCP '{tool}' excedeu o prazo de {call.deadline:.1f}s - resultado descartado")
             return None
+        stats.latencies_ms.append((time.perf_counter() - started) * 1000)
         
+        if response is None or response.error:
+            stats.errors += 1
+            return None
         try:
-            payload = {
-                "jsonrpc": message.jsonrpc,
-                "method": message.method,
-                "params": message.params
+            return call.parse(response)
+        except Exception as e:
+            stats.errors += 1
+            logger.error(f"Resposta MCP inválida de '{tool}': {e}")
+            return None
+    
+    def get_tool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Latência (ms), timeouts e erros por ferramenta nas chamadas em paralelo"""
+        def percentile(ordered: List[float], fraction: float) -> float:
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 1) if ordered else 0.0
+        
+        tools = {}
+        for tool, stats in self._tool_stats.items():
+            ordered = sorted(stats.latencies_ms)
+            tools[tool] = {
+                'calls': stats.calls,
+                'timeouts': stats.timeouts,
+                'errors': stats.errors,
+                'latency_p50_ms': percentile(ordered, 0.5),
+                'latency_p95_ms': percentile(ordered, 0.95)
             }
+        return tools
+    
+    async def _post(self, payload: Any) -> Optional[Any]:
+        """Envia um payload JSON-RPC (mensagem ou lote); erros de comunicação são propagados"""
+        if self.stdio is not None:
+            return await self.stdio.send(payload)
+        
+        async with self._ensure_session().post(f"{self.server_url}/mcp", data=dumps(payload)) as response:
+            if response.status == 200:
+                return loads(await response.read())
+            if response.status in (202, 204):
+                return {}  # Apenas notificações: sem corpo de resposta
+            logger.error(f"Erro HTTP {response.status} ao enviar mensagem MCP")
+            return None
+    
+    @staticmethod
+    def _is_notification(message: MCPMessage) -> bool:
+        return message.method.startswith('notifications/')
+    
+    def _assign_id(self, message: MCPMessage):
+        """Requisições recebem um id único; notificações não têm id (e não têm resposta)"""
+        if message.id is None and not self._is_notification(message):
+            message.id = str(next(self._request_ids))
+    
+    @staticmethod
+    def _payload(message: MCPMessage) -> Any:
+        """Requisições são codificadas direto da dataclass; notificações não podem levar "id": null"""
+        if message.id is not None:
+            return message
+        return {
+            "jsonrpc": message.jsonrpc,
+            "method": message.method,
+            "params": message.params
+        }
+    
+    @staticmethod
+    def _response(data: Dict[str, Any]) -> MCPResponse:
+        return MCPResponse(
+            result=data.get('result'),
+            error=data.get('error'),
+            id=data.get('id'),
+            jsonrpc=data.get('jsonrpc', '2.0')
+        )
+    
+    async def _send_message(self, message: MCPMessage) -> Optional[MCPResponse]:
+        """Envia mensagem para o servidor MCP"""
+        try:
+            self._assign_id(message)
+            data = await self._post(self._payload(message))
+            if data is None:
+                return None
             
-            if message.id:
-                payload["id"] = message.id
-            
-            async with self.session.post(
-                f"{self.server_url}/mcp",
-                json=payload
-            ) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    return MCPResponse(
-                        result=data.get('result'),
-                        error=data.get('error'),
-                        id=data.get('id'),
-                        jsonrpc=data.get('jsonrpc', '2.0')
-                    )
-                else:
-                    logger.error(f"Erro HTTP {response.status} ao enviar mensagem MCP")
-                    return None
-                    
+            response = self._response(data)
+            if message.id is not None and response.id is not None and str(response.id) != message.id:
+                logger.warning(f"Resposta MCP com id inesperado: {response.id} (esperado {message.id})")
+            return response
+        
+        except TRANSPORT_ERRORS as e:
+            # Servidor inacessível ou lento: cache negativo até a reconexão
+            self._mark_unavailable(str(e) or type(e).__name__)
+            return None
         except Exception as e:
             logger.error(f"Erro ao enviar mensagem MCP: {e}")
             return None
     
+    async def send_batch(self, messages: List[MCPMessage]) -> List[Optional[MCPResponse]]:
+        """Envia várias mensagens em um lote JSON-RPC 2.0 (uma única requisição HTTP)
+        
+        Retorna as respostas na ordem das mensagens, correlacionadas pelo id; notificações
+        e requisições sem resposta ficam como None. Se o servidor não aceitar lotes, as
+        mensagens passam a ser enviadas individualmente (em paralelo).
+        """
+        if not messages:
+            return []
+        if not self._batch_supported or len(messages) == 1:
+            return list(await asyncio.gather(*(self._send_message(message) for message in messages)))
+        
+        for message in messages:
+            self._assign_id(message)
+        
+        try:
+            data = await self._post([self._payload(message) for message in messages])
+        except TRANSPORT_ERRORS as e:
+            self._mark_unavailable(str(e) or type(e).__name__)
+            return [None] * len(messages)
+        except Exception as e:
+            logger.error(f"Erro ao enviar lote MCP: {e}")
+            return [None] * len(messages)
+        
+        if isinstance(data, dict) and data.get('error'):
+            # Servidor sem suporte a lotes responde com um único erro para o lote inteiro
+            logger.warning(f"Servidor MCP não aceita lotes JSON-RPC ({data['error']}) - enviando individualmente")
+            self._batch_supported = False
+            return await self.send_batch(messages)
+        
+        self._batches_sent += 1
+        self._batched_calls += len(messages)
+        
+        by_id: Dict[str, MCPResponse] = {}
+        for item in data if isinstance(data, list) else []:
+            if isinstance(item, dict) and item.get('id') is not None:
+                by_id[str(item['id'])] = self._response(item)
+        
+        return [by_id.get(message.id) if message.id is not None else None for message in messages]
+    
     async def __aenter__(self):
         """Context manager entry"""
         await self.connect()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Envio de Eventos MCP - Médico de Bolso
+Eventos médicos saem do caminho da resposta: ficam em uma fila limitada em memória e são
+enviados em lotes de notificações JSON-RPC (por tamanho ou intervalo). Com o servidor fora
+do ar, os lotes vão para um arquivo local e são reenviados quando a conexão volta.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from src.utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+EVENT_METHOD = "notifications/medical_event"
+
+# Amostras de duração dos envios mantidas para os percentis
+FLUSH_SAMPLES = 200
+
+
+class MCPEventShipper:
+    """Fila de eventos com envio em lote, gravação em arquivo na falha e esvaziamento no encerramento"""
+
+    def __init__(
+        self,
+        client,
+        max_queue: int,
+        batch_size: int,
+        flush_interval: float,
+        spill_path: Optional[str] = None
+    ):
+        """`client`: MCPClient usado no envio; `spill_path`: arquivo JSONL para eventos não enviados"""
+        self.client = client
+        self.max_queue = max_queue
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.spill_path = spill_path
+
+        self._queue: Deque[Dict[str, Any]] = deque()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+        # Métricas
+        self._max_depth = 0
+        self._dropped = 0
+        self._shipped = 0
+        self._spilled = 0
+        self._replayed = 0
+        self._flushes = 0
+        self._flush_ms: Deque[float] = deque(maxlen=FLUSH_SAMPLES)
+
+    def emit(self, event: Dict[str, Any]) -> bool:
+        """Enfileira um evento sem aguardar o envio; False se a fila estiver cheia (evento descartado)"""
+        if len(self._queue) >= self.max_queue:
+            self._dropped += 1
+            if self._dropped == 1 or self._dropped % 1000 == 0:
+                logger.warning(f"Fila de eventos MCP cheia - {self._dropped} eventos descartados")
+            return False
+
+        self._queue.append(event)
+        self._max_depth = max(self._max_depth, len(self._queue))
+        self._ensure_running()
+        if len(self._queue) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def _ensure_running(self):
+        """Inicia a tarefa de envio no event loop atual (na primeira utilização)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        """Envia um lote a cada `flush_interval` segundos, ou antes se a fila atingir `batch_size`"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                while self._queue:
+                    await self.flush()
+                    if len(self._queue) < self.batch_size:
+                        break
+                await self._replay_spilled()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Erro no envio de eventos MCP: {e}")
+
+    async def flush(self):
+        """Envia um lote de até `batch_size` eventos; em caso de falha, grava-o no arquivo local"""
+        if not self._queue:
+            return
+        async with self._flush_lock:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+
+            started = time.perf_counter()
+            delivered = await self.client.send_notifications(EVENT_METHOD, batch)
+            self._flush_ms.append((time.perf_counter() - started) * 1000)
+            self._flushes += 1
+
+            if delivered:
+                self._shipped += len(batch)
+            else:
+                await self._spill(batch)
+
+    async def _spill(self, batch: List[Dict[str, Any]]):
+        """Grava eventos não enviados no arquivo local (sem arquivo configurado, são descartados)"""
+        if not self.spill_path:
+            self._dropped += len(batch)
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._append_lines, batch)
+            self._spilled += len(batch)
+        except Exception as e:
+            self._dropped += len(batch)
+            logger.error(f"Erro ao gravar eventos MCP em {self.spill_path}: {e}")
+
+    def _append_lines(self, batch: List[Dict[str, Any]]):
+        with open(self.spill_path, 'ab') as file:
+            file.write(b''.join(dumps(event) + b'\n' for event in batch))
+
+    async def _replay_spilled(self):
+        """Reenvia os eventos gravados em arquivo quando o servidor volta a responder"""
+        if not self.spill_path or not self.client.connected:
+            return
+
+        # Arquivo renomeado antes da leitura: falhas durante o reenvio voltam a um arquivo novo.
+        # Um arquivo ".sending" já existente (reenvio interrompido) é reenviado primeiro.
+        sending_path = f"{self.spill_path}.sending"
+        if not os.path.exists(sending_path) and not os.path.exists(self.spill_path):
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            if not os.path.exists(sending_path):
+                await loop.run_in_executor(None, os.replace, self.spill_path, sending_path)
+            events = await loop.run_in_executor(None, self._read_lines, sending_path)
+        except Exception as e:
+            logger.error(f"Erro ao ler eventos MCP gravados: {e}")
+            return
+
+        for start in range(0, len(events), self.batch_size):
+            batch = events[start:start + self.batch_size]
+            if await self.client.send_notifications(EVENT_METHOD, batch):
+                self._replayed += len(batch)
+            else:
+                await self._spill(events[start:])
+                break
+        await loop.run_in_executor(None, os.remove, sending_path)
+        logger.info(f"Eventos MCP reenviados do arquivo local: {self._replayed} no total")
+
+    @staticmethod
+    def _read_lines(path: str) -> List[Dict[str, Any]]:
+        events = []
+        with open(path, 'rb') as file:
+            for line in file:
+                try:
+                    events.append(loads(line))
+                except ValueError:
+                    continue  # Linha incompleta (encerramento durante a gravação)
+        return events
+
+    async def close(self):
+        """Interrompe o envio periódico e esvazia a fila (enviando ou gravando no arquivo)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        while self._queue:
+            await self.flush()
+        logger.info(f"Envio de eventos MCP encerrado ({self._shipped} enviados, {self._spilled} gravados em arquivo)")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estatísticas de envio de eventos"""
+        ordered = sorted(self._flush_ms)
+        return {
+            'queue_depth': len(self._queue),
+            'max_queue_depth': self._max_depth,
+            'dropped': self._dropped,
+            'shipped': self._shipped,
+            'spilled': self._spilled,
+            'replayed': self._replayed,
+            'flushes': self._flushes,
+            'flush_p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1) if ordered else 0.0
+        }
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transporte stdio do MCP - Médico de Bolso
+Canal persistente e bidirecional com um servidor MCP local (subprocesso): mensagens JSON-RPC
+delimitadas por quebra de linha, várias requisições em andamento ao mesmo tempo (correlacionadas
+pelo id), notificações enviadas pelo servidor e controle de fluxo na escrita.
+"""
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from src.utils.serialization import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+# Tamanho máximo de uma mensagem recebida (uma linha)
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+
+class TransportClosed(ConnectionError):
+    """O processo do servidor MCP terminou ou não pôde ser iniciado"""
+
+
+def _message_id(message: Any) -> Any:
+    """Id de uma mensagem (dicionário ou dataclass MCPMessage)"""
+    if isinstance(message, dict):
+        return message.get('id')
+    return getattr(message, 'id', None)
+
+
+class StdioTransport:
+    """Conexão com um servidor MCP via stdin/stdout de um subprocesso"""
+
+    def __init__(
+        self,
+        command: List[str],
+        request_timeout: float,
+        max_in_flight: int,
+        on_notification: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        """`command`: programa do servidor e argumentos; `max_in_flight`: requisições simultâneas"""
+        self.command = command
+        self.request_timeout = request_timeout
+        self.on_notification = on_notification
+
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._pending: Dict[str, asyncio.Future] = {}
+
+        # Métricas
+        self.max_in_flight = max_in_flight
+        self.starts = 0
+        self.notifications_received = 0
+        self.unmatched_responses = 0
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.returncode is None
+
+    async def start(self):
+        """Inicia o processo do servidor (ou o reinicia, se tiver terminado)
+        
+        Chamado apenas pelo handshake do cliente: um servidor reiniciado precisa de um novo initialize.
+        """
+        if self.running:
+            return
+        async with self._start_lock:
+            if self.running:
+                return
+            try:
+                self._process = await asyncio.create_subprocess_exec(
+                    *self.command,
+                    stdin=asyncio.subprocess.PIPE,
+                    stdout=asyncio.subprocess.PIPE,
+                    limit=MAX_LINE_BYTES
+                )
+            except OSError as e:
+                raise TransportClosed(f"Não foi possível iniciar o servidor MCP ({self.command[0]}): {e}") from e
+            self.starts += 1
+            self._reader_task = asyncio.create_task(self._read_loop(self._process))
+            logger.info(f"Servidor MCP local iniciado (pid {self._process.pid})")
+
+    async def _read_loop(self, process: asyncio.subprocess.Process):
+        """Lê as mensagens do servidor: respostas completam as requisições; o resto é notificação"""
+        try:
+            while True:
+                line = await process.stdout.readline()
+                if not line:
+                    break
+                try:
+                    data = loads(line)
+                except ValueError:
+                    logger.warning(f"Linha inválida do servidor MCP: {line[:200]!r}")
+                    continue
+                for message in data if isinstance(data, list) else [data]:
+                    self._dispatch(message)
+        except Exception as e:
+            logger.error(f"Erro na leitura do servidor MCP: {e}")
+        finally:
+            self._fail_pending(TransportClosed("Servidor MCP local encerrado"))
+
+    def _dispatch(self, message: Dict[str, Any]):
+        if 'method' not in message:
+            future = self._pending.pop(str(message.get('id')), None)
+            if future is None:
+                self.unmatched_responses += 1
+            elif not future.done():
+                future.set_result(message)
+            return
+
+        if 'id' in message:
+            # Requisição do servidor: nenhuma capacidade de cliente é oferecida
+            asyncio.create_task(self._write({
+                'jsonrpc': '2.0',
+                'id': message['id'],
+                'error': {'code': -32601, 'message': f"Método não suportado: {message['method']}"}
+            }))
+            return
+
+        self.notifications_received += 1
+        if self.on_notification:
+            try:
+                self.on_notification(message)
+            except Exception as e:
+                logger.error(f"Erro ao tratar notificação MCP {message.get('method')}: {e}")
+
+    def _fail_pending(self, error: Exception):
+        pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+    async def _write(self, payload: Any):
+        """Escreve uma mensagem; aguarda o esvaziamento do buffer se o servidor estiver lento"""
+        if not self.running:
+            raise TransportClosed("Servidor MCP local não está em execução")
+        line = dumps(payload) + b'\n'
+        async with self._write_lock:
+            try:
+                self._process.stdin.write(line)
+                await self._process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError) as e:
+                raise TransportClosed(f"Servidor MCP local encerrado: {e}") from e
+
+    async def send(self, payload: Any) -> Any:
+        """Envia uma mensagem ou lote e retorna a resposta no formato do modo HTTP
+        (objeto, lista de respostas ou {} quando só há notificações)"""
+        messages = payload if isinstance(payload, list) else [payload]
+        ids = [str(request_id) for request_id in map(_message_id, messages) if request_id is not None]
+
+        async with self._in_flight:
+            loop = asyncio.get_running_loop()
+            futures = [self._pending.setdefault(request_id, loop.create_future()) for request_id in ids]
+            try:
+                await self._write(payload)
+                if not futures:
+                    return {}
+                done, _ = await asyncio.wait(futures, timeout=self.request_timeout)
+                if not done:
+                    raise asyncio.TimeoutError()
+            finally:
+                for request_id in ids:
+                    self._pending.pop(request_id, None)
+
+        responses = [future.result() for future in futures if future.done() and not future.exception()]
+        if not responses:
+            # Nenhuma resposta: o processo terminou durante a espera
+            raise next(future.exception() for future in futures if future.done())
+        return responses if isinstance(payload, list) else responses[0]
+
+    async def close(self):
+        """Encerra o processo do servidor"""
+        process, self._process = self._process, None
+        if process is not None and process.returncode is None:
+            try:
+                process.stdin.close()
+                await asyncio.wait_for(process.wait(), 5)
+            except (asyncio.TimeoutError, ProcessLookupError, BrokenPipeError):
+                process.kill()
+                await process.wait()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Estado do canal stdio"""
+        return {
+            'running': self.running,
+            'starts': self.starts,
+            'in_flight': len(self._pending),
+            'max_in_flight': self.max_in_flight,
+            'notifications_received': self.notifications_received,
+            'unmatched_responses': self.unmatched_responses
+        }
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Extração de Respostas Clínicas - Médico de Bolso
+Extrai localmente temperatura, escala de dor, duração, idade e medicamentos das respostas do paciente
+"""
+
+import re
+import logging
+from typing import Dict, Any, Optional, Set
+from src.medical.symptom_matcher import fold_text
+
+logger = logging.getLogger(__name__)
+
+_NUMBER_WORDS = {
+    'um': 1, 'uma': 1, 'dois': 2, 'duas': 2, 'tres': 3, 'três': 3, 'quatro': 4, 'cinco': 5,
+    'seis': 6, 'sete': 7, 'oito': 8, 'nove': 9, 'dez': 10, 'meia': 0.5, 'meio': 0.5
+}
+
+# Unidades de duração normalizadas para horas
+_DURATION_UNITS = {
+    'min': 1 / 60, 'minuto': 1 / 60, 'minutos': 1 / 60,
+    'h': 1, 'hora': 1, 'horas': 1,
+    'dia': 24, 'dias': 24,
+    'semana': 168, 'semanas': 168,
+    'mês': 720, 'mes': 720, 'meses': 720,
+    'ano': 8760, 'anos': 8760
+}
+
+_NUMBER = r'\b(\d+(?:[.,]\d+)?|' + '|'.join(_NUMBER_WORDS) + r')'
+
+_TEMPERATURE_PATTERNS = [
+    re.compile(r'(\d{2,3}(?:[.,]\d{1,2})?)\s*(?:°|º|graus?)\s*(c|f)?\b'),
+    re.compile(r'(?:febre|temperatura)\s*(?:de|é|e|:|deu|foi|está|esta)?\s*(\d{2,3}(?:[.,]\d{1,2})?)()'),
+    re.compile(r'\b(3[4-9][.,]\d|4[0-3][.,]\d)\b()')
+]
+_PAIN_PATTERNS = [
+    re.compile(r'\b(\d{1,2})\s*(?:/|de|em)\s*10\b'),
+    re.compile(r'(?:dor|intensidade|nota)\s*(?:é|e|de|:)?\s*(\d{1,2})\b(?!\s*(?:' + '|'.join(_DURATION_UNITS) + r')\b)')
+]
+_AGE_PATTERN = re.compile(
+    r'\b(?:tenho\s+(\d{1,3})\s+anos|(\d{1,3})\s+anos\s+de\s+idade|idade\s*(?:de|é|e|:)?\s*(\d{1,3}))\b'
+)
+_DURATION_PATTERN = re.compile(_NUMBER + r'\s*(' + '|'.join(sorted(_DURATION_UNITS, key=len, reverse=True)) + r')\b')
+_RELATIVE_DAYS = re.compile(r'\b(anteontem|ontem)\b')
+_BARE_NUMBER = re.compile(r'^\s*(?:uns|umas|cerca de)?\s*(\d{1,3}(?:[.,]\d{1,2})?)\s*[.!]?\s*$')
+_TOKEN_PATTERN = re.compile(r'\w+')
+
+# Resposta negativa ("não", "nenhum", "não tomei nada"): palavras permitidas e as que a definem
+_NEGATIVE_WORDS = frozenset({'nao', 'n', 'nenhum', 'nenhuma', 'nada', 'nem', 'ainda', 'tomei', 'usei',
+                             'remedio', 'remedios', 'medicamento', 'medicamentos', 'por', 'enquanto'})
+_NEGATIONS = frozenset({'nao', 'n', 'nenhum', 'nenhuma', 'nada'})
+
+# Número isolado em resposta a "Há quanto tempo?" é lido em dias
+BARE_DURATION_UNIT_HOURS = 24
+
+# Perguntas do bot que indicam qual dado é esperado na próxima resposta
+_EXPECTATION_HINTS = {
+    'temperature_c': ('temperatura',),
+    'pain_scale': ('intensidade', '1-10', '1 a 10', '0 a 10'),
+    'duration_hours': ('quanto tempo',),
+    'age_years': ('idade',),
+    'medications': ('medicamento', 'remédio')
+}
+
+KNOWN_MEDICATIONS = frozenset({
+    'paracetamol', 'tylenol', 'dipirona', 'novalgina', 'ibuprofeno', 'advil', 'aspirina',
+    'aas', 'diclofenaco', 'nimesulida', 'dorflex', 'buscopan', 'neosaldina', 'amoxicilina',
+    'azitromicina', 'cefalexina', 'omeprazol', 'loratadina', 'cetirizina', 'prednisona',
+    'dexametasona', 'losartana', 'captopril', 'metformina', 'insulina', 'sinvastatina'
+})
+
+# Valores que exigem avaliação completa em vez de seguir o fluxo local
+ALARM_TEMPERATURE_C = 39.0
+ALARM_PAIN_SCALE = 8
+
+
+class AnswerExtractor:
+    """Extrator local de respostas às perguntas de acompanhamento"""
+
+    def expected_fields(self, last_question: Optional[str]) -> Set[str]:
+        """Identifica quais dados a última pergunta do bot solicitou"""
+        if not last_question:
+            return set()
+
+        question_lower = last_question.lower()
+        return {
+            field_name for field_name, hints in _EXPECTATION_HINTS.items()
+            if any(hint in question_lower for hint in hints)
+        }
+
+    def extract(self, message: str, expected: Optional[Set[str]] = None) -> Dict[str, Any]:
+        """Extrai dados clínicos estruturados da mensagem"""
+        expected = expected or set()
+        message_lower = message.lower()
+        answers: Dict[str, Any] = {}
+
+        age_span = None
+        age_match = _AGE_PATTERN.search(message_lower)
+        if age_match:
+            age = int(next(group for group in age_match.groups() if group))
+            if 0 < age < 120:
+                answers['age_years'] = age
+                age_span = age_match.span()
+
+        temperature = self._extract_temperature(message_lower)
+        if temperature is not None:
+            answers['temperature_c'] = temperature
+
+        pain = self._extract_pain(message_lower)
+        if pain is not None:
+            answers['pain_scale'] = pain
+
+        duration = self._extract_duration(message_lower, age_span)
+        if duration is not None:
+            answers['duration_hours'] = duration
+
+        medications = self._extract_medications(message)
+        if medications:
+            answers['medications'] = medications
+        elif 'medications' in expected and self._is_negative(message):
+            # Negativa explícita: registrada como lista vazia para não repetir a pergunta
+            answers['medications'] = []
+
+        if not answers:
+            self._resolve_bare_number(message_lower, expected, answers)
+
+        return answers
+
+    def is_direct_answer(self, message: str) -> bool:
+        """Verifica se a mensagem é uma resposta curta (sem relato novo para a IA)"""
+        return len(_TOKEN_PATTERN.findall(message)) <= 6
+
+    def has_alarm_values(self, answers: Dict[str, Any]) -> bool:
+        """Verifica se algum valor informado indica maior gravidade"""
+        return (
+            answers.get('temperature_c', 0) >= ALARM_TEMPERATURE_C
+            or answers.get('pain_scale', 0) >= ALARM_PAIN_SCALE
+        )
+
+    def merge(self, collected: Dict[str, Any], answers: Dict[str, Any]) -> Dict[str, Any]:
+        """Combina respostas novas com as já registradas na sessão"""
+        merged = dict(collected)
+        for key, value in answers.items():
+            if key == 'medications':
+                merged[key] = list(dict.fromkeys(collected.get(key, []) + value))
+            else:
+                merged[key] = value
+        return merged
+
+    def describe(self, answers: Dict[str, Any]) -> str:
+        """Descreve as respostas em linguagem natural"""
+        parts = []
+        if 'temperature_c' in answers:
+            parts.append(f"temperatura {answers['temperature_c']:.1f}°C")
+        if 'pain_scale' in answers:
+            parts.append(f"dor {answers['pain_scale']}/10")
+        if 'duration_hours' in answers:
+            hours = answers['duration_hours']
+            if hours >= 24:
+                parts.append(f"há {hours / 24:g} dia(s)")
+            elif hours >= 1:
+                parts.append(f"há {hours:g} hora(s)")
+            else:
+                parts.append(f"há {round(hours * 60)} minuto(s)")
+        if 'age_years' in answers:
+            parts.append(f"{answers['age_years']} anos")
+        if 'medications' in answers:
+            if answers['medications']:
+                parts.append(f"medicamentos: {', '.join(answers['medications'])}")
+            else:
+                parts.append("nenhum medicamento")
+        return ", ".join(parts)
+
+    def _extract_temperature(self, message: str) -> Optional[float]:
+        """Extrai temperatura em °C (converte Fahrenheit)"""
+        for pattern in _TEMPERATURE_PATTERNS:
+            match = pattern.search(message)
+            if not match:
+                continue
+            value = float(match.group(1).replace(',', '.'))
+            if match.group(2) == 'f' or 93 <= value <= 110:
+                value = (value - 32) * 5 / 9
+            if 34.0 <= value <= 43.0:
+                return round(value, 1)
+        return None
+
+    def _extract_pain(self, message: str) -> Optional[int]:
+        """Extrai escala de dor de 0 a 10"""
+        for pattern in _PAIN_PATTERNS:
+            match = pattern.search(message)
+            if match and 0 <= int(match.group(1)) <= 10:
+                return int(match.group(1))
+        return None
+
+    def _extract_duration(self, message: str, age_span: Optional[tuple]) -> Optional[float]:
+        """Extrai duração normalizada em horas"""
+        for match in _DURATION_PATTERN.finditer(message):
+            if age_span and match.start() < age_span[1] and age_span[0] < match.end():
+                continue
+            amount = match.group(1)
+            value = _NUMBER_WORDS[amount] if amount in _NUMBER_WORDS else float(amount.replace(',', '.'))
+            return round(float(value) * _DURATION_UNITS[match.group(2)], 2)
+
+        relative = _RELATIVE_DAYS.search(message)
+        if relative:
+            return 48.0 if relative.group(1) == 'anteontem' else 24.0
+        return None
+
+    def _extract_medications(self, message: str) -> list:
+        """Extrai nomes de medicamentos conhecidos"""
+        tokens = _TOKEN_PATTERN.findall(fold_text(message))
+        return list(dict.fromkeys(token for token in tokens if token in KNOWN_MEDICATIONS))
+
+    def _is_negative(self, message: str) -> bool:
+        """Verifica se a mensagem é só uma negativa ("não", "nenhum", "não tomei nada")"""
+        tokens = set(_TOKEN_PATTERN.findall(fold_text(message)))
+        return bool(tokens & _NEGATIONS) and tokens <= _NEGATIVE_WORDS
+
+    def _resolve_bare_number(self, message: str, expected: Set[str], answers: Dict[str, Any]):
+        """Interpreta um número isolado conforme a pergunta feita ("8", "38,5", "3" dias)"""
+        match = _BARE_NUMBER.match(message)
+        if not match:
+            return
+
+        raw = match.group(1)
+        value = float(raw.replace(',', '.'))
+        is_decimal = not raw.isdigit()
+
+        if 'duration_hours' in expected and 'temperature_c' not in expected and 0 < value <= 365:
+            answers['duration_hours'] = round(value * BARE_DURATION_UNIT_HOURS, 2)
+        elif (is_decimal or 'temperature_c' in expected) and 34.0 <= value <= 43.0:
+            answers['temperature_c'] = round(value, 1)
+        elif 'pain_scale' in expected and not is_decimal and 0 <= value <= 10:
+            answers['pain_scale'] = int(value)
+        elif 'age_years' in expected and not is_decimal and 0 < value < 120:
+            answers['age_years'] = int(value)
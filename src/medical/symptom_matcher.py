@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Casamento Aproximado de Sintomas - Médico de Bolso
+Índice de trigramas com distância de edição limitada, tolerante a acentos, plurais e erros de digitação
+
+Recall e latência em relação ao casamento exato:
+    python -m benchmarks.symptom_matcher
+"""
+
+import re
+import unicodedata
+import logging
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, FrozenSet, List, NamedTuple, Tuple
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_PATTERN = re.compile(r'\w+')
+_DIGIT_PATTERN = re.compile(r'\d')
+
+
+def fold_text(text: str) -> str:
+    """Normaliza texto: minúsculas e sem acentos ("Não consigo" -> "nao consigo")"""
+    # NFD separa os acentos; a codificação ASCII os descarta (emojis também são descartados)
+    return unicodedata.normalize('NFD', text.lower()).encode('ascii', 'ignore').decode('ascii')
+
+
+# Palavras distintas com trigramas e forma reduzida memorizados (o vocabulário das mensagens se repete)
+WORD_CACHE_SIZE = 8192
+
+# Palavras isoladas até este tamanho só casam exatamente: a uma edição delas há palavras comuns
+# ("confuso"/"confusão", "cansado"/"casado", "tonto"/"tanto")
+EXACT_WORD_MAX_LENGTH = 7
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def _trigrams(token: str) -> FrozenSet[str]:
+    """Gera trigramas de uma palavra com preenchimento nas bordas"""
+    padded = f"  {token} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+@lru_cache(maxsize=WORD_CACHE_SIZE)
+def _singular(token: str) -> str:
+    """Forma reduzida de uma palavra, igual no singular e no plural ("dores" e "dor" -> "dor")"""
+    if len(token) <= 3:
+        return token
+    if token.endswith('oes'):
+        return token[:-3] + 'ao'
+    if token.endswith('s'):
+        token = token[:-1]
+    # "febre"/"febres" e "dor"/"dores" convergem para a mesma forma
+    if len(token) > 3 and token.endswith(('re', 'ze')):
+        token = token[:-1]
+    return token
+
+
+class _PreparedMessage(NamedTuple):
+    words: str                            # palavras sem acentos, separadas e cercadas por espaço
+    reduced: str                          # palavras reduzidas (plurais), separadas e cercadas por espaço
+    tokens: Tuple[str, ...]               # palavras reduzidas
+    grams: FrozenSet[str]                 # trigramas das palavras
+    starts: Dict[str, Tuple[int, ...]]    # posições das palavras por prefixo de 2 letras
+
+
+@lru_cache(maxsize=64)
+def _prepare(message: str) -> _PreparedMessage:
+    """Normalização, palavras e trigramas da mensagem
+    
+    Memorizado: a mesma mensagem passa pelos vocabulários de emergência, alerta, comuns e risco.
+    """
+    words = _TOKEN_PATTERN.findall(fold_text(message))
+    tokens = tuple(_singular(token) for token in words)
+    grams = set()
+    starts: Dict[str, List[int]] = {}
+    for position, token in enumerate(tokens):
+        grams |= _trigrams(token)
+        starts.setdefault(token[:2], []).append(position)
+    return _PreparedMessage(
+        _padded(words), _padded(tokens), tokens, frozenset(grams),
+        {prefix: tuple(positions) for prefix, positions in starts.items()}
+    )
+
+
+def _padded(tokens) -> str:
+    """Palavras separadas e cercadas por espaço (casamento só em limites de palavra)"""
+    return f" {' '.join(tokens)} "
+
+
+# Palavras comuns vizinhas (uma edição) de expressões do vocabulário: nunca casam por aproximação
+NEAR_MISS_WORDS = frozenset(_singular(fold_text(word)) for word in (
+    'confusão', 'confusões', 'casado', 'casada', 'casamento', 'cansei', 'cansou', 'tanto', 'tanta',
+    'gravada', 'gravado', 'gravata', 'gravidade', 'restante', 'sangrento', 'temperado', 'tosco'
+))
+
+
+def _max_distance(phrase: str) -> int:
+    """Distância de edição máxima tolerada para uma expressão"""
+    if len(phrase) < 5 or _DIGIT_PATTERN.search(phrase):
+        # Expressões curtas ou com números ("dor 10", "febre 39") exigem casamento exato
+        return 0
+    if ' ' not in phrase and len(phrase) <= EXACT_WORD_MAX_LENGTH:
+        return 0
+    if len(phrase) < 13:
+        return 1
+    return 2
+
+
+def _bounded_distance(a: str, b: str, limit: int) -> int:
+    """Distância de edição (com transposição de letras vizinhas valendo 1) em faixa diagonal,
+    com saída antecipada acima do limite"""
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > limit:
+        return limit + 1
+
+    overflow = limit + 1
+    before: List[int] = []
+    previous = list(range(len_b + 1))
+    for i in range(1, len_a + 1):
+        char_a = a[i - 1]
+        low = max(1, i - limit)
+        high = min(len_b, i + limit)
+        current = [overflow] * (len_b + 1)
+        current[0] = i if i <= limit else overflow
+        row_min = current[0]
+        for j in range(low, high + 1):
+            cost = previous[j - 1] + (char_a != b[j - 1])
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            # Letras vizinhas trocadas ("peiot" -> "peito")
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == b[j - 1] and before[j - 2] + 1 < cost:
+                cost = before[j - 2] + 1
+            current[j] = cost
+            if cost < row_min:
+                row_min = cost
+        if row_min > limit:
+            return overflow
+        before, previous = previous, current
+
+    return min(previous[len_b], overflow)
+
+
+class SymptomMatcher:
+    """Detector de categorias de sintomas com tolerância a acentos e erros de digitação"""
+
+    def __init__(self, keyword_dict: Dict[str, List[str]]):
+        """Pré-computa o vocabulário normalizado e o índice de trigramas"""
+        self.categories: List[str] = list(keyword_dict.keys())
+
+        # (categoria, expressão reduzida, nº de palavras, distância máxima, nº de trigramas)
+        self._phrases: List[Tuple[int, str, int, int, int]] = []
+        # (categoria, palavras da expressão, palavras reduzidas), cercadas por espaço
+        self._exact_phrases: List[Tuple[int, str, str]] = []
+        self._trigram_index: Dict[str, List[int]] = {}
+
+        for category_idx, keywords in enumerate(keyword_dict.values()):
+            for keyword in keywords:
+                words = _TOKEN_PATTERN.findall(fold_text(keyword))
+                tokens = [_singular(token) for token in words]
+                self._exact_phrases.append((category_idx, _padded(words), _padded(tokens)))
+
+                max_distance = _max_distance(' '.join(words))
+                if max_distance == 0:
+                    continue
+
+                grams = set()
+                for token in tokens:
+                    grams |= _trigrams(token)
+
+                phrase_idx = len(self._phrases)
+                self._phrases.append((category_idx, ' '.join(tokens), len(tokens), max_distance, len(grams)))
+                for gram in grams:
+                    self._trigram_index.setdefault(gram, []).append(phrase_idx)
+
+        logger.debug(f"Índice de sintomas: {len(self._exact_phrases)} expressões, {len(self._trigram_index)} trigramas")
+
+    def match(self, message: str, fuzzy: bool = True) -> List[str]:
+        """Retorna as categorias detectadas, na ordem do vocabulário
+        
+        Com fuzzy=False só valem casamentos exatos (acentos e plurais reduzidos), sem erros de digitação.
+        """
+        prepared = _prepare(message)
+        found = [False] * len(self.categories)
+
+        # Casamento exato em limites de palavra (sem depender de acentos nem de plurais)
+        for category_idx, phrase, reduced_phrase in self._exact_phrases:
+            if not found[category_idx] and (phrase in prepared.words or reduced_phrase in prepared.reduced):
+                found[category_idx] = True
+
+        if fuzzy and prepared.tokens and not all(found):
+            self._fuzzy_match(prepared, found)
+
+        return [category for category, hit in zip(self.categories, found) if hit]
+
+    def _fuzzy_match(self, prepared: _PreparedMessage, found: List[bool]):
+        """Casamento aproximado restrito aos candidatos do índice de trigramas"""
+        # Filtro de contagem de q-gramas: cada edição (ou troca de vizinhas) destrói no máximo 4 trigramas
+        index = self._trigram_index
+        shared = Counter(chain.from_iterable(index[gram] for gram in prepared.grams & index.keys()))
+        tokens = prepared.tokens
+
+        for phrase_idx, count in shared.items():
+            category_idx, phrase, word_count, max_distance, gram_count = self._phrases[phrase_idx]
+            if found[category_idx] or count < gram_count - 4 * max_distance:
+                continue
+
+            checked = set()
+            # Erros de digitação raramente atingem o início da expressão ("tanto" != "tonto")
+            for start in prepared.starts.get(phrase[:2], ()):
+                window_tokens = tokens[start:start + word_count]
+                window = ' '.join(window_tokens)
+                if window in checked:
+                    continue
+                checked.add(window)
+                if not NEAR_MISS_WORDS.isdisjoint(window_tokens):
+                    continue
+                if _bounded_distance(window, phrase, max_distance) <= max_distance:
+                    found[category_idx] = True
+                    break
@@ -5,10 +5,15 @@ Sistema de Triagem Médica - Médico de Bolso
 Análise inicial de sintomas e classificação de urgência
 """
 
-import re
+import time
+import hashlib
 import logging
-from typing import Dict, List, Any
-from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, List, Any, Optional, Mapping
+from dataclasses import dataclass, field
+from src.config.settings import TRIAGE_URGENCY_DECAY, TRIAGE_CACHE_SIZE
+from src.medical.symptom_matcher import SymptomMatcher, fold_text
+from src.utils.lru_cache import LRUCache, MISSING
 
 logger = logging.getLogger(__name__)
 
@@ -21,6 +26,24 @@ class TriageResult:
     recommendations: List[str]
     requires_immediate_attention: bool
 
+# Níveis de urgência em ordem crescente de gravidade
+URGENCY_LEVELS = ['BAIXO', 'MODERADO', 'URGENTE', 'EMERGÊNCIA']
+
+@dataclass
+class ConversationTriageState:
+    """Estado de triagem acumulado ao longo da conversa de um usuário"""
+    symptoms_first_seen: Dict[str, float] = field(default_factory=dict)
+    risk_factors_first_seen: Dict[str, float] = field(default_factory=dict)
+    peak_urgency: str = "BAIXO"
+    peak_urgency_time: float = 0.0
+
+# Mensagens maiores que isso raramente se repetem e não são memorizadas
+TRIAGE_CACHE_MAX_LENGTH = 120
+
+def normalize_message(message: str) -> str:
+    """Normaliza a mensagem para triagem e chave de cache ("Febre!!" -> "febre")"""
+    return ' '.join(fold_text(message).split()).rstrip(' .!?')
+
 class MedicalTriage:
     """Sistema de triagem médica para análise inicial de sintomas"""
     
@@ -53,17 +76,54 @@ class MedicalTriage:
             'dor_muscular': ['dor muscular', 'dor no corpo', 'corpo dolorido']
         }
         
+        self.risk_keywords = {
+            'idade_avancada': ['idoso', 'terceira idade', '70 anos', '80 anos'],
+            'gravidez': ['grávida', 'gestante', 'gravidez'],
+            'diabetes': ['diabetes', 'diabético'],
+            'hipertensao': ['pressão alta', 'hipertensão'],
+            'cardiopatia': ['problema coração', 'cardíaco', 'infarto anterior'],
+            'imunossupressao': ['imunidade baixa', 'transplantado', 'quimioterapia']
+        }
+        
+        self.ruleset_version = None
+        self.result_cache = LRUCache(TRIAGE_CACHE_SIZE)
+        self.rebuild_rules()
+        
         logger.info("Sistema de triagem médica inicializado")
     
+    def rebuild_rules(self):
+        """Recalcula os índices de sintomas; invalida o cache se as regras mudaram"""
+        rules = (self.emergency_keywords, self.warning_symptoms, self.common_symptoms, self.risk_keywords)
+        version = hashlib.sha1(repr(rules).encode('utf-8')).hexdigest()[:12]
+        if version == self.ruleset_version:
+            return
+        
+        # Índices pré-computados (tolerantes a acentos e erros de digitação)
+        self.emergency_matcher = SymptomMatcher(self.emergency_keywords)
+        self.warning_matcher = SymptomMatcher(self.warning_symptoms)
+        self.common_matcher = SymptomMatcher(self.common_symptoms)
+        self.risk_matcher = SymptomMatcher(self.risk_keywords)
+        
+        self.ruleset_version = version
+        self.result_cache.clear()
+        logger.info(f"Regras de triagem carregadas (versão {version})")
+    
     def analyze_symptoms(self, user_message: str) -> Dict[str, Any]:
         """Analisa sintomas descritos pelo usuário"""
+        normalized = normalize_message(user_message)
+        cacheable = len(normalized) <= TRIAGE_CACHE_MAX_LENGTH
+        cache_key = (self.ruleset_version, normalized)
+        
+        if cacheable:
+            cached = self.result_cache.get(cache_key)
+            if cached is not MISSING:
+                return self._thaw_result(cached)
+        
         try:
-            message_lower = user_message.lower()
-            
             # Detectar sintomas
-            emergency_symptoms = self._detect_symptoms(message_lower, self.emergency_keywords)
-            warning_symptoms = self._detect_symptoms(message_lower, self.warning_symptoms)
-            common_symptoms = self._detect_symptoms(message_lower, self.common_symptoms)
+            emergency_symptoms = self.emergency_matcher.match(normalized)
+            warning_symptoms = self.warning_matcher.match(normalized)
+            common_symptoms = self.common_matcher.match(normalized)
             
             # Determinar nível de urgência
             urgency_level = self._determine_urgency(
@@ -71,7 +131,7 @@ class MedicalTriage:
             )
             
             # Identificar fatores de risco
-            risk_factors = self._identify_risk_factors(message_lower)
+            risk_factors = self.risk_matcher.match(normalized)
             
             # Gerar recomendações
             recommendations = self._generate_recommendations(
@@ -91,24 +151,87 @@ class MedicalTriage:
                 'requires_immediate_attention': requires_immediate
             }
             
-            logger.info(f"Triagem realizada: urgência {urgency_level}, sintomas: {len(all_symptoms)}")
+            logger.debug(f"Triagem realizada: urgência {urgency_level}, sintomas: {len(all_symptoms)}")
+            
+            if cacheable:
+                self.result_cache.put(cache_key, self._freeze_result(result))
             return result
             
         except Exception as e:
             logger.error(f"Erro na análise de triagem: {e}")
             return self._get_default_triage_result()
     
-    def _detect_symptoms(self, message: str, symptom_dict: Dict[str, List[str]]) -> List[str]:
-        """Detecta sintomas específicos na mensagem"""
-        detected = []
+    def precise_emergency(self, user_message: str) -> List[str]:
+        """Sintomas de emergência citados literalmente (sem casamento aproximado por erro de digitação)"""
+        return self.emergency_matcher.match(normalize_message(user_message), fuzzy=False)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do cache de triagem"""
+        stats = self.result_cache.get_stats()
+        stats['ruleset_version'] = self.ruleset_version
+        return stats
+    
+    def _freeze_result(self, result: Dict[str, Any]) -> Mapping[str, Any]:
+        """Converte o resultado em estrutura imutável para o cache"""
+        return MappingProxyType({
+            key: tuple(value) if isinstance(value, list) else value
+            for key, value in result.items()
+        })
+    
+    def _thaw_result(self, frozen: Mapping[str, Any]) -> Dict[str, Any]:
+        """Gera uma cópia mutável de um resultado em cache"""
+        return {
+            key: list(value) if isinstance(value, tuple) else value
+            for key, value in frozen.items()
+        }
+    
+    def update_conversation_state(
+        self,
+        state: ConversationTriageState,
+        triage_result: Dict[str, Any],
+        now: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Incorpora a triagem da mensagem atual ao estado da conversa (O(mensagem))"""
+        now = now if now is not None else time.time()
+        
+        for symptom in triage_result['symptoms_detected']:
+            state.symptoms_first_seen.setdefault(symptom, now)
+        for risk_factor in triage_result['risk_factors']:
+            state.risk_factors_first_seen.setdefault(risk_factor, now)
+        
+        # A urgência máxima decai um nível a cada TRIAGE_URGENCY_DECAY segundos
+        message_urgency = triage_result['urgency_level']
+        decayed_urgency = self.get_conversation_urgency(state, now)
+        if URGENCY_LEVELS.index(message_urgency) >= URGENCY_LEVELS.index(decayed_urgency):
+            state.peak_urgency = message_urgency
+            state.peak_urgency_time = now
+            urgency_level = message_urgency
+        else:
+            urgency_level = decayed_urgency
+        
+        result = dict(triage_result)
+        result['urgency_level'] = urgency_level
+        result['message_urgency_level'] = message_urgency
+        result['symptoms_detected'] = list(state.symptoms_first_seen)
+        result['risk_factors'] = list(state.risk_factors_first_seen)
+        result['symptom_timeline'] = dict(state.symptoms_first_seen)
+        result['requires_immediate_attention'] = urgency_level == "EMERGÊNCIA"
+        
+        if urgency_level != message_urgency:
+            result['recommendations'] = self._generate_recommendations(urgency_level, [], [])
+        
+        return result
+    
+    def get_conversation_urgency(self, state: ConversationTriageState, now: Optional[float] = None) -> str:
+        """Retorna a urgência máxima da conversa, já considerando o decaimento"""
+        now = now if now is not None else time.time()
         
-        for symptom_category, keywords in symptom_dict.items():
-            for keyword in keywords:
-                if keyword in message:
-                    detected.append(symptom_category)
-                    break
+        peak_index = URGENCY_LEVELS.index(state.peak_urgency)
+        if TRIAGE_URGENCY_DECAY > 0:
+            levels_decayed = int((now - state.peak_urgency_time) / TRIAGE_URGENCY_DECAY)
+            peak_index = max(0, peak_index - levels_decayed)
         
-        return detected
+        return URGENCY_LEVELS[peak_index]
     
     def _determine_urgency(self, emergency: List[str], warning: List[str], common: List[str]) -> str:
         """Determina o nível de urgência baseado nos sintomas"""
@@ -121,27 +244,6 @@ class MedicalTriage:
         else:
             return "BAIXO"
     
-    def _identify_risk_factors(self, message: str) -> List[str]:
-        """Identifica fatores de risco mencionados"""
-        risk_factors = []
-        
-        risk_keywords = {
-            'idade_avancada': ['idoso', 'terceira idade', '70 anos', '80 anos'],
-            'gravidez': ['grávida', 'gestante', 'gravidez'],
-            'diabetes': ['diabetes', 'diabético'],
-            'hipertensao': ['pressão alta', 'hipertensão'],
-            'cardiopatia': ['problema coração', 'cardíaco', 'infarto anterior'],
-            'imunossupressao': ['imunidade baixa', 'transplantado', 'quimioterapia']
-        }
-        
-        for risk_factor, keywords in risk_keywords.items():
-            for keyword in keywords:
-                if keyword in message:
-                    risk_factors.append(risk_factor)
-                    break
-        
-        return risk_factors
-    
     def _generate_recommendations(self, urgency: str, emergency: List[str], warning: List[str]) -> List[str]:
         """Gera recomendações baseadas na urgência"""
         recommendations = []
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache LRU - Médico de Bolso
+Cache limitado com política LRU e estatísticas de acerto
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterator, Tuple
+
+# Sentinela para diferenciar "não está no cache" de um valor None armazenado
+MISSING = object()
+
+
+class LRUCache:
+    """Cache limitado que descarta a entrada usada há mais tempo"""
+
+    def __init__(self, max_size: int = 1024):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Any:
+        """Retorna o valor em cache ou MISSING"""
+        value = self._entries.get(key, MISSING)
+        if value is MISSING:
+            self.misses += 1
+            return MISSING
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Armazena um valor, descartando o mais antigo se necessário"""
+        if self.max_size <= 0:
+            return
+
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        """Entradas da mais antiga para a mais recente (sem afetar a ordem nem as estatísticas)"""
+        return iter(list(self._entries.items()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        """Esvazia o cache (mantém as estatísticas)"""
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas de uso do cache"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+        }
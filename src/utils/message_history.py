@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Histórico de Mensagens - Médico de Bolso
+Buffer circular de capacidade fixa com registros compactos e visões sem cópia
+"""
+
+import sys
+import time
+from typing import Iterator, List, NamedTuple, Union
+
+
+class MessageRecord(NamedTuple):
+    """Mensagem do histórico (tupla: sem __dict__ por instância)"""
+    role: str
+    content: str
+    timestamp: float
+
+
+class MessageHistory:
+    """Buffer circular: append O(1), descarta automaticamente as mensagens mais antigas"""
+
+    __slots__ = ('capacity', '_buffer', '_total')
+
+    def __init__(self, capacity: int = 50):
+        self.capacity = capacity
+        self._buffer: List[MessageRecord] = []
+        self._total = 0  # mensagens já adicionadas (índice absoluto da próxima)
+
+    def append(self, role: str, content: str, timestamp: float = None) -> bool:
+        """Adiciona uma mensagem; retorna True se uma mensagem antiga foi descartada"""
+        record = MessageRecord(sys.intern(role), content, timestamp if timestamp is not None else time.time())
+
+        evicted = len(self._buffer) >= self.capacity
+        if evicted:
+            self._buffer[self._total % self.capacity] = record
+        else:
+            self._buffer.append(record)
+        self._total += 1
+        return evicted
+
+    def last(self, limit: int = 0) -> 'HistoryView':
+        """Visão das últimas `limit` mensagens (todas se limit <= 0), sem copiar registros"""
+        start = self._total - len(self._buffer)
+        if limit > 0:
+            start = max(start, self._total - limit)
+        return HistoryView(self, start, self._total)
+
+    def _get_absolute(self, index: int) -> MessageRecord:
+        """Retorna a mensagem pelo índice absoluto"""
+        return self._buffer[index % self.capacity]
+
+    def _oldest_index(self) -> int:
+        """Índice absoluto da mensagem mais antiga ainda retida"""
+        return self._total - len(self._buffer)
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def __iter__(self) -> Iterator[MessageRecord]:
+        return iter(self.last())
+
+
+class HistoryView:
+    """Janela sobre o buffer circular, fixada no momento da criação
+
+    Mensagens adicionadas depois não entram na visão; mensagens descartadas
+    pelo buffer deixam de aparecer nela.
+    """
+
+    __slots__ = ('_history', '_start', '_end')
+
+    def __init__(self, history: MessageHistory, start: int, end: int):
+        self._history = history
+        self._start = start
+        self._end = end
+
+    def _effective_start(self) -> int:
+        return max(self._start, self._history._oldest_index())
+
+    def __len__(self) -> int:
+        return max(0, self._end - self._effective_start())
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __iter__(self) -> Iterator[MessageRecord]:
+        for index in range(self._effective_start(), self._end):
+            yield self._history._get_absolute(index)
+
+    def __reversed__(self) -> Iterator[MessageRecord]:
+        for index in range(self._end - 1, self._effective_start() - 1, -1):
+            yield self._history._get_absolute(index)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[MessageRecord, 'HistoryView']:
+        start = self._effective_start()
+        if isinstance(key, slice):
+            first, stop, step = key.indices(self._end - start)
+            if step != 1:
+                raise ValueError("HistoryView não suporta passo diferente de 1")
+            return HistoryView(self._history, start + first, start + max(first, stop))
+
+        length = self._end - start
+        if key < 0:
+            key += length
+        if not 0 <= key < length:
+            raise IndexError("índice fora do histórico")
+        return self._history._get_absolute(start + key)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Serialização JSON - Médico de Bolso
+Codificação e decodificação rápidas com orjson (quando instalado), com a biblioteca padrão
+como alternativa. Dataclasses, enums e datas são codificados diretamente, sem dicionários
+intermediários; a saída é sempre UTF-8 sem escapes de acentos.
+"""
+
+import json
+import enum
+import dataclasses
+from datetime import date, datetime
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj: Any) -> Any:
+    """Tipos não nativos: dataclasses e enums na biblioteca padrão; texto para o restante"""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {field.name: getattr(obj, field.name) for field in dataclasses.fields(obj)}
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+        """Codifica em JSON (bytes UTF-8)"""
+        return orjson.dumps(obj, default=_default, option=(_OPTIONS | orjson.OPT_SORT_KEYS) if sort_keys else _OPTIONS)
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """Decodifica JSON (bytes ou texto)"""
+        return orjson.loads(data)
+
+else:
+    def dumps(obj: Any, sort_keys: bool = False) -> bytes:
+        """Codifica em JSON (bytes UTF-8)"""
+        return json.dumps(
+            obj, default=_default, sort_keys=sort_keys, ensure_ascii=False, separators=(',', ':')
+        ).encode('utf-8')
+
+    def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        """Decodifica JSON (bytes ou texto)"""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+
+def dumps_str(obj: Any, sort_keys: bool = False) -> str:
+    """Codifica em JSON (texto), para colunas de texto e chaves de cache"""
+    return dumps(obj, sort_keys=sort_keys).decode('utf-8')
@@ -3,141 +3,231 @@
 """
 Gerenciador de Sessões - Médico de Bolso
 Gerencia sessões de usuários e histórico de conversas
+
+Usado exclusivamente a partir do event loop do asyncio: nenhum método síncrono aguarda (await),
+então cada chamada é atômica em relação às demais corrotinas e não há necessidade de locks.
+
+Com um armazenamento configurado, as sessões alteradas são marcadas e gravadas em lote
+por uma tarefa de fundo (write-behind) em um thread de I/O dedicado; o caminho de cada
+mensagem nunca toca o disco de forma síncrona.
 """
 
 import time
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, field
-from threading import Lock
-from src.config.settings import SESSION_TIMEOUT
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Callable, Set
+from dataclasses import dataclass, field, asdict
+from src.config.settings import SESSION_TIMEOUT, SESSION_SWEEP_INTERVAL, SESSION_FLUSH_INTERVAL
+from src.medical.triage import ConversationTriageState
+from src.ai.conversation_agents import ConversationContext, ContextAgent, ConversationMode
+from src.utils.message_history import MessageHistory, HistoryView
+from src.utils.session_store import SessionStore
+from src.utils.timing_wheel import TimingWheel
 from src.utils.logger import medical_logger
 
 logger = logging.getLogger(__name__)
 
+# Mensagens mantidas por sessão (buffer circular)
+MAX_HISTORY_MESSAGES = 50
+
 @dataclass
 class UserSession:
-    """Representa uma sessão de usuário"""
+    """Estado completo de um usuário: histórico, contexto de conversação e triagem
+    
+    Obtido uma única vez por atualização e descartado de uma só vez ao expirar.
+    """
     user_id: int
     user_name: str = ""
     start_time: float = field(default_factory=time.time)
     last_activity: float = field(default_factory=time.time)
-    messages: List[Dict[str, Any]] = field(default_factory=list)
+    messages: MessageHistory = field(default_factory=lambda: MessageHistory(MAX_HISTORY_MESSAGES))
     medical_context: Dict[str, Any] = field(default_factory=dict)
+    triage_state: ConversationTriageState = field(default_factory=ConversationTriageState)
+    conversation: Optional[ConversationContext] = None
     is_active: bool = True
+    
+    def __post_init__(self):
+        if self.conversation is None:
+            self.conversation = ContextAgent.new_context(str(self.user_id))
+    
+    def to_record(self) -> Dict[str, Any]:
+        """Instantâneo serializável da sessão (cópias: pode ser codificado fora do event loop)"""
+        conversation = asdict(self.conversation)
+        conversation['conversation_mode'] = self.conversation.conversation_mode.value
+        return {
+            'user_id': self.user_id,
+            'user_name': self.user_name,
+            'start_time': self.start_time,
+            'last_activity': self.last_activity,
+            'messages': [tuple(record) for record in self.messages],
+            'medical_context': dict(self.medical_context),
+            'triage_state': asdict(self.triage_state),
+            'conversation': conversation
+        }
+    
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> 'UserSession':
+        """Reconstrói a sessão a partir de um registro armazenado"""
+        messages = MessageHistory(MAX_HISTORY_MESSAGES)
+        for role, content, timestamp in record.get('messages', []):
+            messages.append(role, content, timestamp)
+        
+        conversation = dict(record['conversation'])
+        conversation['conversation_mode'] = ConversationMode(conversation['conversation_mode'])
+        
+        return cls(
+            user_id=record['user_id'],
+            user_name=record.get('user_name', ""),
+            start_time=record['start_time'],
+            last_activity=record['last_activity'],
+            messages=messages,
+            medical_context=record.get('medical_context', {}),
+            triage_state=ConversationTriageState(**record.get('triage_state', {})),
+            conversation=ConversationContext(**conversation)
+        )
 
 class SessionManager:
     """Gerenciador de sessões de usuários"""
     
-    def __init__(self):
-        """Inicializa o gerenciador de sessões"""
+    def __init__(self, store: Optional[SessionStore] = None):
+        """Inicializa o gerenciador de sessões (opcionalmente com armazenamento durável)"""
         self.sessions: Dict[int, UserSession] = {}
-        self.lock = Lock()
+        
+        # Persistência write-behind: IDs alterados desde a última gravação
+        self.store = store
+        self._dirty: Set[int] = set()
+        self._stored_ids: Set[int] = set()
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store") if store else None
+        self._flushes_total = 0
+        self._flushed_records_total = 0
+        self._last_flush_ms = 0.0
+        
+        # Contadores incrementais para estatísticas em O(1)
+        self._active_count = 0
+        self._message_total = 0
+        self._start_time_total = 0.0
+        
+        # Expiração agendada em roda de temporização (sem varrer todas as sessões)
+        self.expiry_wheel = TimingWheel(SESSION_TIMEOUT, resolution=1.0, start_time=time.time())
+        self.eviction_listeners: List[Callable[[int], None]] = []
+        self._evictions_total = 0
+        self._evictions_per_second = 0.0
         logger.info("Gerenciador de sessões inicializado")
     
     def create_session(self, user_id: int, user_name: str = "") -> UserSession:
         """Cria uma nova sessão para o usuário"""
-        with self.lock:
-            # Finalizar sessão anterior se existir
-            if user_id in self.sessions:
-                self._end_session(user_id)
-            
-            # Criar nova sessão
-            session = UserSession(user_id=user_id, user_name=user_name)
-            self.sessions[user_id] = session
-            
-            # Log da criação da sessão
-            medical_logger.log_session_start(user_id, user_name)
-            logger.info(f"Nova sessão criada para usuário {user_id}")
-            
-            return session
+        # Finalizar sessão anterior se existir
+        if user_id in self.sessions:
+            self._end_session(user_id)
+        
+        # Criar nova sessão
+        session = UserSession(user_id=user_id, user_name=user_name)
+        self.sessions[user_id] = session
+        self._active_count += 1
+        self._start_time_total += session.start_time
+        self.expiry_wheel.schedule(user_id, session.last_activity + SESSION_TIMEOUT)
+        self._stored_ids.discard(user_id)  # a sessão nova substitui a armazenada
+        self._mark_dirty(user_id)
+        
+        # Log da criação da sessão
+        medical_logger.log_session_start(user_id, user_name)
+        logger.info(f"Nova sessão criada para usuário {user_id}")
+        
+        return session
     
     def has_active_session(self, user_id: int) -> bool:
         """Verifica se o usuário tem uma sessão ativa"""
-        with self.lock:
-            if user_id not in self.sessions:
-                return False
-            
-            session = self.sessions[user_id]
-            
-            # Verificar se a sessão expirou
-            if time.time() - session.last_activity > SESSION_TIMEOUT:
-                self._end_session(user_id)
-                return False
-            
-            return session.is_active
+        session = self.sessions.get(user_id)
+        if session is None:
+            return False
+        
+        # Verificar se a sessão expirou
+        if time.time() - session.last_activity > SESSION_TIMEOUT:
+            self._expire_session(user_id)
+            return False
+        
+        return session.is_active
     
     def get_session(self, user_id: int) -> Optional[UserSession]:
         """Retorna a sessão do usuário se ativa"""
-        if self.has_active_session(user_id):
-            return self.sessions[user_id]
-        return None
+        session = self.sessions.get(user_id)
+        if session is None:
+            return None
+        
+        # Verificar se a sessão expirou
+        if time.time() - session.last_activity > SESSION_TIMEOUT:
+            self._expire_session(user_id)
+            return None
+        
+        return session if session.is_active else None
     
     def update_session(self, user_id: int) -> bool:
         """Atualiza o timestamp da última atividade"""
-        with self.lock:
-            if user_id in self.sessions:
-                self.sessions[user_id].last_activity = time.time()
-                return True
+        session = self.sessions.get(user_id)
+        if session is None:
             return False
+        
+        self.touch_session(session)
+        return True
+    
+    def touch_session(self, session: UserSession):
+        """Atualiza a última atividade de uma sessão já obtida"""
+        session.last_activity = time.time()
+        self.expiry_wheel.schedule(session.user_id, session.last_activity + SESSION_TIMEOUT)
+        self._mark_dirty(session.user_id)
     
     def add_message(self, user_id: int, role: str, content: str) -> bool:
         """Adiciona uma mensagem ao histórico da sessão"""
-        with self.lock:
-            if user_id not in self.sessions:
-                return False
-            
-            message = {
-                'role': role,
-                'content': content,
-                'timestamp': time.time()
-            }
-            
-            self.sessions[user_id].messages.append(message)
-            
-            # Limitar histórico a 50 mensagens
-            if len(self.sessions[user_id].messages) > 50:
-                self.sessions[user_id].messages = self.sessions[user_id].messages[-50:]
-            
-            # Log de consulta médica se for mensagem do usuário
-            if role == 'user':
-                session = self.sessions[user_id]
-                medical_context = session.medical_context
-                urgency = medical_context.get('last_urgency', 'DESCONHECIDO')
-                medical_logger.log_consultation(user_id, content, urgency)
-            
-            return True
-    
-    def get_session_history(self, user_id: int, limit: int = 10) -> List[Dict[str, Any]]:
-        """Retorna o histórico de mensagens da sessão"""
-        with self.lock:
-            if user_id not in self.sessions:
-                return []
-            
-            messages = self.sessions[user_id].messages
-            return messages[-limit:] if limit > 0 else messages
+        session = self.sessions.get(user_id)
+        if session is None:
+            return False
+        
+        self.append_message(session, role, content)
+        return True
+    
+    def append_message(self, session: UserSession, role: str, content: str):
+        """Adiciona uma mensagem ao histórico de uma sessão já obtida"""
+        # Buffer circular: ao atingir a capacidade, a mensagem mais antiga é descartada
+        if not session.messages.append(role, content):
+            self._message_total += 1
+        self._mark_dirty(session.user_id)
+        
+        # Log de consulta médica se for mensagem do usuário
+        if role == 'user':
+            urgency = session.medical_context.get('last_urgency', 'DESCONHECIDO')
+            medical_logger.log_consultation(session.user_id, content, urgency)
+    
+    def get_session_history(self, user_id: int, limit: int = 10) -> HistoryView:
+        """Retorna uma visão (sem cópia) das últimas mensagens da sessão"""
+        session = self.sessions.get(user_id)
+        if session is None:
+            return MessageHistory(0).last()
+        
+        return session.messages.last(limit)
     
     def update_medical_context(self, user_id: int, context_data: Dict[str, Any]) -> bool:
         """Atualiza o contexto médico da sessão"""
-        with self.lock:
-            if user_id not in self.sessions:
-                return False
-            
-            self.sessions[user_id].medical_context.update(context_data)
-            return True
+        session = self.sessions.get(user_id)
+        if session is None:
+            return False
+        
+        session.medical_context.update(context_data)
+        self._mark_dirty(user_id)
+        return True
     
     def get_medical_context(self, user_id: int) -> Dict[str, Any]:
         """Retorna o contexto médico da sessão"""
-        with self.lock:
-            if user_id not in self.sessions:
-                return {}
-            
-            return self.sessions[user_id].medical_context.copy()
+        session = self.sessions.get(user_id)
+        if session is None:
+            return {}
+        
+        return session.medical_context.copy()
     
     def end_session(self, user_id: int) -> bool:
         """Finaliza a sessão do usuário"""
-        with self.lock:
-            return self._end_session(user_id)
+        return self._end_session(user_id)
     
     def _end_session(self, user_id: int) -> bool:
         """Finaliza a sessão (método interno)"""
@@ -145,7 +235,12 @@ class SessionManager:
             return False
         
         session = self.sessions[user_id]
+        if session.is_active:
+            self._active_count -= 1
         session.is_active = False
+        self._message_total -= len(session.messages)
+        self._start_time_total -= session.start_time
+        self.expiry_wheel.cancel(user_id)
         
         # Calcular duração da sessão
         duration_minutes = int((time.time() - session.start_time) / 60)
@@ -156,50 +251,194 @@ class SessionManager:
         
         # Remover sessão após um tempo
         del self.sessions[user_id]
+        self._mark_dirty(user_id)
+        
+        # Liberar estado associado ao usuário em outros componentes
+        for listener in self.eviction_listeners:
+            try:
+                listener(user_id)
+            except Exception as e:
+                logger.warning(f"Erro ao liberar estado do usuário {user_id}: {e}")
         
         return True
     
+    def add_eviction_listener(self, listener: Callable[[int], None]):
+        """Registra callback chamado ao finalizar uma sessão (para liberar estado associado ao usuário)"""
+        self.eviction_listeners.append(listener)
+    
     def cleanup_expired_sessions(self) -> int:
-        """Remove sessões expiradas"""
-        with self.lock:
-            current_time = time.time()
-            expired_users = []
-            
-            for user_id, session in self.sessions.items():
-                if current_time - session.last_activity > SESSION_TIMEOUT:
-                    expired_users.append(user_id)
-            
-            for user_id in expired_users:
-                self._end_session(user_id)
-            
-            if expired_users:
-                logger.info(f"Removidas {len(expired_users)} sessões expiradas")
-            
-            return len(expired_users)
+        """Remove sessões expiradas (custo proporcional às sessões vencidas, não ao total)"""
+        current_time = time.time()
+        expired_users = self.expiry_wheel.advance(current_time)
+        
+        for user_id in expired_users:
+            self._expire_session(user_id)
+        
+        if expired_users:
+            logger.info(f"Removidas {len(expired_users)} sessões expiradas")
+        
+        return len(expired_users)
+    
+    def _expire_session(self, user_id: int):
+        """Finaliza uma sessão vencida (na varredura ou ao ser acessada) e a conta como remoção"""
+        if self._end_session(user_id):
+            self._evictions_total += 1
+    
+    async def run_expiry_sweeper(self, interval: float = SESSION_SWEEP_INTERVAL):
+        """Tarefa de fundo no event loop que remove sessões expiradas periodicamente"""
+        logger.info(f"Varredura de sessões expiradas iniciada (intervalo: {interval}s)")
+        last_sweep = time.monotonic()
+        last_total = self._evictions_total
+        
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.cleanup_expired_sessions()
+                now = time.monotonic()
+                # Média móvel exponencial da taxa de remoção (inclui as expirações ao acessar a sessão)
+                sweep_rate = (self._evictions_total - last_total) / max(now - last_sweep, 1e-9)
+                self._evictions_per_second = 0.8 * self._evictions_per_second + 0.2 * sweep_rate
+                last_sweep = now
+                last_total = self._evictions_total
+            except Exception as e:
+                logger.error(f"Erro na varredura de sessões expiradas: {e}")
+    
+    def _mark_dirty(self, user_id: int):
+        """Marca a sessão para a próxima gravação em lote (O(1), sem I/O)"""
+        if self.store is not None:
+            self._dirty.add(user_id)
+    
+    async def _run_io(self, func, *args):
+        """Executa uma operação do armazenamento no thread de I/O dedicado"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._io_executor, func, *args)
+    
+    def attach_store(self, store: Optional[SessionStore]):
+        """Define o armazenamento durável depois da criação (antes de open_store)"""
+        self.store = store
+        if store is not None and self._io_executor is None:
+            self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store")
+    
+    async def open_store(self):
+        """Descobre as sessões armazenadas ainda válidas (carregadas sob demanda no primeiro acesso)"""
+        if self.store is None:
+            return
+        
+        try:
+            self._stored_ids = await self._run_io(self.store.load_user_ids, time.time() - SESSION_TIMEOUT)
+            logger.info(f"{len(self._stored_ids)} sessões armazenadas disponíveis para retomada")
+        except Exception as e:
+            logger.error(f"Erro ao abrir armazenamento de sessões: {e}")
+    
+    async def get_or_load_session(self, user_id: int) -> Optional[UserSession]:
+        """Retorna a sessão ativa, retomando-a do armazenamento no primeiro acesso após reinício"""
+        session = self.get_session(user_id)
+        if session is not None or user_id not in self._stored_ids:
+            return session
+        
+        # Atualizações simultâneas do mesmo usuário aguardam uma única leitura
+        pending = self._loading.get(user_id)
+        if pending is None:
+            pending = asyncio.ensure_future(self._load_session(user_id))
+            self._loading[user_id] = pending
+            pending.add_done_callback(lambda _: self._loading.pop(user_id, None))
+        await asyncio.shield(pending)
+        
+        return self.get_session(user_id)
+    
+    async def _load_session(self, user_id: int):
+        """Lê a sessão do armazenamento e a reinsere na memória"""
+        try:
+            record = await self._run_io(self.store.load, user_id)
+        except Exception as e:
+            logger.error(f"Erro ao carregar sessão do usuário {user_id}: {e}")
+            return
+        
+        self._stored_ids.discard(user_id)
+        # Uma nova sessão pode ter sido criada (/start) durante a leitura
+        if record is None or user_id in self.sessions:
+            return
+        if time.time() - record['last_activity'] > SESSION_TIMEOUT:
+            self._mark_dirty(user_id)  # remove o registro vencido
+            return
+        
+        session = UserSession.from_record(record)
+        self.sessions[user_id] = session
+        self._active_count += 1
+        self._message_total += len(session.messages)
+        self._start_time_total += session.start_time
+        self.expiry_wheel.schedule(user_id, session.last_activity + SESSION_TIMEOUT)
+        logger.info(f"Sessão do usuário {user_id} retomada do armazenamento")
+    
+    async def flush(self) -> int:
+        """Grava em lote as sessões alteradas desde a última gravação"""
+        if self.store is None or not self._dirty:
+            return 0
+        
+        dirty, self._dirty = self._dirty, set()
+        # Instantâneos tirados no event loop; codificação e escrita no thread de I/O
+        batch = {}
+        for user_id in dirty:
+            session = self.sessions.get(user_id)
+            batch[user_id] = session.to_record() if session is not None else None
+        
+        started = time.perf_counter()
+        try:
+            await self._run_io(self.store.save_batch, batch)
+        except Exception as e:
+            logger.error(f"Erro ao gravar {len(batch)} sessões: {e}")
+            self._dirty |= dirty  # tenta novamente na próxima gravação
+            return 0
+        
+        self._last_flush_ms = (time.perf_counter() - started) * 1000
+        self._flushes_total += 1
+        self._flushed_records_total += len(batch)
+        return len(batch)
+    
+    async def run_write_behind(self, interval: float = SESSION_FLUSH_INTERVAL):
+        """Tarefa de fundo no event loop que grava periodicamente as sessões alteradas"""
+        logger.info(f"Gravação de sessões em segundo plano iniciada (intervalo: {interval}s)")
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Erro na gravação de sessões: {e}")
+    
+    async def close_store(self):
+        """Grava as alterações pendentes e fecha o armazenamento (no encerramento)"""
+        if self.store is None:
+            return
+        
+        written = await self.flush()
+        await self._run_io(self.store.close)
+        self._io_executor.shutdown(wait=True)
+        logger.info(f"Armazenamento de sessões fechado ({written} sessões gravadas no encerramento)")
     
     def get_active_sessions_count(self) -> int:
         """Retorna o número de sessões ativas"""
-        with self.lock:
-            return len([s for s in self.sessions.values() if s.is_active])
+        return self._active_count
     
     def get_session_stats(self) -> Dict[str, Any]:
-        """Retorna estatísticas das sessões"""
-        with self.lock:
-            total_sessions = len(self.sessions)
-            active_sessions = self.get_active_sessions_count()
-            
-            if total_sessions > 0:
-                avg_messages = sum(len(s.messages) for s in self.sessions.values()) / total_sessions
-                avg_duration = sum(
-                    (time.time() - s.start_time) for s in self.sessions.values()
-                ) / total_sessions / 60  # em minutos
-            else:
-                avg_messages = 0
-                avg_duration = 0
-            
-            return {
-                'total_sessions': total_sessions,
-                'active_sessions': active_sessions,
-                'avg_messages_per_session': round(avg_messages, 2),
-                'avg_duration_minutes': round(avg_duration, 2)
-            }
\ No newline at end of file
+        """Retorna estatísticas das sessões (O(1), a partir dos contadores incrementais)"""
+        total_sessions = len(self.sessions)
+        
+        if total_sessions > 0:
+            avg_messages = self._message_total / total_sessions
+            avg_duration = (time.time() - self._start_time_total / total_sessions) / 60  # em minutos
+        else:
+            avg_messages = 0
+            avg_duration = 0
+        
+        return {
+            'total_sessions': total_sessions,
+            'active_sessions': self._active_count,
+            'avg_messages_per_session': round(avg_messages, 2),
+            'avg_duration_minutes': round(avg_duration, 2),
+            'evictions_total': self._evictions_total,
+            'evictions_per_second': round(self._evictions_per_second, 3),
+            'store_pending_writes': len(self._dirty),
+            'store_flushes_total': self._flushes_total,
+            'store_records_written': self._flushed_records_total,
+            'store_last_flush_ms': round(self._last_flush_ms, 2)
+        }
\ No newline at end of file
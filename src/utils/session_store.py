@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Persistência de Sessões - Médico de Bolso
+Backends de armazenamento durável para sessões (SQLite em modo WAL por padrão)
+"""
+
+import os
+import sqlite3
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Optional, Set
+
+from src.utils.serialization import dumps_str, loads
+
+logger = logging.getLogger(__name__)
+
+
+class SessionStore(ABC):
+    """Interface de armazenamento de sessões (métodos bloqueantes, chamados fora do event loop)"""
+
+    @abstractmethod
+    def load_user_ids(self, active_since: float) -> Set[int]:
+        """Retorna os IDs de usuários com sessão ativa desde `active_since` (descarta as demais)"""
+
+    @abstractmethod
+    def load(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Carrega o registro de sessão de um usuário"""
+
+    @abstractmethod
+    def save_batch(self, records: Dict[int, Optional[Dict[str, Any]]]):
+        """Grava um lote de registros (None remove a sessão do usuário)"""
+
+    def close(self):
+        """Libera os recursos do backend"""
+
+
+class SQLiteSessionStore(SessionStore):
+    """Armazenamento em SQLite com journal WAL (leituras não bloqueiam a escrita)"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Acessado por um único thread de I/O por vez (executor dedicado no SessionManager)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_id INTEGER PRIMARY KEY, last_activity REAL NOT NULL, data TEXT NOT NULL)"
+        )
+        self.connection.commit()
+        self.path = path
+        logger.info(f"Armazenamento de sessões SQLite (WAL) em {path}")
+
+    def load_user_ids(self, active_since: float) -> Set[int]:
+        with self.connection:
+            self.connection.execute("DELETE FROM sessions WHERE last_activity < ?", (active_since,))
+        return {row[0] for row in self.connection.execute("SELECT user_id FROM sessions")}
+
+    def load(self, user_id: int) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute(
+            "SELECT data FROM sessions WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return loads(row[0]) if row else None
+
+    def save_batch(self, records: Dict[int, Optional[Dict[str, Any]]]):
+        upserts = [
+            (user_id, record['last_activity'], dumps_str(record))
+            for user_id, record in records.items() if record is not None
+        ]
+        deletes = [(user_id,) for user_id, record in records.items() if record is None]
+
+        with self.connection:
+            if upserts:
+                self.connection.executemany(
+                    "INSERT INTO sessions (user_id, last_activity, data) VALUES (?, ?, ?) "
+                    "ON CONFLICT(user_id) DO UPDATE SET last_activity = excluded.last_activity, data = excluded.data",
+                    upserts
+                )
+            if deletes:
+                self.connection.executemany("DELETE FROM sessions WHERE user_id = ?", deletes)
+
+    def close(self):
+        self.connection.close()
+
+
+def shard_path(path: str, shard: int) -> str:
+    """Arquivo da partição (medico_bolso.db -> medico_bolso.shard0.db)"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.shard{shard}{extension}"
+
+
+def create_session_store(url: Optional[str], shard: Optional[int] = None) -> Optional[SessionStore]:
+    """Cria o backend a partir da URL configurada ("sqlite:///caminho.db"; vazio desativa)
+
+    Com processos de trabalho (`shard` definido), cada partição usa o seu próprio arquivo
+    SQLite: um usuário é sempre atendido pela mesma partição, então os arquivos nunca
+    compartilham sessões e os processos não disputam o bloqueio de escrita do banco.
+    """
+    if not url or url == 'memory':
+        return None
+
+    if url.startswith('sqlite:///'):
+        path = url[len('sqlite:///'):]
+        if shard is not None:
+            path = shard_path(path, shard)
+        try:
+            return SQLiteSessionStore(path)
+        except Exception as e:
+            logger.error(f"Erro ao abrir armazenamento de sessões ({path}): {e}")
+            return None
+
+    logger.warning(f"Backend de sessões não suportado: {url} - sessões ficarão apenas em memória")
+    return None
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Roda de Temporização - Médico de Bolso
+Agendamento de expirações com custo amortizado O(1) (hashed timing wheel)
+"""
+
+import math
+from typing import Dict, Hashable, List, Set
+
+
+class TimingWheel:
+    """Roda de temporização: cada posição agrupa as chaves que vencem na mesma fatia de tempo"""
+
+    def __init__(self, horizon: float, resolution: float = 1.0, start_time: float = 0.0):
+        """Cria a roda cobrindo `horizon` segundos com fatias de `resolution` segundos"""
+        self.resolution = resolution
+        self.size = max(1, math.ceil(horizon / resolution)) + 1
+        self._slots: List[Set[Hashable]] = [set() for _ in range(self.size)]
+        self._deadlines: Dict[Hashable, float] = {}
+        self._slot_of: Dict[Hashable, int] = {}
+        self._cursor_tick = int(start_time // resolution)
+
+    def schedule(self, key: Hashable, deadline: float):
+        """Agenda (ou reagenda) a expiração de uma chave - O(1)"""
+        self.cancel(key)
+
+        # Prazos já vencidos entram na próxima fatia a ser processada
+        tick = max(int(deadline // self.resolution), self._cursor_tick)
+        slot = tick % self.size
+        self._slots[slot].add(key)
+        self._slot_of[key] = slot
+        self._deadlines[key] = deadline
+
+    def cancel(self, key: Hashable):
+        """Remove o agendamento de uma chave - O(1)"""
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            self._slots[slot].discard(key)
+            del self._deadlines[key]
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Avança até `now` e retorna as chaves vencidas (removidas da roda)"""
+        target_tick = int(now // self.resolution)
+        due: List[Hashable] = []
+
+        # Nunca é preciso percorrer mais que uma volta completa
+        first_tick = max(self._cursor_tick, target_tick - self.size + 1)
+        for tick in range(first_tick, target_tick + 1):
+            slot_keys = self._slots[tick % self.size]
+            if not slot_keys:
+                continue
+            for key in list(slot_keys):
+                if self._deadlines[key] <= now:
+                    slot_keys.discard(key)
+                    del self._slot_of[key]
+                    del self._deadlines[key]
+                    due.append(key)
+
+        self._cursor_tick = target_tick
+        return due
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Configuração compartilhada dos testes - Médico de Bolso
+"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture
+def app_env(tmp_path, monkeypatch):
+    """Variáveis obrigatórias das configurações e diretório de logs do logger médico"""
+    # O logger médico grava em logs/ no diretório atual
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'logs').mkdir()
+    monkeypatch.setenv('TELEGRAM_BOT_TOKEN', os.getenv('TELEGRAM_BOT_TOKEN', 'test-token'))
+    monkeypatch.setenv('GEMINI_API_KEY', os.getenv('GEMINI_API_KEY', 'test-key'))
+    monkeypatch.setenv('SESSION_STORE_URL', 'memory')
+    return tmp_path
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instruções de emergência na chegada da mensagem - Médico de Bolso
+
+Uma mensagem de emergência recebe as instruções locais (SAMU 192) enquanto a consulta
+anterior do mesmo usuário ainda aguarda a IA; a orientação da IA continua em ordem.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+
+import pytest
+
+USER_ID = 4242
+AI_DELAY = 0.5
+
+
+class FakeBot:
+    """Registra as mensagens enviadas (instante relativo e texto)"""
+
+    def __init__(self):
+        self.started = None
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((asyncio.get_running_loop().time() - self.started, text))
+
+    async def send_chat_action(self, chat_id, action, **kwargs):
+        return True
+
+
+@pytest.fixture
+def handlers(app_env, monkeypatch):
+    from src.bot import handlers as module
+
+    async def slow_ai(user_message, on_emergency=None, **kwargs):
+        # Uma segunda cópia das instruções não deve ser enviada pela rajada
+        if on_emergency and 'peito' in user_message:
+            await on_emergency("📞 Ligue agora para o SAMU (192) - cópia")
+        await asyncio.sleep(AI_DELAY)
+        return f"IA: {user_message}"
+
+    monkeypatch.setattr(module.gemini_ai, 'process_medical_query', slow_ai)
+    monkeypatch.setattr(module.message_coalescer, 'window', 0.01)
+    monkeypatch.setattr(module.message_coalescer, 'max_window', 0.05)
+    monkeypatch.setattr(module.message_coalescer, 'urgent_window', 0.0)
+    return module
+
+
+def _update(bot, update_id, text):
+    from telegram import Chat, Message, Update, User
+
+    message = Message(
+        message_id=update_id,
+        date=datetime.now(timezone.utc),
+        chat=Chat(id=USER_ID, type=Chat.PRIVATE),
+        from_user=User(id=USER_ID, first_name='Paciente', is_bot=False),
+        text=text
+    )
+    message.set_bot(bot)
+    return Update(update_id=update_id, message=message)
+
+
+def test_instructions_arrive_before_in_flight_burst_finishes(handlers):
+    from src.bot.concurrency import PerUserUpdateProcessor
+
+    async def scenario():
+        bot = FakeBot()
+        bot.started = asyncio.get_running_loop().time()
+        processor = PerUserUpdateProcessor(4, 16)
+        await processor.initialize()
+        handlers.attach_update_processor(processor)
+        handlers.session_manager.create_session(USER_ID, 'Paciente')
+
+        async def deliver(update):
+            await processor.process_update(update, handlers.medical_consultation_handler(update, None))
+
+        first = asyncio.create_task(deliver(_update(bot, 1, "estou com tosse desde ontem")))
+        await asyncio.sleep(0.1)  # a consulta da tosse já aguarda a IA
+        second = asyncio.create_task(deliver(_update(bot, 2, "agora estou com dor no peito")))
+        await asyncio.gather(first, second)
+        await handlers.message_coalescer.drain()
+        await handlers.outbound_scheduler.drain()
+        return bot.sent
+
+    sent = asyncio.run(scenario())
+
+    instructions = [(at, text) for at, text in sent if '192' in text]
+    first_answer = next(at for at, text in sent if text == "IA: estou com tosse desde ontem")
+    second_answer = next(at for at, text in sent if text == "IA: agora estou com dor no peito")
+
+    assert len(instructions) == 1 and 'cópia' not in instructions[0][1]
+    assert instructions[0][0] < first_answer < second_answer
+    assert instructions[0][0] < AI_DELAY
+
+
+def test_no_arrival_instructions_without_emergency(handlers):
+    from src.bot.concurrency import PerUserUpdateProcessor
+
+    async def scenario():
+        bot = FakeBot()
+        bot.started = asyncio.get_running_loop().time()
+        processor = PerUserUpdateProcessor(4, 16)
+        await processor.initialize()
+        handlers.attach_update_processor(processor)
+        handlers.session_manager.create_session(USER_ID, 'Paciente')
+
+        update = _update(bot, 1, "desculpe a confusão")
+        await processor.process_update(update, handlers.medical_consultation_handler(update, None))
+        await handlers.message_coalescer.drain()
+        await handlers.outbound_scheduler.drain()
+        return bot.sent
+
+    sent = asyncio.run(scenario())
+
+    assert not any('192' in text for _, text in sent)
+    assert any(text == "IA: desculpe a confusão" for _, text in sent)
+
+
+@pytest.mark.parametrize('text', ["desculpe a confusão", "dor no peitu"])
+def test_arrival_phase_requires_literal_emergency(handlers, text):
+    # Casamentos aproximados não disparam o SAMU na chegada; a triagem da rajada decide
+    handlers.send_emergency_on_arrival(_update(FakeBot(), 1, text))
+    assert handlers.emergency_on_arrival == {}
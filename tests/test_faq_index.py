@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de FAQ - Médico de Bolso
+
+A pontuação em ids compactos (poucas linhas tocadas) e a densa (boa parte do índice tocada)
+escolhem a mesma resposta, com a mesma similaridade.
+"""
+
+import json
+
+import pytest
+
+BANK = [
+    {'id': 'cefaleia', 'urgency_level': 'MODERADO', 'answer': 'cabeça',
+     'questions': ['minha cabeça está latejando', 'dor de cabeça forte desde cedo']},
+    {'id': 'tosse', 'urgency_level': 'BAIXO', 'answer': 'tosse',
+     'questions': ['estou com tosse seca', 'tosse que não passa há dias']},
+    {'id': 'azia', 'urgency_level': 'BAIXO', 'answer': 'azia',
+     'questions': ['queimação no estômago depois de comer', 'azia depois do almoço']},
+]
+
+QUERIES = ['cabeça latejando', 'tosse seca há dias', 'azia depois de comer', 'dor forte', 'xyzzy']
+
+
+@pytest.fixture
+def index(app_env, tmp_path):
+    from src.ai.faq_index import FAQIndex, build_index
+
+    bank_path = tmp_path / 'faq_bank.json'
+    bank_path.write_text(json.dumps(BANK, ensure_ascii=False), encoding='utf-8')
+    build_index(str(bank_path), str(tmp_path / 'faq_index'))
+    return FAQIndex(str(tmp_path / 'faq_index'))
+
+
+def test_compact_and_dense_scoring_agree(index, monkeypatch):
+    from src.ai import faq_index
+
+    results = {}
+    for ratio in (0, 10 ** 9):  # 0: sempre compacta; 10^9: sempre densa
+        monkeypatch.setattr(faq_index, 'COMPACT_SCORING_RATIO', ratio)
+        results[ratio] = [index.search(query, 0.0) for query in QUERIES]
+
+    assert results[0] == results[10 ** 9]
+    assert [match.entry_id if match else None for match in results[0]][:3] == ['cefaleia', 'tosse', 'azia']
+    assert results[0][-1] is None
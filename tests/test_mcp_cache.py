@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de respostas MCP - Médico de Bolso
+
+Um arquivo de cache corrompido não impede a inicialização, e faltas simultâneas da mesma
+chave fazem uma única chamada ao servidor.
+"""
+
+import asyncio
+
+import pytest
+
+
+@pytest.fixture
+def cache_module(app_env):
+    from src.mcp import cache
+    return cache
+
+
+@pytest.mark.parametrize('content', [
+    b'\x00\xffnao eh um cache',
+    None,  # conteúdo válido, mas no formato errado (entradas com dois campos)
+])
+def test_corrupt_file_starts_with_empty_cache(cache_module, tmp_path, content):
+    from src.utils.serialization import dumps
+
+    path = tmp_path / 'mcp_cache.bin'
+    path.write_bytes(content if content is not None else dumps([['chave', 'valor']]))
+
+    cache = cache_module.StaleWhileRevalidateCache(16, ttl=60, stale_ttl=60, path=str(path))
+
+    assert cache.get_stats()['size'] == 0
+
+
+def test_concurrent_misses_share_one_fetch(cache_module):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {'diretriz': 'hidratação'}
+
+    async def scenario():
+        cache = cache_module.StaleWhileRevalidateCache(16, ttl=60, stale_ttl=60)
+        results = await asyncio.gather(*(cache.get_or_fetch('chave', fetch) for _ in range(10)))
+        return cache, results
+
+    cache, results = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert results == [{'diretriz': 'hidratação'}] * 10
+    assert cache.get_stats()['shared_fetches'] == 9
+    assert cache.get_stats()['fetching'] == 0
+
+
+def test_failed_fetch_reaches_every_waiter_and_is_retried(cache_module):
+    calls = []
+
+    async def failing_fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ConnectionError("servidor indisponível")
+
+    async def scenario():
+        cache = cache_module.StaleWhileRevalidateCache(16, ttl=60, stale_ttl=60)
+        first = await asyncio.gather(*(cache.get_or_fetch('chave', failing_fetch) for _ in range(3)),
+                                     return_exceptions=True)
+        second = await asyncio.gather(cache.get_or_fetch('chave', failing_fetch), return_exceptions=True)
+        return first + second
+
+    results = asyncio.run(scenario())
+
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert len(calls) == 2
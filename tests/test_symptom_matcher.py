@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Casamento de sintomas - Médico de Bolso
+
+Palavras comuns a uma edição do vocabulário (confusão/confuso, casado/cansado, gravada/gravidez)
+não podem disparar categorias; variações reais dos sintomas continuam reconhecidas.
+"""
+
+import pytest
+
+
+@pytest.fixture
+def triage(app_env):
+    from src.medical.triage import MedicalTriage
+    return MedicalTriage()
+
+
+@pytest.mark.parametrize('message', [
+    "desculpe a confusão",
+    "obrigada pela confusão",
+    "foi mal pela confusão de horários",
+    "obrigado por tanto carinho",
+    "entendo a gravidade da situação",
+])
+def test_everyday_words_do_not_trigger_emergency(triage, message):
+    assert triage.emergency_matcher.match(message) == []
+    assert triage.analyze_symptoms(message)['urgency_level'] != 'EMERGÊNCIA'
+
+
+@pytest.mark.parametrize('message, matcher, category', [
+    ("sou casado", 'common_matcher', 'cansaco'),
+    ("sou casada há dez anos", 'common_matcher', 'cansaco'),
+    ("cansei de esperar na fila", 'common_matcher', 'cansaco'),
+    ("mensagem gravada", 'risk_matcher', 'gravidez'),
+    ("comprei uma gravata", 'risk_matcher', 'gravidez'),
+])
+def test_near_neighbour_words_do_not_match(triage, message, matcher, category):
+    assert category not in getattr(triage, matcher).match(message)
+
+
+@pytest.mark.parametrize('message, matcher, category', [
+    ("estou confuso e tonto", 'emergency_matcher', 'consciencia'),
+    ("estou com dores no peito", 'emergency_matcher', 'dor_peito'),
+    ("dor no peitu", 'emergency_matcher', 'dor_peito'),
+    ("sangramentoo que não para", 'emergency_matcher', 'sangramento'),
+    ("ando muito cansado", 'common_matcher', 'cansaco'),
+    ("estou gravida de 5 meses", 'risk_matcher', 'gravidez'),
+])
+def test_symptom_variants_still_match(triage, message, matcher, category):
+    assert category in getattr(triage, matcher).match(message)
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Réplicas de webhook - Médico de Bolso
+
+Com várias réplicas atrás do balanceador, as atualizações de cada usuário terminam sempre na
+fila da réplica dona, em ordem, qualquer que seja a réplica que as recebeu.
+"""
+
+import asyncio
+
+import pytest
+
+SECRET = 'segredo'
+REPLICAS = 2
+WORKERS = 2
+
+
+class FakeApplication:
+    """Apenas o que o servidor de webhook usa: fila de atualizações e bot"""
+
+    def __init__(self):
+        self.update_queue = asyncio.Queue()
+        self.bot = None
+        self.running = True
+
+
+def _payload(update_id, user_id):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'Paciente'},
+            'text': f"mensagem {update_id}"
+        }
+    }
+
+
+def test_updates_reach_the_owner_replica_in_order(app_env):
+    import aiohttp
+    from aiohttp.test_utils import TestServer, unused_port
+    from src.bot.sharding import replica_for
+    from src.bot.webhook import FORWARD_TIMEOUT, WebhookServer
+
+    async def scenario():
+        ports = [unused_port() for _ in range(REPLICAS)]
+        peers = [f"http://127.0.0.1:{port}" for port in ports]
+        applications = [FakeApplication() for _ in range(REPLICAS)]
+        servers = [
+            WebhookServer(application, '/webhook', SECRET, peers, index, WORKERS)
+            for index, application in enumerate(applications)
+        ]
+        test_servers = [TestServer(server.web_app, port=port) for server, port in zip(servers, ports)]
+        for server, test_server in zip(servers, test_servers):
+            server.client = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=FORWARD_TIMEOUT))
+            await test_server.start_server()
+
+        statuses = []
+        try:
+            async with aiohttp.ClientSession() as telegram:
+                # O balanceador alterna as réplicas; cada usuário manda várias mensagens
+                for update_id in range(40):
+                    user_id = 1000 + update_id % 8
+                    async with telegram.post(
+                        f"{peers[update_id % REPLICAS]}/webhook",
+                        json=_payload(update_id, user_id),
+                        headers={'X-Telegram-Bot-Api-Secret-Token': SECRET}
+                    ) as response:
+                        statuses.append(response.status)
+        finally:
+            for server, test_server in zip(servers, test_servers):
+                await test_server.close()
+                await server.client.close()
+
+        received = []
+        for application in applications:
+            updates = []
+            while not application.update_queue.empty():
+                updates.append(application.update_queue.get_nowait())
+            received.append(updates)
+        return statuses, received, sum(server.forwarded_total for server in servers)
+
+    statuses, received, forwarded = asyncio.run(scenario())
+
+    assert statuses == [200] * 40
+    assert sum(len(updates) for updates in received) == 40
+    assert forwarded > 0
+    for index, updates in enumerate(received):
+        for update in updates:
+            assert replica_for(update.effective_user.id, REPLICAS, WORKERS) == index
+        for user_id in {update.effective_user.id for update in updates}:
+            ids = [update.update_id for update in updates if update.effective_user.id == user_id]
+            assert ids == sorted(ids)
+
+
+def test_additional_replica_without_peers_does_not_start(app_env):
+    from src.bot.webhook import run_webhook
+
+    with pytest.raises(ValueError, match='WEBHOOK_PEERS'):
+        run_webhook(FakeApplication(), '127.0.0.1', 0, '/webhook', None, SECRET, register=False)